@@ -82,6 +82,7 @@ class ScheduleModel(BaseModel):
     day: Optional[int] = None  # Required only if frequency == "WEEKLY"
     hour: Optional[int] = None
     minute: Optional[int] = None
+    watermark_skew_minutes: Optional[int] = None  # look back this far before the last loaded cursor value
 
     @field_validator("day")
     @classmethod
@@ -38,8 +38,8 @@ def read_destination(destination_id: uuid.UUID, session=Depends(get_session)):
 
 
 @router.get("/runs/{transfer_id}", response_model=Optional[TransferRun.Model])
-def get_transfer_run(transfer_id: uuid.UUID, session=Depends(get_session)):
-    return TransferRun.get_latest_transfer_run(session, transfer_id)
+def get_transfer_run(transfer_id: uuid.UUID, status: Optional[str] = Query(None), session=Depends(get_session)):
+    return TransferRun.get_latest_transfer_run(session, transfer_id, status)
 
 
 @router.post("/runs", response_model=TransferRun.Model)
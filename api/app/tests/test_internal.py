@@ -75,4 +75,13 @@ def test_create_transfer_run():
     assert o['status'] == 'SUCCESS'
     assert o['output'] == {"records": 1000, "time": 3}
     assert o['meta'] == {"arguments": {"a": "b", "c": 3}}
-    assert o['created_at'] != None
\ No newline at end of file
+    assert o['created_at'] != None
+
+    # filter the latest run by status
+    r = client.get(f"/internal/runs/{transfer_id}?status=SUCCESS")
+    assert r.status_code == 200
+    assert r.json()['transfer_run_id'] == transfer_run_id
+
+    r = client.get(f"/internal/runs/{transfer_id}?status=FAILURE")
+    assert r.status_code == 200
+    assert r.json() is None
\ No newline at end of file
@@ -4,6 +4,8 @@ from pontoon.source.postgresql_source import PostgreSQLSource
 from pontoon.source.redshift_source import RedshiftSource
 from pontoon.source.bigquery_source import BigQuerySource
 from pontoon.source.snowflake_source import SnowflakeSource
+from pontoon.source.mysql_source import MySQLSource
+from pontoon.source.athena_source import AthenaSource
 from pontoon.source.memory_source import MemorySource
 from pontoon.destination.glue_destination import GlueDestination
 from pontoon.destination.stdout_destination import StdoutDestination
@@ -27,7 +29,7 @@ from pontoon.cache.sqlite_cache import SqliteCache
 from pontoon.cache.arrow_ipc_cache import ArrowIpcCache
 from pontoon.base import Namespace, Stream, Record, Dataset, Cache, Mode, Source, Destination
 from pontoon.base import SourceConnectionFailed, SourceStreamDoesNotExist, SourceStreamInvalidSchema
-from pontoon.base import DestinationConnectionFailed, DestinationStreamInvalidSchema
+from pontoon.base import DestinationConnectionFailed, DestinationStreamInvalidSchema, DestinationStreamsFailed
 from pontoon.base import StreamMissingField
 
 
@@ -61,6 +63,8 @@ __sources['source-postgresql'] = PostgreSQLSource
 __sources['source-redshift'] = RedshiftSource
 __sources['source-bigquery'] = BigQuerySource
 __sources['source-snowflake'] = SnowflakeSource
+__sources['source-mysql'] = MySQLSource
+__sources['source-athena'] = AthenaSource
 __sources['source-memory'] = MemorySource
 __destinations['destination-sql'] = SQLDestination
 __destinations['destination-glue'] = GlueDestination
@@ -87,8 +91,8 @@ __vendor_source_map = {
     'snowflake': 'source-snowflake',
     'bigquery': 'source-bigquery',
     'postgresql': 'source-postgresql',
-    'mysql': 'source-sql',
-    'athena': 'source-sql'
+    'mysql': 'source-mysql',
+    'athena': 'source-athena'
 }
 
 __vendor_destination_map = {
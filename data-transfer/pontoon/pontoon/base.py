@@ -7,6 +7,7 @@
 import hashlib
 import json
 import time
+import itertools
 from uuid import UUID
 from datetime import datetime, timedelta, timezone, date
 from decimal import Decimal
@@ -238,6 +239,35 @@ class Cache(ABC):
     def close(self):
         pass
 
+    def read_batches(self, stream:Stream, batch_size:int=10000) -> Generator[pa.RecordBatch, None, None]:
+        # read a stream as Arrow record batches, caches that store Arrow data should override this
+        fields = list(stream.schema)
+        rows = []
+        for record in self.read(stream):
+            rows.append(record.data)
+            if len(rows) == batch_size:
+                yield Cache._rows_to_batch(fields, stream.schema, rows)
+                rows = []
+        if rows:
+            yield Cache._rows_to_batch(fields, stream.schema, rows)
+
+    def read_limit(self, stream:Stream, limit:int) -> Generator[Record, None, None]:
+        # read at most limit records, caches that can stop the underlying read early should override this
+        return itertools.islice(self.read(stream), limit)
+
+    @staticmethod
+    def _rows_to_batch(fields:List[pa.Field], schema:pa.Schema, rows:List[List[Any]]) -> pa.RecordBatch:
+        columns = [pa.array([row[i] for row in rows], type=field.type) for i, field in enumerate(fields)]
+        return pa.record_batch(columns, schema=schema)
+
+    def commit(self, stream:Stream) -> Dict[str, Any]:
+        # make everything written to a stream so far durable, returns an opaque state for restore()
+        raise NotImplementedError(f"{type(self).__name__} does not support commit()")
+
+    def restore(self, stream:Stream, state:Dict[str, Any]):
+        # rewind a stream to the state returned by an earlier commit()
+        raise NotImplementedError(f"{type(self).__name__} does not support restore()")
+
 
 
 class Dataset:
@@ -263,6 +293,14 @@ class Dataset:
         return self._cache.read(self._resolve_stream_name(stream))
 
     
+    def read_batches(self, stream:Stream, batch_size:int=10000) -> Generator[pa.RecordBatch, None, None]:
+        return self._cache.read_batches(self._resolve_stream_name(stream), batch_size)
+
+    
+    def read_limit(self, stream:Stream, limit:int) -> Generator[Record, None, None]:
+        return self._cache.read_limit(self._resolve_stream_name(stream), limit)
+
+    
     def size(self, stream:Stream) -> int:
         return self._cache.size(self._resolve_stream_name(stream))
 
@@ -486,6 +524,11 @@ class Destination(ABC):
     def write(self, ds: Dataset, progress_callback=None):
         pass
 
+    def prepare(self, ds: Dataset):
+        # called on every leg of a multi destination before any of them writes,
+        # a leg can leave hints for the legs before it in ds.meta
+        pass
+
     @abstractmethod
     def integrity(self) -> Integrity:
         pass
@@ -510,3 +553,12 @@ class DestinationStreamInvalidSchema(DestinationError):
     pass
 
 
+class DestinationStreamsFailed(DestinationError):
+    """Raised when one or more streams written concurrently failed, errors maps each stream to its exception."""
+
+    def __init__(self, errors:Dict[str, Exception]):
+        self.errors = errors
+        details = '; '.join([f"{name}: {error}" for name, error in errors.items()])
+        super().__init__(f"{len(errors)} stream(s) failed to write: {details}")
+
+
@@ -133,7 +133,7 @@ class ArrowIpcCache(Cache):
                 writer = pa.ipc.new_stream(file_handle, record_batch.schema)
             
             self._stream_writers[stream_key] = (writer, file_handle)
-            self._record_counts[stream_key] = 0
+            self._record_counts.setdefault(stream_key, 0)
         
         writer, _ = self._stream_writers[stream_key]
         
@@ -225,6 +225,30 @@ class ArrowIpcCache(Cache):
         """
         Read records from cache. Flushes any pending writes first.
         """
+        for batch in self.read_batches(stream):
+            for record in self._arrow_batch_to_records_fast(batch):
+                yield record
+
+    def read_limit(self, stream: Stream, limit: int) -> Generator[Record, None, None]:
+        """
+        Read at most limit records, only the rows needed are converted and later batches are never read.
+        """
+        remaining = limit
+        if remaining <= 0:
+            return
+        for batch in self.read_batches(stream):
+            batch = batch.slice(0, remaining)
+            remaining -= batch.num_rows
+            for record in self._arrow_batch_to_records_fast(batch):
+                yield record
+            if remaining <= 0:
+                break
+
+    def read_batches(self, stream: Stream, batch_size: int = None) -> Generator[pa.RecordBatch, None, None]:
+        """
+        Read the cached Arrow record batches as written, without converting them to records.
+        Flushes any pending writes first. batch_size is ignored.
+        """
         if self._closed:
             raise CacheFileSystemError("Cache is closed")
         
@@ -251,21 +275,19 @@ class ArrowIpcCache(Cache):
             if self._use_stream_format or file_path.suffix == '.arrows':
                 # Read from Arrow IPC stream format
                 with open(file_path, 'rb') as f:
-                    reader = pa.ipc.open_stream(f)
-                    
-                    for batch in reader:
-                        # Convert batch to records
-                        records = self._arrow_batch_to_records_fast(batch)
-                        for record in records:
-                            yield record
+                    file_size = os.fstat(f.fileno()).st_size
+
+                    # appends and commits leave several IPC streams back to back in one file
+                    while f.tell() < file_size:
+                        reader = pa.ipc.open_stream(f)
+                        
+                        for batch in reader:
+                            yield batch
             else:
                 # Read from Arrow IPC file format
                 with pa.ipc.open_file(file_path) as reader:
                     for i in range(reader.num_record_batches):
-                        batch = reader.get_batch(i)
-                        records = self._arrow_batch_to_records_fast(batch)
-                        for record in records:
-                            yield record
+                        yield reader.get_batch(i)
                         
         except Exception as e:
             raise CacheReadError(f"Failed to read from stream: {e}")
@@ -305,6 +327,64 @@ class ArrowIpcCache(Cache):
             file_handle.close()
             del self._stream_writers[stream_key]
     
+    def commit(self, stream: Stream) -> Dict[str, Any]:
+        """
+        Make all records written to a stream durable on disk.
+        
+        Returns the committed state (file offset and record count), which
+        can be handed to restore() by a later process to resume the stream.
+        """
+        if self._closed:
+            raise CacheFileSystemError("Cache is closed")
+        
+        stream_key = (stream.schema_name, stream.name)
+        if stream_key in self._write_buffers:
+            self._flush_buffer(stream, stream_key)
+        
+        # closing the writer terminates the IPC stream, later writes start a new one
+        if stream_key in self._stream_writers:
+            writer, file_handle = self._stream_writers.pop(stream_key)
+            writer.close()
+            file_handle.flush()
+            os.fsync(file_handle.fileno())
+            file_handle.close()
+        
+        file_path = self._get_stream_file_path(stream)
+        return {
+            'bytes': file_path.stat().st_size if file_path.exists() else 0,
+            'records': self._record_counts.get(stream_key, 0)
+        }
+    
+    def restore(self, stream: Stream, state: Dict[str, Any]):
+        """
+        Rewind a stream to a state returned by commit().
+        
+        Anything written after that commit (e.g. by a run that crashed
+        mid-page) is truncated away, and new writes are appended.
+        """
+        if self._closed:
+            raise CacheFileSystemError("Cache is closed")
+        
+        if not self._use_stream_format:
+            raise CacheWriteError("Restoring a stream requires use_stream_format=True")
+
+        stream_key = (stream.schema_name, stream.name)
+        if stream_key in self._stream_writers:
+            raise CacheWriteError(f"Cannot restore stream {stream.schema_name}.{stream.name} with an open writer")
+        
+        file_path = self._get_stream_file_path(stream)
+        try:
+            if file_path.exists():
+                with open(file_path, 'r+b') as f:
+                    f.truncate(state['bytes'])
+            elif state['bytes'] > 0:
+                raise CacheReadError(f"Committed cache file is missing: {file_path}")
+        except OSError as e:
+            raise CacheFileSystemError(f"Failed to restore stream: {e}")
+        
+        self._write_buffers.pop(stream_key, None)
+        self._record_counts[stream_key] = state['records']
+    
     def close(self):
         """Close the cache and flush all pending writes."""
         if self._closed:
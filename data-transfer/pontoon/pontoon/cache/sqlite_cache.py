@@ -152,6 +152,16 @@ class SqliteCache(Cache):
                 yield record
 
 
+    def read_limit(self, stream:Stream, limit:int) -> Generator[Record, None, None]:
+        if self._stream_table_name(stream) not in self._stream_tables:
+            raise ValueError(f'No records cached for stream {stream.schema_name}.{stream.name}')
+
+        cursor = self._conn.cursor()
+        cursor.execute(f"SELECT * FROM {self._stream_table_name(stream)} LIMIT ?", (limit,))
+        for record in self._rows_to_records(stream, cursor.fetchall()):
+            yield record
+
+
     def size(self, stream:Stream) -> int:
         table_name = self._stream_table_name(stream)
         return self._stream_sizes.get(table_name, 0)
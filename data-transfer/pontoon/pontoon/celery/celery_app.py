@@ -1,5 +1,20 @@
+import os
 from celery import Celery
+from celery.signals import worker_process_init
+from pontoon.engine_registry import registry
 
 celery_app = Celery("pontoon")
 celery_app.config_from_object("pontoon.celery.celeryconfig")
 celery_app.autodiscover_tasks(["pontoon.celery"])
+
+
+@worker_process_init.connect
+def configure_engine_registry(**kwargs):
+    # reuse database engines and their pools across tasks run by this worker process
+    registry.configure(
+        enabled=os.environ.get("PONTOON_ENGINE_REUSE", "true").lower() == "true",
+        pool_size=int(os.environ.get("PONTOON_ENGINE_POOL_SIZE", "5")),
+        max_overflow=int(os.environ.get("PONTOON_ENGINE_MAX_OVERFLOW", "5")),
+        pool_recycle=int(os.environ.get("PONTOON_ENGINE_POOL_RECYCLE", "1800")),
+        idle_timeout=int(os.environ.get("PONTOON_ENGINE_IDLE_TIMEOUT", "600"))
+    )
@@ -21,7 +21,7 @@ def transfer_task(self, args_json: str):
         args += ['--retry-count', str(self.request.retries)]
         args += ['--retry-limit', str(TASK_MAX_RETRIES)]
 
-        return json.loads(main(args))
+        output = json.loads(main(args))
     except Exception as e:
         logger.error("Caught unhandled exception from transfer job: ", e, f"(args={args_json})")
         raise self.retry(
@@ -30,6 +30,15 @@ def transfer_task(self, args_json: str):
             countdown=TASK_RETRY_DELAY
         )
 
+    # the job failed but asked to be retried (e.g. it can resume a checkpointed read)
+    if output.get('retry') is True:
+        raise self.retry(
+            max_retries=TASK_MAX_RETRIES, 
+            countdown=TASK_RETRY_DELAY
+        )
+
+    return output
+
 
 # @shared_task(bind=True)
 # def test_task(self, args_json: str):
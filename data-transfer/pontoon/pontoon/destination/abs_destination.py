@@ -1,9 +1,16 @@
 import os
+import base64
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
-from azure.storage.blob import BlobServiceClient
+import requests
+import pyarrow as pa
+from azure.core.pipeline.transport import RequestsTransport
+from azure.storage.blob import BlobServiceClient, BlobBlock
 from pontoon.base import Namespace, Destination, Stream, Dataset, Record, Progress
 from pontoon.base import DestinationError
 from pontoon.destination import ObjectStoreBase
+from pontoon.destination.object_store_base import ParquetObject
 from pontoon.destination.integrity import ABSIntegrity
 
 
@@ -22,7 +29,13 @@ class ABSConfig:
 
 
 class ABSDestination(ObjectStoreBase):
-    """ A Destination that writes to Azure Blob Store in Parquet format """
+    """ A Destination that writes to Azure Blob Store in Parquet format
+
+    One BlobServiceClient, with a connection pool sized for the upload threads, is
+    shared by every upload of a write. Files larger than block_threshold_mb are
+    uploaded as blocks of block_size_mb, max_concurrency blocks at a time with
+    stage_block, and committed with commit_block_list.
+    """
 
 
     def __init__(self, config):
@@ -32,68 +45,107 @@ class ABSDestination(ObjectStoreBase):
         # our azure blob config config
         self._abs_config = ABSConfig(config['connect'])
 
+        # parallel block uploads per blob
+        connect = config['connect']
+        self._max_concurrency = max(1, connect.get('max_concurrency', 4))
+        self._block_threshold = connect.get('block_threshold_mb', 8) * 1024 * 1024
+        self._block_size = connect.get('block_size_mb', 8) * 1024 * 1024
+
+        # the service and container clients shared by every upload of a write
+        self._abs_service = None
+        self._abs = None
+
         if self._format not in ['staging', 'hive']:
             raise DestinationError(f'Format {self._format} is not supported by Azure Blob Store')
 
 
     def _get_abs_client(self):
-        # get Azure Blob container client using configured auth type
+        # the container client is shared by every batch (and upload thread) of a write
+        with self._client_lock:
+            if self._abs is None:
+                self._abs_service = self._create_abs_service_client()
+                self._abs = self._abs_service.get_container_client(self._config.get('connect').get('blob_container'))
+            return self._abs
+
+
+    def _create_abs_service_client(self):
+        # get Azure Blob service client using configured auth type
 
         connect = self._config.get('connect')
         auth_type = connect.get('auth_type')
         
         if auth_type not in ['connection_string']:
             raise Exception(f"ABSDestination (destination-abs) does not support auth type '{auth_type}'")
-        
-        blob_service_client = BlobServiceClient.from_connection_string(
-            connect.get('blob_connection_string')
-        )
-        return blob_service_client.get_container_client(
-            connect.get('blob_container')
+
+        # every upload thread stages up to max_concurrency blocks at once
+        pool_size = max(self._max_connections, self._upload_workers * self._max_concurrency)
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+        return BlobServiceClient.from_connection_string(
+            connect.get('blob_connection_string'),
+            transport=RequestsTransport(session=session, session_owner=True)
         )
 
+
+    def _release_clients(self):
+        with self._client_lock:
+            if self._abs_service is not None:
+                self._abs_service.close()
+                self._abs_service = None
+                self._abs = None
+
+
     def _write_stream(self, stream:Stream):
         pass
-    
-    def _write_batch(self, stream:Stream, batch:List[Record], batch_index:int):
-       
-        # Write a batch of records to azure blob formatted as Parquet
-        abs_client = self._get_abs_client()
-
-        # write the parquet file
-        parquet_file_path = ObjectStoreBase._write_parquet(
-            stream,
-            batch,
-            parquet_config=self._config.get('parquet', {})
-        )
-        
-        # upload to azure
-        if self._format == 'staging':
-            parquet_abs_path = ObjectStoreBase.get_object_filename(
-                self._abs_config, 
-                self._ds.namespace, 
-                stream, 
-                self._dt,
-                self._batch_id, 
-                batch_index
-            )
-        elif self._format == 'hive':
-            parquet_abs_path = ObjectStoreBase.get_hive_filename(
-                self._abs_config, 
-                self._ds.namespace, 
-                stream, 
-                self._dt,
-                self._batch_id, 
-                batch_index
-            )
-
-        blob = abs_client.get_blob_client(parquet_abs_path)
-        with open(parquet_file_path, 'rb') as data:
-            blob.upload_blob(data, overwrite=True)
-
-        # clean up
-        os.remove(parquet_file_path)
+
+
+    @staticmethod
+    def _block_id(index:int) -> str:
+        # block ids of a blob must all have the same length
+        return base64.b64encode(f"{index:08d}".encode('utf-8')).decode('utf-8')
+
+
+    def _upload_blocks(self, blob, data):
+        # stage blocks concurrently while reading the next ones, then commit them in order
+        block_ids = []
+        pending = deque()
+        with ThreadPoolExecutor(self._max_concurrency, thread_name_prefix='pontoon-abs-block') as executor:
+            while True:
+                chunk = data.read(self._block_size)
+                if not chunk:
+                    break
+                block_id = ABSDestination._block_id(len(block_ids))
+                block_ids.append(block_id)
+                pending.append(executor.submit(blob.stage_block, block_id, chunk, length=len(chunk)))
+
+                # bound the blocks held in memory
+                if len(pending) >= self._max_concurrency:
+                    pending.popleft().result()
+
+            while pending:
+                pending.popleft().result()
+
+        blob.commit_block_list([BlobBlock(block_id=block_id) for block_id in block_ids])
+
+
+    def _upload_object(self, stream:Stream, obj:ParquetObject, batch_index:int):
+        # upload an encoded parquet file to azure blob, large files are staged as concurrent blocks
+        parquet_abs_path = self._object_filename(self._abs_config, stream, batch_index)
+
+        blob = self._get_abs_client().get_blob_client(parquet_abs_path)
+        size = obj.size
+        with obj.open() as data:
+            if size > self._block_threshold:
+                self._upload_blocks(blob, data)
+            else:
+                blob.upload_blob(data, length=size, overwrite=True)
    
 
     def integrity(self):
-        return ABSIntegrity(self._get_abs_client())    
+        return ABSIntegrity(
+            self._get_abs_client(),
+            self._written_objects(lambda stream, batch_index: self._object_filename(self._abs_config, stream, batch_index))
+        )    
@@ -1,9 +1,15 @@
 import json
+import threading
 from typing import List, Dict, Tuple, Generator, Any
+import pyarrow as pa
 from sqlalchemy import create_engine, inspect, MetaData, Table, text
+from google.cloud import bigquery
+from google.cloud.bigquery_storage_v1 import BigQueryWriteClient, types
+from google.oauth2 import service_account
 
+from pontoon.engine_registry import registry
 from pontoon.base import Destination, Dataset, Stream, Record, Progress, Mode
-from pontoon.base import DestinationConnectionFailed, DestinationStreamInvalidSchema
+from pontoon.base import DestinationError, DestinationConnectionFailed, DestinationStreamInvalidSchema
 
 from pontoon.source.sql_source import SQLUtil
 from pontoon.destination.sql_destination import SQLDestination
@@ -27,16 +33,21 @@ class BigQuerySQLUtil:
     
 
     @staticmethod
-    def merge(target_table_name:str, stage_table_name:str, cols:List[str], primary_key:str) -> str:
+    def merge(target_table_name:str, stage_table_name:str, cols:List[str], primary_key:str, checksum_field:str=None) -> str:
         s = SQLUtil.safe_identifier
         cols_str = ','.join([s(col) for col in cols])
         cols_stage_str = ','.join([f"stage.{s(col)}" for col in cols])
         update_set_str = ','.join([f"target.{s(col)}=stage.{s(col)}" for col in cols if col != primary_key])
 
+        # only rewrite matched rows whose content changed
+        matched_str = "WHEN MATCHED THEN "
+        if checksum_field:
+            matched_str = f"WHEN MATCHED AND target.{s(checksum_field)} IS DISTINCT FROM stage.{s(checksum_field)} THEN "
+
         merge_sql = f"MERGE INTO {s(target_table_name)} AS target "\
                     f"USING {s(stage_table_name)} AS stage "\
                     f"ON target.{s(primary_key)} = stage.{s(primary_key)} "\
-                    f"WHEN MATCHED THEN "\
+                    f"{matched_str}"\
                     f"UPDATE SET {update_set_str} "\
                     f"WHEN NOT MATCHED THEN "\
                     f"INSERT ({cols_str}) "\
@@ -45,10 +56,83 @@ class BigQuerySQLUtil:
         return merge_sql
 
 
+class BigQueryLoadUtil:
+    """ Helpers for BigQuery load jobs and Storage Write API appends """
+
+    # legacy type names, as reported by the tables API
+    ARROW_TO_BIGQUERY = [
+        (pa.types.is_boolean, 'BOOLEAN'),
+        (pa.types.is_integer, 'INTEGER'),
+        (pa.types.is_floating, 'FLOAT'),
+        (pa.types.is_decimal, 'NUMERIC'),
+        (pa.types.is_date, 'DATE'),
+        (pa.types.is_time, 'TIME'),
+        (pa.types.is_binary, 'BYTES'),
+        (pa.types.is_large_binary, 'BYTES'),
+    ]
+
+    TYPE_ALIASES = {
+        'INT64': 'INTEGER',
+        'FLOAT64': 'FLOAT',
+        'BOOL': 'BOOLEAN',
+        'BIGNUMERIC': 'NUMERIC'
+    }
+
+    # AppendRows requests are limited to 10MB, stay well below it
+    MAX_APPEND_BYTES = 8 * 1024 * 1024
+
+    # appends sent ahead of their acknowledgement
+    MAX_PENDING_APPENDS = 16
+
+
+    @staticmethod
+    def field_type(arrow_type:pa.DataType) -> str:
+        if pa.types.is_timestamp(arrow_type):
+            return 'TIMESTAMP' if arrow_type.tz is not None else 'DATETIME'
+        for check, bq_type in BigQueryLoadUtil.ARROW_TO_BIGQUERY:
+            if check(arrow_type):
+                return bq_type
+        return 'STRING'
+
+
+    @staticmethod
+    def schema_fields(schema:pa.Schema) -> List[bigquery.SchemaField]:
+        return [bigquery.SchemaField(field.name, BigQueryLoadUtil.field_type(field.type)) for field in schema]
+
+
+    @staticmethod
+    def schemas_match(existing:List[bigquery.SchemaField], expected:List[bigquery.SchemaField]) -> bool:
+        # compare names and types, ignoring column order and type name aliases
+        def normalize(fields):
+            aliases = BigQueryLoadUtil.TYPE_ALIASES
+            return {f.name.lower(): aliases.get(f.field_type.upper(), f.field_type.upper()) for f in fields}
+        return normalize(existing) == normalize(expected)
+
+
+    @staticmethod
+    def split_batch(batch:pa.RecordBatch, max_bytes:int) -> Generator[pa.RecordBatch, None, None]:
+        # slice a record batch into pieces that serialize to about max_bytes or less
+        if batch.num_rows == 0:
+            return
+        pieces = max(1, -(-batch.nbytes // max_bytes))
+        rows = max(1, -(-batch.num_rows // pieces))
+        for offset in range(0, batch.num_rows, rows):
+            yield batch.slice(offset, rows)
+
+
+
 class BigQueryDestination(SQLDestination):
     """ A Destination that writes to Big Query:
             - uses generic SQL layer for DDL operations (from SQLDestination)
-            - loads data from a GCS location 
+            - loads data into a staging table and MERGEs it into the target
+
+        The staging table is loaded according to the 'load_method' connect option:
+            - load_job (default): a load job from the GCS files with an explicit schema and
+              WRITE_TRUNCATE, the jobs for every stream are started before any is waited on
+            - storage_write: streams of up to storage_write_max_rows rows are appended from the
+              cached Arrow batches with the Storage Write API and skip GCS entirely, larger
+              streams fall back to a load job
+            - sql: LOAD DATA OVERWRITE through the SQL engine
     """
 
     def __init__(self, config):
@@ -56,110 +140,330 @@ class BigQueryDestination(SQLDestination):
 
         connect = config.get('connect')
         self._gcs_config = GCSConfig(connect)
+        self._project_id = connect.get('project_id')
+
+        self._load_method = connect.get('load_method', 'load_job')
+        self._storage_write_max_rows = connect.get('storage_write_max_rows', 1000000)
+        if self._load_method not in ['load_job', 'storage_write', 'sql']:
+            raise DestinationError(f"BigQuery (destination-bigquery) does not support load method '{self._load_method}'")
 
         # big query connection
         auth_type = connect.get('auth_type')
         if auth_type == 'service_account':       
-            self._engine = create_engine(
-                f"bigquery://{connect['project_id']}", 
-                credentials_info=json.loads(connect['service_account'])
+            url = f"bigquery://{connect['project_id']}"
+            self._credentials_info = json.loads(connect['service_account'])
+            self._engine = registry.get(
+                type(self).__name__,
+                connect,
+                lambda: create_engine(
+                    url, 
+                    credentials_info=self._credentials_info,
+                    **registry.pool_options(url, self._max_connections(connect))
+                )
             )
         else:
             raise Exception(f"BigQuery (destination-bigquery) does not support auth type '{auth_type}'")
 
+        self._client = None
+        self._write_client = None
+        self._client_lock = threading.Lock()
+
+
+    def _get_client(self) -> bigquery.Client:
+        # one jobs API client per destination, it is thread-safe
+        with self._client_lock:
+            if self._client is None:
+                credentials = service_account.Credentials.from_service_account_info(self._credentials_info)
+                self._client = bigquery.Client(project=self._project_id, credentials=credentials)
+            return self._client
+
+
+    def _get_write_client(self):
+        with self._client_lock:
+            if self._write_client is None:
+                credentials = service_account.Credentials.from_service_account_info(self._credentials_info)
+                self._write_client = BigQueryWriteClient(credentials=credentials)
+            return self._write_client
+
+
+    def _table_id(self, schema_name:str, table_name:str) -> str:
+        return f"{self._project_id}.{schema_name}.{table_name}"
+
+
+    def _writes_directly(self, ds:Dataset, stream:Stream) -> bool:
+        # small and medium streams go through the Storage Write API when configured
+        return self._load_method == 'storage_write' and ds.size(stream) <= self._storage_write_max_rows
+
+
+    def prepare(self, ds:Dataset):
+        # streams written with the Storage Write API don't need files from the GCS leg
+        skip = ds.meta.setdefault('skip_streams', set())
+        for stream in ds.streams:
+            if self._writes_directly(ds, stream):
+                skip.add(f"{stream.schema_name}.{stream.name}")
+
+
+    def _start_load_job(self, ds:Dataset, stream:Stream, stage_table_name:str):
+        # load the stream's GCS files into the staging table, the job runs asynchronously
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.PARQUET,
+            write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+            create_disposition=bigquery.CreateDisposition.CREATE_IF_NEEDED,
+            schema=BigQueryLoadUtil.schema_fields(stream.schema)
+        )
+        uri = GCSDestination.get_object_path_uri(
+            self._gcs_config,
+            ds.namespace,
+            stream,
+            ds.meta.get('dt'),
+            ds.meta.get('batch_id')
+        )
+        return self._get_client().load_table_from_uri(
+            f"{uri}*.parquet",
+            self._table_id(stream.schema_name, stage_table_name),
+            job_config=job_config
+        )
+
+
+    def _storage_write(self, ds:Dataset, stream:Stream, stage_table_name:str):
+        # append the cached arrow batches to a fresh staging table through a pending write stream
+        client = self._get_client()
+        table_id = self._table_id(stream.schema_name, stage_table_name)
+        client.delete_table(table_id, not_found_ok=True)
+        client.create_table(bigquery.Table(table_id, schema=BigQueryLoadUtil.schema_fields(stream.schema)))
+
+        write_client = self._get_write_client()
+        parent = write_client.table_path(self._project_id, stream.schema_name, stage_table_name)
+        write_stream = write_client.create_write_stream(
+            parent=parent,
+            write_stream=types.WriteStream(type_=types.WriteStream.Type.PENDING)
+        )
+
+        # the bidi AppendRows call takes Arrow rows directly, the writer.AppendRowsStream
+        # helper of this client version only handles proto rows and rewrites its template
+        serialized_schema = stream.schema.serialize().to_pybytes()
+        pending = threading.Semaphore(BigQueryLoadUtil.MAX_PENDING_APPENDS)
+        stopped = threading.Event()
+
+        def requests():
+            offset = 0
+            for batch in ds.read_batches(stream):
+                if batch.schema != stream.schema:
+                    batch = pa.Table.from_batches([batch]).cast(stream.schema).combine_chunks().to_batches()[0]
+                for piece in BigQueryLoadUtil.split_batch(batch, BigQueryLoadUtil.MAX_APPEND_BYTES):
+                    request = types.AppendRowsRequest(
+                        offset=offset,
+                        arrow_rows=types.AppendRowsRequest.ArrowData(
+                            rows=types.ArrowRecordBatch(
+                                serialized_record_batch=piece.serialize().to_pybytes(),
+                                row_count=piece.num_rows
+                            )
+                        )
+                    )
+                    if offset == 0:
+                        # the first request of the connection names the stream and its schema
+                        request.write_stream = write_stream.name
+                        request.arrow_rows.writer_schema = types.ArrowSchema(serialized_schema=serialized_schema)
+
+                    # bound the number of unacknowledged appends
+                    pending.acquire()
+                    if stopped.is_set():
+                        return
+                    yield request
+                    offset += piece.num_rows
+
+        responses = write_client.append_rows(requests=requests())
+        try:
+            for response in responses:
+                pending.release()
+                if response.error.code != 0:
+                    raise DestinationError(f"Storage Write API append failed for {stream.name}: {response.error.message}")
+                if response.row_errors:
+                    raise DestinationError(f"Storage Write API rejected rows for {stream.name}: {response.row_errors[0].message}")
+        except Exception:
+            # end the call and let a request iterator waiting on an acknowledgement return
+            stopped.set()
+            pending.release()
+            responses.cancel()
+            raise
+
+        write_client.finalize_write_stream(name=write_stream.name)
+        commit = write_client.batch_commit_write_streams(
+            types.BatchCommitWriteStreamsRequest(parent=parent, write_streams=[write_stream.name])
+        )
+        if commit.stream_errors:
+            raise DestinationError(f"Storage Write API commit failed for {stream.name}: {commit.stream_errors[0].error_message}")
+
+
+    def _load_stage(self, conn, ds:Dataset, stream:Stream, stage_table_name:str):
+        # LOAD DATA through the SQL engine, the original load path
+        load_sql = BigQuerySQLUtil.load_from_gcs(
+            f"{stream.schema_name}.{stage_table_name}",
+            GCSDestination.get_object_path_uri(
+                self._gcs_config, 
+                ds.namespace, 
+                stream,
+                ds.meta.get('dt'),
+                ds.meta.get('batch_id')
+            )
+        )
+
+        # Drop staging table if it happens to exist from previous failed load
+        # BQ does not support TEMP tables, so we use a real table - can't assume it will be cleaned up
+        SQLDestination.drop_table(conn, f"{stream.schema_name}.{stage_table_name}")
+        with conn.begin():
+            conn.execute(text(load_sql))
+
+
+    def _ensure_target(self, conn, insp, metadata_obj, stream:Stream, target_table_name:str, stage_table_name:str):
+        # create the target like the stage and check that their schemas are compatible
+        if self._load_method == 'sql':
+            create_target_sql = BigQuerySQLUtil.create_table_if_not_exists(f"{stream.schema_name}.{stage_table_name}", target_table_name)
+            with conn.begin():
+                conn.execute(text(create_target_sql))
+
+            target_table = Table(stream.name, metadata_obj, schema=stream.schema_name, autoload_with=insp)
+            target_table_schema = SQLDestination.table_ddl_to_schema(target_table.columns)
+
+            stage_table = Table(stage_table_name, metadata_obj, schema=stream.schema_name, autoload_with=insp)
+            stage_table_schema = SQLDestination.table_ddl_to_schema(stage_table.columns)
+
+            # Use flexible schema comparison that ignores column order
+            compatible = SQLDestination.schemas_compatible(target_table_schema, stage_table_schema)
+            if not compatible and SQLDestination.missing_checksum(stage_table_schema, target_table_schema):
+                # skip_unchanged was turned on for a table loaded without checksums
+                with conn.begin():
+                    conn.execute(text(
+                        f"ALTER TABLE {SQLUtil.safe_identifier(target_table_name)} "
+                        f"ADD COLUMN {SQLDestination.CHECKSUM_FIELD} STRING"
+                    ))
+                compatible = True
+        else:
+            # the schema is explicit, no need to reflect either table
+            expected = BigQueryLoadUtil.schema_fields(stream.schema)
+            target = self._get_client().create_table(
+                bigquery.Table(self._table_id(stream.schema_name, stream.name), schema=expected),
+                exists_ok=True
+            )
+            compatible = BigQueryLoadUtil.schemas_match(target.schema, expected)
+            checksum = [field for field in expected if field.name == SQLDestination.CHECKSUM_FIELD]
+            if not compatible and checksum and BigQueryLoadUtil.schemas_match(target.schema, [f for f in expected if f not in checksum]):
+                # skip_unchanged was turned on for a table loaded without checksums
+                target.schema = list(target.schema) + checksum
+                self._get_client().update_table(target, ['schema'])
+                compatible = True
+
+        if not compatible:
+            raise DestinationStreamInvalidSchema(f"Existing schema for stream {stream.name} does not match.")
+
     
     def write(self, ds:Dataset, progress_callback = None):
         # Write a dataset to the destination database 
         self._ds = ds
 
-        with self._connect() as conn:
+        progresses = {}
+        streams = []
+        for stream in ds.streams:
 
-            insp = inspect(conn)
-            metadata_obj = MetaData()
+            # configure progress tracking
+            progress = Progress(
+                f"destination+bigquery://{ds.namespace}/{stream.schema_name}/{stream.name}",
+                total=ds.size(stream),
+                processed=0
+            )
+            if callable(progress_callback):
+                progress.subscribe(progress_callback)
+
+            # Check if there are any records to process
+            stream_size = ds.size(stream)
+            if stream_size == 0:
+                progress.message("No records to process for this stream")
+                continue
+
+            progresses[id(stream)] = progress
+            streams.append(stream)
+
+        # start the load jobs of every stream up front, BigQuery runs them in parallel
+        load_jobs = {}
+        if self._load_method != 'sql':
+            for stream in streams:
+                if not self._writes_directly(ds, stream):
+                    progresses[id(stream)].message("Starting load job from GCS")
+                    load_jobs[id(stream)] = self._start_load_job(ds, stream, f"__temp_{stream.name}")
+
+        try:
+            # merge each stream, optionally several at once on separate connections
+            self._write_streams(
+                streams,
+                lambda stream: self._write_stream(ds, stream, progresses[id(stream)], load_jobs.pop(id(stream), None))
+            )
+        finally:
+            # don't leave load jobs running for streams that were never reached
+            for job in list(load_jobs.values()):
+                job.cancel()
 
-            for stream in ds.streams:
 
-                # configure progress tracking
-                progress = Progress(
-                    f"destination+bigquery://{ds.namespace}/{stream.schema_name}/{stream.name}",
-                    total=ds.size(stream),
-                    processed=0
-                )
-                if callable(progress_callback):
-                    progress.subscribe(progress_callback)
-
-                # Check if there are any records to process
-                stream_size = ds.size(stream)
-                if stream_size == 0:
-                    progress.message("No records to process for this stream")
-                    continue
-
-                # staging and target table names
-                target_table_name = f"{stream.schema_name}.{stream.name}"
-                stage_table_name = f"{stream.schema_name}.__temp_{stream.name}"
-
-                # sql to load to staging from gcs
-                load_sql = BigQuerySQLUtil.load_from_gcs(
-                    stage_table_name,
-                    GCSDestination.get_object_path_uri(
-                        self._gcs_config, 
-                        ds.namespace, 
-                        stream,
-                        self._ds.meta.get('dt'),
-                        self._ds.meta.get('batch_id')
-                    )
-                )
+    def _write_stream(self, ds:Dataset, stream:Stream, progress:Progress, load_job=None):
+        try:
+            self._load_and_merge(ds, stream, progress, load_job)
+        except Exception:
+            # the stream's load job may still be running, nothing would merge what it loads
+            if load_job is not None:
+                load_job.cancel()
+            raise
 
-                # delete records depending on sync mode
-                if self._mode.type == Mode.FULL_REFRESH:
-                    progress.message("Dropping target table")
-                    SQLDestination.drop_table(conn, target_table_name)
 
-                # Drop staging table if it happens to exist from previous failed load
-                # BQ does not support TEMP tables, so we use a real table - can't assume it will be cleaned up
-                SQLDestination.drop_table(conn, stage_table_name)
+    def _load_and_merge(self, ds:Dataset, stream:Stream, progress:Progress, load_job=None):
 
-                progress.message("Running LOAD from GCS")
-                with conn.begin():
-                    conn.execute(text(load_sql))
+        with self._connect() as conn:
 
-                create_target_sql = BigQuerySQLUtil.create_table_if_not_exists(stage_table_name, target_table_name)
-                progress.message("Ensuring target table exists")
-                with conn.begin():
-                    conn.execute(text(create_target_sql))
+            insp = inspect(conn)
+            metadata_obj = MetaData()
 
+            # staging and target table names
+            target_table_name = f"{stream.schema_name}.{stream.name}"
+            stage_name = f"__temp_{stream.name}"
+            stage_table_name = f"{stream.schema_name}.{stage_name}"
 
-                # Check that target and stage schemas are compatible 
-                target_table = Table(stream.name, metadata_obj, schema=stream.schema_name, autoload_with=insp)
-                target_table_schema = SQLDestination.table_ddl_to_schema(target_table.columns)
+            # delete records depending on sync mode
+            if self._mode.type == Mode.FULL_REFRESH:
+                progress.message("Dropping target table")
+                SQLDestination.drop_table(conn, target_table_name)
 
-                stage_table = Table(f"__temp_{stream.name}", metadata_obj, schema=stream.schema_name, autoload_with=insp)
-                stage_table_schema = SQLDestination.table_ddl_to_schema(stage_table.columns)
+            if self._load_method == 'sql':
+                progress.message("Running LOAD from GCS")
+                self._load_stage(conn, ds, stream, stage_name)
+            elif load_job is not None:
+                progress.message("Waiting for load job")
+                load_job.result()
+            else:
+                progress.message("Writing with the Storage Write API")
+                self._storage_write(ds, stream, stage_name)
+
+            progress.message("Ensuring target table exists")
+            self._ensure_target(conn, insp, metadata_obj, stream, target_table_name, stage_name)
             
-                # Use flexible schema comparison that ignores column order
-                if not SQLDestination.schemas_compatible(target_table_schema, stage_table_schema):
-                    raise DestinationStreamInvalidSchema(f"Existing schema for stream {stream.name} does not match.")
+            # sql to MERGE the staging table into the target table
+            merge_sql = BigQuerySQLUtil.merge(
+                target_table_name,
+                stage_table_name,
+                stream.schema.names,
+                stream.primary_field,
+                SQLDestination.checksum_field(stream)
+            )
 
+            progress.message("Merging data into target table")
+            with conn.begin(): 
+                result = conn.execute(text(merge_sql))
+                self._count_unchanged(stream, ds.size(stream), result.rowcount)
                 
-                # sql to MERGE the staging table into the target table
-                merge_sql = BigQuerySQLUtil.merge(
-                    target_table_name,
-                    stage_table_name,
-                    stream.schema.names,
-                    stream.primary_field
-                )
+            SQLDestination.drop_table(conn, stage_table_name)
 
-                progress.message("Merging data into target table")
-                with conn.begin(): 
-                    conn.execute(text(merge_sql))
-                    
-                SQLDestination.drop_table(conn, stage_table_name)
-
-                 # drop target table after loading?
-                if self._drop_after_complete == True:
-                    SQLDestination.drop_table(conn, target_table_name)
-                    
-                progress.update(ds.size(stream))
+             # drop target table after loading?
+            if self._drop_after_complete == True:
+                SQLDestination.drop_table(conn, target_table_name)
+                
+            progress.update(ds.size(stream))
 
     
     def close(self):
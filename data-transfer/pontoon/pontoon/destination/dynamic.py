@@ -1,14 +1,22 @@
 from typing import List
-from pontoon.base import Destination, Dataset
+from concurrent.futures import ThreadPoolExecutor
+from pontoon import logger
+from pontoon.base import Destination, Dataset, DestinationError
+from pontoon.destination.object_store_base import ObjectStoreBase
 
 
 def create_multi_destination(destinations:List[Destination]=[]):
 
     class MultiDestination(Destination):
-        """ 
-            A virtual Destination that wraps multiple Destinations 
-        
+        """
+            A virtual Destination that wraps multiple Destinations
+
             The config object needs to be the union of settings for all destinations.
+
+            Object store legs are written first and the legs that load from them after,
+            legs within each group don't depend on each other and run concurrently.
+            Object store legs with the same file layout share a single read and encode
+            pass over the cache.
         """
 
         def __init__(self, config):
@@ -16,28 +24,66 @@ def create_multi_destination(destinations:List[Destination]=[]):
             connect = config.get('connect')
             self._target_schema = connect.get('target_schema')
             self._destinations = [dest_cls(config) for dest_cls in destinations]
-        
-        
+
+            # legs that write files, and the legs that load from them
+            self._stores = []
+            self._loaders = []
+            for dest in self._destinations:
+                if isinstance(dest, ObjectStoreBase):
+                    if not any(store.share_objects(dest) for store in self._stores):
+                        self._stores.append(dest)
+                else:
+                    self._loaders.append(dest)
+
+
         def integrity(self):
             return self._destinations[-1].integrity()
 
 
+        @staticmethod
+        def _write_legs(legs:List[Destination], ds:Dataset, progress_callback=None):
+            # write independent legs at once and report every failure
+            if len(legs) == 1:
+                legs[0].write(ds, progress_callback=progress_callback)
+                return
+
+            errors = []
+            with ThreadPoolExecutor(max_workers=max(1, len(legs)), thread_name_prefix='pontoon-leg') as executor:
+                futures = [(dest, executor.submit(dest.write, ds, progress_callback=progress_callback)) for dest in legs]
+                for dest, future in futures:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        logger.error(f"Destination leg {type(dest).__name__} failed: {e}")
+                        errors.append((dest, e))
+
+            if len(errors) == 1:
+                raise errors[0][1]
+            if errors:
+                details = '; '.join([f"{type(dest).__name__}: {e}" for dest, e in errors])
+                raise DestinationError(f"{len(errors)} destination legs failed: {details}") from errors[0][1]
+
+
         def write(self, ds:Dataset, progress_callback=None):
             if self._target_schema:
                 for stream in ds.streams:
                     ds.rename_stream(
-                        stream.name, 
+                        stream.name,
                         stream.schema_name,
                         stream.name,           # keep the existing table name
                         self._target_schema,   # new schema name
                     )
 
             for dest in self._destinations:
-                dest.write(ds, progress_callback=progress_callback)
-        
+                dest.prepare(ds)
+
+            # files have to be in place before anything loads them
+            for legs in [self._stores, self._loaders]:
+                if legs:
+                    MultiDestination._write_legs(legs, ds, progress_callback)
+
         def close(self):
             pass
 
 
     return MultiDestination
-
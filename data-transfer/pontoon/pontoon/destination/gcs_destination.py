@@ -2,10 +2,15 @@ import os
 import json
 import tempfile
 from typing import List, Dict, Any
+import pyarrow as pa
+import requests
 from google.cloud import storage
+from google.oauth2 import service_account
+from google.auth.transport.requests import AuthorizedSession
 from pontoon.base import Namespace, Destination, Stream, Dataset, Record, Progress
 from pontoon.base import DestinationError
 from pontoon.destination import ObjectStoreBase
+from pontoon.destination.object_store_base import ParquetObject
 from pontoon.destination.integrity import GCSIntegrity
 
 
@@ -35,64 +40,79 @@ class GCSDestination(ObjectStoreBase):
         # our GCS config
         self._gcs_config = GCSConfig(connect)
 
-        # parquet config
-        self._parquet_config = connect.get('parquet', {})
-
         # our GCP service account
         with tempfile.NamedTemporaryFile(mode='w', suffix=".json", delete=False) as temp_file:
             temp_file.write(connect.get('service_account'))
             self._service_account_file = temp_file.name
 
+        self._gcs = None
+
+        # files above the threshold are sent as resumable uploads in chunks (a multiple of 256KB)
+        self._resumable_threshold = connect.get('resumable_threshold_mb', 8) * 1024 * 1024
+        self._chunk_size = connect.get('chunk_size_mb', 16) * 1024 * 1024
+
         if self._format not in ['staging', 'hive']:
             raise DestinationError(f'Format {self._format} is not supported by GCS')
     
     
+    def _get_gcs_client(self):
+        # the storage client is shared by every batch (and upload thread) of a write
+        with self._client_lock:
+            if self._gcs is None:
+                self._gcs = self._create_gcs_client()
+            return self._gcs
+
+
+    def _create_gcs_client(self):
+        credentials = service_account.Credentials.from_service_account_file(
+            self._service_account_file,
+            scopes=['https://www.googleapis.com/auth/devstorage.read_write']
+        )
+
+        # the default requests pool keeps 10 connections per host, size it for concurrent uploads
+        session = AuthorizedSession(credentials)
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self._max_connections,
+            pool_maxsize=self._max_connections
+        )
+        session.mount('https://', adapter)
+
+        return storage.Client(
+            project=credentials.project_id,
+            credentials=credentials,
+            _http=session
+        )
+
+
+    def _release_clients(self):
+        with self._client_lock:
+            if self._gcs is not None:
+                self._gcs.close()
+                self._gcs = None
+
+
     def _write_stream(self, stream:Stream):
         pass
 
 
-    def _write_batch(self, stream:Stream, batch:List[Record], batch_index:int):
-        # Write a batch of records to GCS formatted as Parquet
-        
-        gcs = storage.Client.from_service_account_json(self._service_account_file)
-        bucket = gcs.bucket(self._gcs_config.bucket_name)
+    def _upload_object(self, stream:Stream, obj:ParquetObject, batch_index:int):
+        # upload an encoded parquet file to GCS, large files use chunked resumable uploads
+        parquet_gcs_path = self._object_filename(self._gcs_config, stream, batch_index)
 
-        # write the parquet file
-        parquet_file_path = ObjectStoreBase._write_parquet(
-            stream,
-            batch,
-            parquet_config=self._parquet_config
-        )
-        
-        # upload to GCS
-        if self._format == 'staging':
-            parquet_gcs_path = ObjectStoreBase.get_object_filename(
-                self._gcs_config, 
-                self._ds.namespace, 
-                stream, 
-                self._dt, 
-                self._batch_id,
-                batch_index
-            )
-        elif self._format == 'hive':
-            parquet_gcs_path = ObjectStoreBase.get_hive_filename(
-                self._gcs_config, 
-                self._ds.namespace, 
-                stream, 
-                self._dt, 
-                self._batch_id,
-                batch_index
-            )
-
-
-        blob = bucket.blob(parquet_gcs_path)
-        blob.upload_from_filename(parquet_file_path)
-        
-        # clean up
-        os.remove(parquet_file_path)
+        bucket = self._get_gcs_client().bucket(self._gcs_config.bucket_name)
+        size = obj.size
+        if size > self._resumable_threshold:
+            blob = bucket.blob(parquet_gcs_path, chunk_size=self._chunk_size)
+        else:
+            blob = bucket.blob(parquet_gcs_path)
+
+        with obj.open() as data:
+            blob.upload_from_file(data, size=size, rewind=True)
    
 
     def integrity(self):
         return GCSIntegrity(
-            storage.Client.from_service_account_json(self._service_account_file)
+            self._get_gcs_client(),
+            self._gcs_config.bucket_name,
+            self._written_objects(lambda stream, batch_index: self._object_filename(self._gcs_config, stream, batch_index))
         )
\ No newline at end of file
@@ -1,16 +1,113 @@
 import time
 from typing import List, Dict, Any
 from datetime import datetime
+from urllib.parse import unquote
 
 import boto3
+import pyarrow as pa
+from botocore.exceptions import ClientError
 
-from pontoon.base import Destination, Stream, Dataset, Record, Progress
+from pontoon import logger
+from pontoon.base import Destination, Stream, Dataset, Record, Progress, DestinationError
 from pontoon.destination.s3_destination import S3Destination, S3Config
+from pontoon.destination.object_store_base import HivePartitioning
 from pontoon.destination.integrity import SQLIntegrity
 
 
+class GlueCatalogUtil:
+    """ A class to help build Glue Data Catalog table and partition definitions """
+
+    PARQUET_INPUT_FORMAT = 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat'
+    PARQUET_OUTPUT_FORMAT = 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat'
+    PARQUET_SERDE = 'org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe'
+
+    # batch_create_partition accepts at most 100 partitions per call
+    MAX_PARTITIONS = 100
+
+
+    @staticmethod
+    def column_type(arrow_type:pa.DataType) -> str:
+        # map an arrow type to a Hive type name
+        if pa.types.is_boolean(arrow_type):
+            return 'boolean'
+        if pa.types.is_int8(arrow_type) or pa.types.is_uint8(arrow_type):
+            return 'tinyint'
+        if pa.types.is_int16(arrow_type) or pa.types.is_uint16(arrow_type):
+            return 'smallint'
+        if pa.types.is_int32(arrow_type):
+            return 'int'
+        if pa.types.is_integer(arrow_type):
+            return 'bigint'
+        if pa.types.is_float16(arrow_type) or pa.types.is_float32(arrow_type):
+            return 'float'
+        if pa.types.is_float64(arrow_type):
+            return 'double'
+        if pa.types.is_decimal(arrow_type):
+            return f"decimal({arrow_type.precision},{arrow_type.scale})"
+        if pa.types.is_timestamp(arrow_type):
+            return 'timestamp'
+        if pa.types.is_date(arrow_type):
+            return 'date'
+        if pa.types.is_binary(arrow_type) or pa.types.is_large_binary(arrow_type):
+            return 'binary'
+        return 'string'
+
+
+    @staticmethod
+    def columns(schema:pa.Schema, exclude:List[str]=[]) -> List[Dict[str, str]]:
+        return [
+            {'Name': field.name.lower(), 'Type': GlueCatalogUtil.column_type(field.type)}
+            for field in schema if field.name not in exclude
+        ]
+
+
+    @staticmethod
+    def storage_descriptor(location:str, columns:List[Dict[str, str]]) -> Dict[str, Any]:
+        return {
+            'Columns': columns,
+            'Location': location,
+            'InputFormat': GlueCatalogUtil.PARQUET_INPUT_FORMAT,
+            'OutputFormat': GlueCatalogUtil.PARQUET_OUTPUT_FORMAT,
+            'SerdeInfo': {'SerializationLibrary': GlueCatalogUtil.PARQUET_SERDE},
+            'Compressed': False
+        }
+
+
+    @staticmethod
+    def table_input(name:str, location:str, schema:pa.Schema, partition_keys:List[str]=[]) -> Dict[str, Any]:
+        # an external parquet table, partition keys are string columns derived from the path
+        return {
+            'Name': name.lower(),
+            'TableType': 'EXTERNAL_TABLE',
+            'Parameters': {'classification': 'parquet', 'EXTERNAL': 'TRUE'},
+            'StorageDescriptor': GlueCatalogUtil.storage_descriptor(
+                location,
+                GlueCatalogUtil.columns(schema, exclude=partition_keys)
+            ),
+            'PartitionKeys': [{'Name': key.lower(), 'Type': 'string'} for key in partition_keys]
+        }
+
+
+    @staticmethod
+    def partition_input(values:List[str], location:str, schema:pa.Schema, partition_keys:List[str]=[]) -> Dict[str, Any]:
+        return {
+            'Values': values,
+            'StorageDescriptor': GlueCatalogUtil.storage_descriptor(
+                location,
+                GlueCatalogUtil.columns(schema, exclude=partition_keys)
+            )
+        }
+
+
+
 class GlueDestination(Destination):
-    """ A Destination that crawls Glue Catalog tables from S3 """
+    """ A Destination that registers Glue Catalog tables for data written to S3
+
+        Tables and partitions are created or updated directly from the stream schema
+        and the object paths of the S3 leg. With 'catalog_method' set to 'crawler' in
+        the connect config, or when direct registration fails, an ephemeral Glue
+        crawler is run over the stream prefixes instead.
+    """
 
     def __init__(self, config):
         self._config = config
@@ -22,20 +119,27 @@ class GlueDestination(Destination):
         self._glue_iam_role = connect['glue_iam_role']
         self._glue_database = connect['glue_database']
         self._progress_callback = None
-        
+
+        # 'direct' registers tables through the catalog API, 'crawler' always crawls
+        self._catalog_method = connect.get('catalog_method', 'direct')
+
+        # layout of the S3 leg, hive partitions are dt=YYYY-MM-DD or the partition_by columns
+        self._format = connect.get('format', 'staging').lower()
+        self._partitioning = HivePartitioning(connect.get('partition_by'))
+
         # our s3 config
         self._s3_config = S3Config(connect)
 
-    
+
     def _get_glue_client(self):
         # Get the Glue client based on auth type
 
         connect = self._config.get('connect')
         auth_type = connect.get('auth_type')
-        
+
         if auth_type not in ['credentials']:
             raise Exception(f"GlueDestination (destination-glue) does not support auth type '{auth_type}'")
-        
+
         return boto3.client(
             'glue',
             aws_access_key_id=connect.get('aws_access_key_id'),
@@ -47,21 +151,85 @@ class GlueDestination(Destination):
     def _get_crawler_name(self):
         return f"PontoonGlueDestination_{self._ds.namespace.name}_{str(int(datetime.now().timestamp()*1000))}"
 
-       
+
+    def _upsert_table(self, glue, table_input:Dict[str, Any]):
+        # create the table, or update it in place so the schema follows the stream
+        try:
+            glue.create_table(DatabaseName=self._glue_database, TableInput=table_input)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'AlreadyExistsException':
+                raise
+            glue.update_table(DatabaseName=self._glue_database, TableInput=table_input)
+
+
+    def _create_partitions(self, glue, table_name:str, partitions:List[Dict[str, Any]]):
+        # register partitions, those that already exist are left as they are
+        for i in range(0, len(partitions), GlueCatalogUtil.MAX_PARTITIONS):
+            response = glue.batch_create_partition(
+                DatabaseName=self._glue_database,
+                TableName=table_name,
+                PartitionInputList=partitions[i:i + GlueCatalogUtil.MAX_PARTITIONS]
+            )
+            errors = [
+                error for error in response.get('Errors', [])
+                if error['ErrorDetail']['ErrorCode'] != 'AlreadyExistsException'
+            ]
+            if errors:
+                raise DestinationError(f"Could not create Glue partitions for {table_name}: {errors[0]['ErrorDetail']['ErrorMessage']}")
+
+
+    def _register_stream(self, glue, stream:Stream):
+        dt = self._ds.meta.get('dt')
+        batch_id = self._ds.meta.get('batch_id')
+
+        if self._format == 'hive':
+            # the table spans every partition of the stream, the S3 leg lists the ones it wrote
+            if self._partitioning.applies(stream.schema):
+                keys = self._partitioning.keys
+                schema = self._partitioning.file_schema(stream.schema)
+                partitions = self._ds.meta.get('hive_partitions', {}).get(f"{stream.schema_name}.{stream.name}", [])
+            else:
+                keys = ['dt']
+                schema = stream.schema
+                partitions = [(('dt', dt.strftime('%Y-%m-%d')),)]
+
+            table_uri = S3Destination.get_hive_path_uri(self._s3_config, self._ds.namespace, stream, dt, batch_id, ())
+            self._upsert_table(glue, GlueCatalogUtil.table_input(stream.name, table_uri, schema, keys))
+            self._create_partitions(glue, stream.name.lower(), [
+                GlueCatalogUtil.partition_input(
+                    [unquote(value) for _, value in partition],
+                    S3Destination.get_hive_path_uri(self._s3_config, self._ds.namespace, stream, dt, batch_id, partition),
+                    schema,
+                    keys
+                ) for partition in partitions
+            ])
+        else:
+            # staging layout, the table points at the latest batch like a crawl of its prefix would
+            table_uri = S3Destination.get_object_path_uri(self._s3_config, self._ds.namespace, stream, dt, batch_id)
+            self._upsert_table(glue, GlueCatalogUtil.table_input(stream.name, table_uri, stream.schema))
+
+
+    def _register(self):
+        # create or update the catalog entries of every stream directly
+        glue = self._get_glue_client()
+        for stream in self._ds.streams:
+            self._register_stream(glue, stream)
+
+
     def _crawl(self):
         # Run an ephemeral Glue crawler to update the Glue catalog
         glue = self._get_glue_client()
-        crawler_name = self._get_crawler_name() 
-        
+        crawler_name = self._get_crawler_name()
+
         # crawl each stream prefix to create separate tables
         stream_paths = [
             {"Path": S3Destination.get_object_path_uri(
-                self._s3_config, 
-                self._ds.namespace, 
+                self._s3_config,
+                self._ds.namespace,
                 stream,
-                self._ds.meta('dt'),
-                self._ds.meta('batch_id')
-            )} for stream in self._ds.streams 
+                self._ds.meta.get('dt'),
+                self._ds.meta.get('batch_id')
+            )} for stream in self._ds.streams
         ]
 
         # create the crawler and start it
@@ -80,7 +248,7 @@ class GlueDestination(Destination):
             if state == 'READY':
                 break
             time.sleep(10)
-        
+
         # clean up
         glue.delete_crawler(Name=crawler_name)
 
@@ -89,7 +257,7 @@ class GlueDestination(Destination):
         # TODO: should return a SQLIntegrity() configured with Athena
         raise NotImplementedError("Glue Integrity checks not implemented")
 
-    
+
     def write(self, ds:Dataset, progress_callback=None):
         # Write a dataset to Glue
         self._ds = ds
@@ -99,9 +267,17 @@ class GlueDestination(Destination):
         else:
             self._progress_callback = lambda *args, **kwargs: None
 
-        # run glue crawler to update the catalog
-        self._crawl()
+        if self._catalog_method == 'crawler':
+            self._crawl()
+            return
+
+        # register tables directly, the crawler is only a fallback
+        try:
+            self._register()
+        except (ClientError, DestinationError) as e:
+            logger.warning(f"Direct Glue catalog registration failed, falling back to a crawler: {e}")
+            self._crawl()
 
 
     def close(self):
-        pass
\ No newline at end of file
+        pass
@@ -1,4 +1,10 @@
+import io
+from abc import abstractmethod
+from typing import Dict, List, Tuple, Callable
+import pyarrow.parquet as pq
 from sqlalchemy import text
+from botocore.exceptions import ClientError
+from azure.core.exceptions import ResourceNotFoundError
 from pontoon.base import Integrity, Stream, Dataset, Destination
 
 
@@ -13,63 +19,223 @@ class MockIntegrity(Integrity):
 
 
 class SQLIntegrity(Integrity):
-    """ Integrity checker for SQL based destinations """
-    
-    def __init__(self, engine, prefix='pontoon__'):
+    """ Integrity checker for SQL based destinations
+
+    Counts the rows of the batch in every stream's table with one UNION ALL query
+    per max_streams streams instead of a query per stream.
+    """
+
+    def __init__(self, engine, prefix='pontoon__', unchanged:dict=None, max_streams:int=50):
         self._engine = engine
         self._prefix = prefix
+        # rows per stream a checksum merge skipped, they keep the batch_id of an earlier load
+        self._unchanged = unchanged or {}
+        self._max_streams = max_streams
+
+    def batch_count_sql(self, streams:List[Stream], batch_id:str) -> str:
+        # one row (stream index, count) per stream
+        return ' UNION ALL '.join([
+            f"SELECT {i} AS stream_index, COUNT(1) AS batch_count FROM {stream.schema_name}.{stream.name} "
+            f"WHERE {self._prefix}batch_id='{batch_id}'"
+            for i, stream in enumerate(streams)
+        ])
 
     def check_batch_volume(self, ds:Dataset):
+        # streams without records were not loaded, their tables may not exist
+        streams = [stream for stream in ds.streams if ds.size(stream) > 0]
+
         with self._engine.connect() as conn:
-            for stream in ds.streams:
-                result = conn.execute(text(f"SELECT COUNT(1) FROM {stream.schema_name}.{stream.name} WHERE {self._prefix}batch_id='{ds.meta.get('batch_id')}'"))
-                batch_count = result.scalar_one()
-                stream_size = ds.size(stream)
-                if stream_size != batch_count:
-                    raise Exception(
-                        f"Integrity check failed for {stream.schema_name}.{stream.name}: "
-                        f"loaded={batch_count}, expected={stream_size}"
-                    )
-
-class S3Integrity(Integrity):
+            for offset in range(0, len(streams), self._max_streams):
+                chunk = streams[offset:offset + self._max_streams]
+                counts = dict(conn.execute(text(self.batch_count_sql(chunk, ds.meta.get('batch_id')))).fetchall())
+                for i, stream in enumerate(chunk):
+                    batch_count = counts[i] + self._unchanged.get(f"{stream.schema_name}.{stream.name}", 0)
+                    stream_size = ds.size(stream)
+                    if stream_size != batch_count:
+                        raise Exception(
+                            f"Integrity check failed for {stream.schema_name}.{stream.name}: "
+                            f"loaded={batch_count}, expected={stream_size}"
+                        )
+
+
+class _TailReader(io.RawIOBase):
+    """ A seekable file over a remote object that holds its last bytes and reads anything else on demand """
+
+    def __init__(self, size:int, tail_start:int, tail:bytes, read_range:Callable[[int, int], bytes]):
+        self._size = size
+        self._tail_start = tail_start
+        self._tail = tail
+        self._read_range = read_range
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset:int, whence:int=io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._size
+        self._position = max(0, min(offset, self._size))
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        length = min(len(buffer), self._size - self._position)
+        if length <= 0:
+            return 0
+        if self._position >= self._tail_start:
+            start = self._position - self._tail_start
+            data = self._tail[start:start + length]
+        else:
+            data = self._read_range(self._position, length)
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+
+class ObjectStoreIntegrity(Integrity):
+    """ Integrity checker for object store destinations
+
+    Checks every object the last write uploaded: the stored size has to match the
+    encoded size, and the row counts in the Parquet footers, fetched with a ranged
+    read of the end of each object, have to add up to the dataset's stream sizes.
+    No row data is downloaded.
+    """
+
+    # footers are usually well below this, larger ones take a second read
+    TAIL_BYTES = 64 * 1024
+
+    def __init__(self, objects:Dict[str, List[Tuple[str, int, int]]]):
+        # (key, size, rows) of the uploaded objects by stream
+        self._objects = objects
+
+    @abstractmethod
+    def _object_size(self, key:str) -> int:
+        # the stored size of an object, None if it doesn't exist
+        pass
+
+    @abstractmethod
+    def _read_range(self, key:str, start:int, length:int) -> bytes:
+        pass
+
+    def footer_rows(self, key:str, size:int) -> int:
+        tail_start = max(0, size - ObjectStoreIntegrity.TAIL_BYTES)
+        tail = self._read_range(key, tail_start, size - tail_start)
+        reader = _TailReader(size, tail_start, tail, lambda start, length: self._read_range(key, start, length))
+        return pq.ParquetFile(reader).metadata.num_rows
+
+    def check_batch_volume(self, ds:Dataset):
+        # streams another leg wrote directly have no objects
+        skip = ds.meta.get('skip_streams', set())
+
+        for stream in ds.streams:
+            name = f"{stream.schema_name}.{stream.name}"
+            if name in skip:
+                continue
+
+            loaded = 0
+            for key, size, _ in self._objects.get(name, []):
+                stored_size = self._object_size(key)
+                if stored_size != size:
+                    raise Exception(f"Integrity check failed for {name}: {key} stored={stored_size} bytes, written={size} bytes")
+                loaded += self.footer_rows(key, size)
+
+            stream_size = ds.size(stream)
+            if stream_size != loaded:
+                raise Exception(f"Integrity check failed for {name}: loaded={loaded}, expected={stream_size}")
+
+
+class S3Integrity(ObjectStoreIntegrity):
     """ Integrity checker for S3 destinations """
 
-    def __init__(self, client):
+    def __init__(self, client, bucket_name:str, objects:Dict[str, List[Tuple[str, int, int]]]):
+        super().__init__(objects)
         self._client = client
-        raise NotImplementedError("S3Integrity checker is not implemented yet")
+        self._bucket_name = bucket_name
 
-    def check_batch_volume(self, ds:Dataset):
-        return True
+    def _object_size(self, key:str) -> int:
+        try:
+            return self._client.head_object(Bucket=self._bucket_name, Key=key)['ContentLength']
+        except ClientError as e:
+            if e.response['Error']['Code'] in ['404', 'NoSuchKey']:
+                return None
+            raise
+
+    def _read_range(self, key:str, start:int, length:int) -> bytes:
+        response = self._client.get_object(Bucket=self._bucket_name, Key=key, Range=f"bytes={start}-{start + length - 1}")
+        return response['Body'].read()
 
 
-class GCSIntegrity(Integrity):
+class GCSIntegrity(ObjectStoreIntegrity):
     """ Integrity checker for GCS based destinations """
 
-    def __init__(self, client):
+    def __init__(self, client, bucket_name:str, objects:Dict[str, List[Tuple[str, int, int]]]):
+        super().__init__(objects)
         self._client = client
-        raise NotImplementedError("GCSIntegrity checker is not implemented yet")
+        self._bucket = client.bucket(bucket_name)
 
-    def check_batch_volume(self, ds:Dataset):
-        return True
+    def _object_size(self, key:str) -> int:
+        blob = self._bucket.get_blob(key)
+        return blob.size if blob is not None else None
 
+    def _read_range(self, key:str, start:int, length:int) -> bytes:
+        # end is inclusive
+        return self._bucket.blob(key).download_as_bytes(start=start, end=start + length - 1)
 
-class ABSIntegrity(Integrity):
+
+class ABSIntegrity(ObjectStoreIntegrity):
     """ Integrity checker for Azure Blob destinations """
 
-    def __init__(self, client):
+    def __init__(self, client, objects:Dict[str, List[Tuple[str, int, int]]]):
+        super().__init__(objects)
         self._client = client
-        raise NotImplementedError("ABSIntegrity checker is not implemented yet")
 
-    def check_batch_volume(self, ds:Dataset):
-        return True
+    def _object_size(self, key:str) -> int:
+        try:
+            return self._client.get_blob_client(key).get_blob_properties().size
+        except ResourceNotFoundError:
+            return None
+
+    def _read_range(self, key:str, start:int, length:int) -> bytes:
+        return self._client.get_blob_client(key).download_blob(offset=start, length=length).readall()
+
 
+class SMSExistenceIntegrity(Integrity):
+    """ Existence checker for SMS (Snowflake) based destinations
 
-class SMSIntegrity(Integrity):
-    """ Integrity checker for SMS (Snowflake) based destinations """
+    Staged files can't be read with ranged requests, so unlike ObjectStoreIntegrity
+    this does not look at what the files contain. The stage is listed once to check
+    every file of the write is there, and the row counts recorded when the files were
+    encoded are checked to add up to the dataset's stream sizes.
+    """
 
-    def __init__(self, client):
+    def __init__(self, client, stage_name:str, objects:Dict[str, List[Tuple[str, int, int]]]):
         self._client = client
-        raise NotImplementedError("SMSIntegrity checker is not implemented yet")
+        self._stage_name = stage_name
+        self._objects = objects
 
     def check_batch_volume(self, ds:Dataset):
-        return True
\ No newline at end of file
+        cur = self._client.cursor()
+        try:
+            cur.execute(f"LIST @{self._stage_name} PATTERN = '.*{ds.meta.get('batch_id')}.*'")
+            staged = set([row[0].split('/')[-1].lower() for row in cur.fetchall()])
+        finally:
+            cur.close()
+
+        for stream in ds.streams:
+            name = f"{stream.schema_name}.{stream.name}"
+            objects = self._objects.get(name, [])
+            missing = [key for key, _, _ in objects if key.lower() not in staged]
+            if missing:
+                raise Exception(f"Integrity check failed for {name}: {len(missing)} file(s) missing from stage, e.g. {missing[0]}")
+
+            loaded = sum(rows for _, _, rows in objects)
+            stream_size = ds.size(stream)
+            if stream_size != loaded:
+                raise Exception(f"Integrity check failed for {name}: loaded={loaded}, expected={stream_size}")
@@ -1,5 +1,13 @@
+import io
+import os
+import json
+import math
 import time
-from typing import Protocol, List, Dict, Any
+import threading
+from typing import Protocol, List, Dict, Any, Optional, Callable, Tuple, Union
+from collections import OrderedDict
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
 from abc import abstractmethod
 import tempfile
 from datetime import datetime
@@ -7,8 +15,10 @@ from pathlib import Path
 
 import boto3
 import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.parquet as pq
 
+from pontoon import logger
 from pontoon.base import Namespace, Destination, Stream, Dataset, Record, Progress
 
 
@@ -30,36 +40,303 @@ class ObjectStoreConfig(Protocol):
 
 
 
-class ObjectStoreBase(Destination):
-    """ An abstract base class for Destinations that write Parquet to object stores """
+class ParquetFileWriter:
+    """ Streams Arrow record batches into a Parquet file
+
+    Batches are buffered until a full row group is available, so memory is bounded by
+    one row group rather than the whole file. Options come from the 'parquet' connect
+    config:
+        - compression: codec for every column (default: zstd)
+        - column_compression: per column codec overrides, e.g. {"payload": "gzip"}
+        - compression_level: codec level, an int or a per column dict
+        - row_group_size: rows per row group (default: 131072)
+        - use_dictionary: dictionary encoding, a bool or a list of columns (default: True)
+        - write_statistics: column statistics, a bool or a list of columns (default: True)
+    """
+
+    DEFAULT_COMPRESSION = 'zstd'
+    DEFAULT_ROW_GROUP_SIZE = 128 * 1024
 
-    
     @staticmethod
-    def _batch_to_table(stream:Stream, batch:List[Record]):
-        # Turn a batch of records into an Arrow table with schema enforced
-        table_rows = []
-        cols = stream.schema.names
-        for record in batch:
-            table_rows.append({cols[i]: record.data[i] for i in range(len(cols))})
-        
-        return pa.Table.from_pylist(table_rows, schema=stream.schema)
+    def writer_options(schema:pa.Schema, parquet_config:Dict[str, Any]) -> Dict[str, Any]:
+        # keyword arguments for pq.ParquetWriter
+        compression = parquet_config.get('compression', ParquetFileWriter.DEFAULT_COMPRESSION)
+        column_compression = parquet_config.get('column_compression', {})
+        if column_compression:
+            compression = {name: column_compression.get(name, compression) for name in schema.names}
+
+        options = {
+            'compression': compression,
+            'use_dictionary': parquet_config.get('use_dictionary', True),
+            'write_statistics': parquet_config.get('write_statistics', True)
+        }
+        if parquet_config.get('compression_level') is not None:
+            options['compression_level'] = parquet_config.get('compression_level')
+        return options
+
+
+    def __init__(self, where, schema:pa.Schema, parquet_config:Dict[str, Any]={}, row_group_bytes:int=None):
+        # row_group_bytes additionally flushes a row group once the buffered arrow data reaches that size
+        self._schema = schema
+        self._row_group_size = parquet_config.get('row_group_size', ParquetFileWriter.DEFAULT_ROW_GROUP_SIZE)
+        self._row_group_bytes = row_group_bytes
+        self._writer = pq.ParquetWriter(where, schema, **ParquetFileWriter.writer_options(schema, parquet_config))
+        self._pending = []
+        self._pending_rows = 0
+        self._pending_bytes = 0
+        self.rows = 0
+
+
+    def write(self, batch:pa.RecordBatch):
+        if batch.num_rows == 0:
+            return
+        if batch.schema != self._schema:
+            batch = pa.Table.from_batches([batch]).cast(self._schema).combine_chunks().to_batches()[0]
+
+        self._pending.append(batch)
+        self._pending_rows += batch.num_rows
+        self._pending_bytes += batch.nbytes
+        self.rows += batch.num_rows
+
+        while self._pending_rows >= self._row_group_size:
+            self._flush(self._row_group_size)
+
+        if self._row_group_bytes is not None and self._pending_bytes >= self._row_group_bytes:
+            self._flush(self._pending_rows)
+
+
+    def _flush(self, num_rows:int):
+        # write the first num_rows buffered rows as one row group
+        table = pa.Table.from_batches(self._pending, schema=self._schema)
+        self._writer.write_table(table.slice(0, num_rows), row_group_size=num_rows)
+        rest = table.slice(num_rows)
+        self._pending = rest.to_batches()
+        self._pending_rows = rest.num_rows
+        self._pending_bytes = rest.nbytes
+
+
+    def close(self):
+        if self._pending_rows > 0:
+            self._flush(self._pending_rows)
+        self._writer.close()
+
+
+
+class ParquetObject:
+    """ An encoded Parquet file waiting for upload, held in a temp file or in memory """
+
+    def __init__(self, rows:int, path:str=None, buffer:pa.Buffer=None):
+        self.rows = rows
+        self.path = path
+        self.buffer = buffer
+
+
+    @property
+    def size(self) -> int:
+        if self.buffer is not None:
+            return self.buffer.size
+        return os.path.getsize(self.path)
+
+
+    def open(self):
+        # a seekable binary file object over the encoded bytes
+        if self.buffer is not None:
+            return pa.BufferReader(self.buffer)
+        return open(self.path, 'rb')
+
+
+    def cleanup(self):
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+        self.buffer = None
+
+
+
+class SpillBuffer(io.RawIOBase):
+    """ A write-only Parquet sink that stays in memory until it outgrows spill_bytes
+
+    Bytes go to an Arrow BufferOutputStream, once the file passes spill_bytes what was
+    written so far is moved to a temp file and the rest of the file is appended there.
+    """
+
+    def __init__(self, spill_bytes:int, spill_dir:str=None):
+        self._spill_bytes = spill_bytes
+        self._spill_dir = spill_dir
+        self._memory = pa.BufferOutputStream()
+        self._file = None
+        self._path = None
+        self._size = 0
+
+
+    def writable(self) -> bool:
+        return True
+
+
+    def write(self, data) -> int:
+        if self._file is None and self._size + len(data) > self._spill_bytes:
+            fd, self._path = tempfile.mkstemp(suffix='.parquet', dir=self._spill_dir)
+            self._file = os.fdopen(fd, 'wb')
+            self._file.write(self._memory.getvalue())
+            self._memory = None
+
+        if self._file is not None:
+            self._file.write(data)
+        else:
+            self._memory.write(data)
+        self._size += len(data)
+        return len(data)
+
+
+    def tell(self) -> int:
+        return self._size
+
+
+    def to_object(self, rows:int) -> ParquetObject:
+        # hand the encoded file over as a ParquetObject
+        if self._file is not None:
+            self._file.close()
+            return ParquetObject(rows, path=self._path)
+        return ParquetObject(rows, buffer=self._memory.getvalue())
+
+
+
+class HivePartitioning:
+    """ Routes rows to hive partitions computed from data columns
+
+    partition_by is a list of column names or dicts with a 'column', an optional
+    'transform' (identity, year, month, day or hour) and an optional partition 'name'.
+    Identity partitions are named after their column and, as with Hive and Spark, the
+    column is left out of the data files since its value is in the path. Time
+    transforms keep the column and default to a '<column>_<transform>' name.
+    """
+
+    TRANSFORMS = {
+        'year': '%Y',
+        'month': '%Y-%m',
+        'day': '%Y-%m-%d',
+        'hour': '%Y-%m-%d-%H'
+    }
+
+    DEFAULT_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+
+    def __init__(self, partition_by:List[Union[str, Dict[str, str]]]):
+        self.specs = []
+        for spec in partition_by or []:
+            if isinstance(spec, str):
+                spec = {'column': spec}
+            transform = spec.get('transform', 'identity')
+            if transform != 'identity' and transform not in HivePartitioning.TRANSFORMS:
+                raise ValueError(f"Unsupported hive partition transform '{transform}'")
+            column = spec['column']
+            name = column if transform == 'identity' else spec.get('name', f"{column}_{transform}")
+            self.specs.append((name, column, transform))
+
+
+    @property
+    def keys(self) -> List[str]:
+        return [name for name, _, _ in self.specs]
+
+
+    @property
+    def dropped_columns(self) -> List[str]:
+        return [column for _, column, transform in self.specs if transform == 'identity']
+
+
+    def applies(self, schema:pa.Schema) -> bool:
+        # streams without every partition column keep the load date layout
+        return len(self.specs) > 0 and all(column in schema.names for _, column, _ in self.specs)
+
+
+    def file_schema(self, schema:pa.Schema) -> pa.Schema:
+        dropped = self.dropped_columns
+        return pa.schema([field for field in schema if field.name not in dropped])
+
+
+    def _values(self, batch:pa.RecordBatch, column:str, transform:str) -> pa.Array:
+        # partition values as strings, nulls go to the hive default partition
+        values = batch.column(column)
+        if transform != 'identity':
+            if pa.types.is_date(values.type):
+                values = values.cast(pa.timestamp('s'))
+            values = pc.strftime(values, format=HivePartitioning.TRANSFORMS[transform])
+        elif not pa.types.is_string(values.type):
+            values = values.cast(pa.string())
+        return values.fill_null(HivePartitioning.DEFAULT_PARTITION)
+
+
+    def split(self, batch:pa.RecordBatch):
+        # yield (partition, rows) for every partition in the batch, partition is a tuple of (key, value)
+        keys = [f"__partition_{i}" for i in range(len(self.specs))]
+        arrays = [self._values(batch, column, transform) for _, column, transform in self.specs]
+        table = pa.table(arrays + [pa.array(range(batch.num_rows), type=pa.int64())], names=keys + ['__row'])
+
+        dropped = self.dropped_columns
+        data = batch.select([name for name in batch.schema.names if name not in dropped]) if dropped else batch
+
+        groups = table.group_by(keys, use_threads=False).aggregate([('__row', 'list')])
+        for i in range(groups.num_rows):
+            partition = tuple(
+                (name, quote(groups.column(key)[i].as_py(), safe=''))
+                for name, key in zip(self.keys, keys)
+            )
+            rows = groups.column('__row_list')[i].values
+            yield partition, data.take(rows)
+
+
+
+class ObjectStoreBase(Destination):
+    """ An abstract base class for Destinations that write Parquet to object stores
+
+    Streams are written as a bounded pipeline: the cache is sliced into files of
+    batch_size rows, files are encoded to Parquet on encode_workers threads and
+    uploaded on upload_workers threads. At most max_pending_files files are being
+    encoded or waiting for upload at once, which keeps memory bounded when the
+    network is slower than encoding. Encoded files are written to temp files, or
+    with temp_files disabled kept in memory and only spilled to a temp file (in
+    spill_dir) when they grow beyond spill_threshold_mb.
+
+    With target_file_size_mb set, files are instead rolled once their encoded size
+    reaches the target, as long as they hold at least min_file_rows rows, and never
+    grow beyond max_file_rows rows. Encoding then happens on the reading thread since
+    the size of a file is only known while it is written, uploads stay concurrent.
+
+    In hive format, partition_by routes rows into partition directories by data
+    columns (see HivePartitioning) instead of the load date. Each partition gets its
+    own writer, at most max_open_partitions are open at once and the least recently
+    used one is closed into a file when another is needed.
+
+    With file_multiple set (or requested by a later destination through the dataset
+    meta, e.g. the slice count of a Redshift cluster), each stream is split into a
+    multiple of that many evenly filled files of at most batch_size rows. Streams too
+    small to give every one of those files min_file_rows rows keep plain batch_size
+    files. file_multiple only applies to row sliced files, it is not applied with
+    target_file_size_mb or to hive partitioned streams.
+
+    Object store legs of a multi destination with the same file layout share one
+    encode pass (see share_objects): the first leg encodes each file once and every
+    leg uploads it.
+    """
+
+    # legs that take ownership of encoded files can't share them with other legs
+    SHARES_OBJECTS = True
 
 
     @staticmethod
-    def _write_parquet(stream:Stream, batch:List[Record], output_path:str = None, parquet_config={}):
-        # write an arrow table to a file as parquet
+    def _write_parquet(stream:Stream, batch:List[pa.RecordBatch], output_path = None, parquet_config={}):
+        # stream a list of arrow record batches to a file path or arrow output stream as parquet
         if output_path is None:
-            _, file_path = tempfile.mkstemp()
+            fd, file_path = tempfile.mkstemp()
+            os.close(fd)
         else:
             file_path = output_path
 
-        table = ObjectStoreBase._batch_to_table(stream, batch)
-
-        pq.write_table(
-            table, 
-            file_path, 
-            compression = parquet_config.get('compression', 'NONE')
-        )
+        writer = ParquetFileWriter(file_path, stream.schema, parquet_config)
+        try:
+            for record_batch in batch:
+                writer.write(record_batch)
+        finally:
+            writer.close()
         return file_path
     
     
@@ -89,6 +366,19 @@ class ObjectStoreBase(Destination):
         return f"{config.scheme}://{config.bucket_name}/{ObjectStoreBase.get_object_path(config, namespace, stream, dt, batch_id)}"
 
 
+    @staticmethod
+    def get_manifest_filename(config:ObjectStoreConfig, namespace:Namespace, stream:Stream, dt:datetime, batch_id:str):
+        # e.g. events/postgres/pontoon__events/2025-01-10/1740773449235.manifest
+        # next to the batch prefix so prefix based loads of the batch never pick it up
+        return f"{ObjectStoreBase.get_object_path(config, namespace, stream, dt, batch_id).rstrip('/')}.manifest"
+
+
+    @staticmethod
+    def get_manifest_uri(config:ObjectStoreConfig, namespace:Namespace, stream:Stream, dt:datetime, batch_id:str):
+        # e.g. s3://bucket/events/postgres/pontoon__events/2025-01-10/1740773449235.manifest
+        return f"{config.scheme}://{config.bucket_name}/{ObjectStoreBase.get_manifest_filename(config, namespace, stream, dt, batch_id)}"
+
+
     @staticmethod 
     def get_hive_name(stream:Stream, dt:datetime, batch_id:str, batch_index:int):
         # e.g. 20250701154312_1740773449235_0.parquet
@@ -96,22 +386,23 @@ class ObjectStoreBase(Destination):
 
 
     @staticmethod
-    def get_hive_path(config:ObjectStoreConfig, namespace:Namespace, stream:Stream, dt:datetime, batch_id:str):
-        # e.g. events/events/dt=2025-01-10/
-        date = dt.strftime('%Y-%m-%d')
-        return f"{config.bucket_path}/{stream.name}/dt={date}/"
+    def get_hive_path(config:ObjectStoreConfig, namespace:Namespace, stream:Stream, dt:datetime, batch_id:str, partition:Tuple[Tuple[str, str], ...]=None):
+        # e.g. events/events/dt=2025-01-10/ or, partitioned by data columns, events/events/event_day=2025-01-09/
+        if partition is None:
+            partition = (('dt', dt.strftime('%Y-%m-%d')),)
+        return f"{config.bucket_path}/{stream.name}/{''.join([f'{key}={value}/' for key, value in partition])}"
 
 
     @staticmethod
-    def get_hive_filename(config:ObjectStoreConfig, namespace:Namespace, stream:Stream, dt:datetime, batch_id:str, batch_index:int):
+    def get_hive_filename(config:ObjectStoreConfig, namespace:Namespace, stream:Stream, dt:datetime, batch_id:str, batch_index:int, partition:Tuple[Tuple[str, str], ...]=None):
         # e.g. events/events/dt=2025-01-10/20250110154312_1740773449235_0.parquet
-        return f"{ObjectStoreBase.get_hive_path(config, namespace, stream, dt, batch_id)}{ObjectStoreBase.get_hive_name(stream, dt, batch_id, batch_index)}"
+        return f"{ObjectStoreBase.get_hive_path(config, namespace, stream, dt, batch_id, partition)}{ObjectStoreBase.get_hive_name(stream, dt, batch_id, batch_index)}"
 
 
     @staticmethod
-    def get_hive_path_uri(config:ObjectStoreConfig, namespace:Namespace, stream:Stream, dt:datetime, batch_id:str):
+    def get_hive_path_uri(config:ObjectStoreConfig, namespace:Namespace, stream:Stream, dt:datetime, batch_id:str, partition:Tuple[Tuple[str, str], ...]=None):
         # e.g. s3://bucket/events/events/dt=2025-01-10/
-        return f"{config.scheme}://{config.bucket_name}/{ObjectStoreBase.get_hive_path(config, namespace, stream, dt, batch_id)}"
+        return f"{config.scheme}://{config.bucket_name}/{ObjectStoreBase.get_hive_path(config, namespace, stream, dt, batch_id, partition)}"
 
     
     def __init__(self, config):
@@ -122,18 +413,108 @@ class ObjectStoreBase(Destination):
         # default format is as a staging store for transfers between other stores
         # options are staging, hive  
         self._format = config.get('connect').get('format', 'staging').lower()
+
+        # parquet writer options, see ParquetFileWriter
+        self._parquet_config = config.get('connect').get('parquet', config.get('parquet', {}))
+
+        # connection pool size for the store client shared by every batch of a write
+        self._max_connections = config.get('connect').get('max_connections', 16)
+        self._client_lock = threading.Lock()
+
+        # encode / upload pipeline
+        connect = config.get('connect')
+        self._encode_workers = max(1, connect.get('encode_workers', 1))
+        self._upload_workers = max(1, connect.get('upload_workers', 4))
+        self._max_pending_files = max(1, connect.get('max_pending_files', self._encode_workers + 2 * self._upload_workers))
+        self._temp_files = connect.get('temp_files', True)
+        self._spill_bytes = connect.get('spill_threshold_mb', 64) * 1024 * 1024
+        self._spill_dir = connect.get('spill_dir')
+
+        # with target_file_size_mb files are rolled by encoded size instead of every batch_size rows
+        target_file_size_mb = connect.get('target_file_size_mb')
+        self._target_file_bytes = target_file_size_mb * 1024 * 1024 if target_file_size_mb else None
+        self._min_file_rows = connect.get('min_file_rows', 10000)
+        self._max_file_rows = connect.get('max_file_rows', 10000000)
+
+        # split each stream into a multiple of this many files, e.g. the slice count of a loading cluster,
+        # when not configured a later destination can request it through the dataset meta 'file_multiple'
+        self._file_multiple = connect.get('file_multiple')
+
+        # hive partitions by data columns, bounded number of partition writers open at once
+        self._partitioning = HivePartitioning(connect.get('partition_by'))
+        self._max_open_partitions = max(1, connect.get('max_open_partitions', 32))
+        self._file_partitions = {}
+
+        # other object store legs that upload the files this one encodes
+        self._mirrors = []
+
+        # (stream, [(batch_index, size, rows)]) of the last write by stream, for integrity checks
+        self._written = {}
         
         self._dt = None
         self._batch_id = None
         self._ds = None
         
     
+    def _encoding_key(self) -> str:
+        # everything that decides how a stream is cut into files and encoded
+        return json.dumps([
+            self._format,
+            self._parquet_config,
+            self._batch_size,
+            self._target_file_bytes,
+            self._min_file_rows,
+            self._max_file_rows,
+            self._file_multiple,
+            self._partitioning.specs
+        ], sort_keys=True, default=str)
+
+
+    def share_objects(self, other:'ObjectStoreBase') -> bool:
+        # encode once for another leg with the same file layout, it then uploads the same objects
+        if not (self.SHARES_OBJECTS and other.SHARES_OBJECTS) or self._encoding_key() != other._encoding_key():
+            return False
+        other._file_partitions = self._file_partitions
+        self._mirrors.append(other)
+        return True
+
+
     @abstractmethod
     def _write_stream(self, stream:Stream): pass
     
 
     @abstractmethod
-    def _write_batch(self, stream:Stream, batch:List[Record], batch_index:int): pass
+    def _upload_object(self, stream:Stream, obj:ParquetObject, batch_index:int): pass
+
+
+    def _finish_stream(self, stream:Stream, objects:List[Tuple[int, int, int]]):
+        # called once a stream is written with the (batch_index, size, rows) of every uploaded object
+        pass
+
+
+    def _encode_batch(self, stream:Stream, batch:List[pa.RecordBatch], batch_index:int) -> ParquetObject:
+        # encode a file's worth of record batches as parquet
+        rows = sum(record_batch.num_rows for record_batch in batch)
+        if self._temp_files:
+            path = ObjectStoreBase._write_parquet(stream, batch, parquet_config=self._parquet_config)
+            return ParquetObject(rows, path=path)
+
+        sink = self._new_sink()
+        ObjectStoreBase._write_parquet(stream, batch, output_path=sink, parquet_config=self._parquet_config)
+        return sink.to_object(rows)
+
+
+    def _new_sink(self) -> SpillBuffer:
+        # a temp file, or a memory buffer that spills to a temp file with temp_files disabled
+        return SpillBuffer(0 if self._temp_files else self._spill_bytes, self._spill_dir)
+
+
+    def _object_filename(self, store_config:ObjectStoreConfig, stream:Stream, batch_index:int) -> str:
+        # the object key for a batch in the configured format
+        if self._format == 'hive':
+            partition = self._file_partitions.get((stream.schema_name, stream.name, batch_index))
+            return ObjectStoreBase.get_hive_filename(store_config, self._ds.namespace, stream, self._dt, self._batch_id, batch_index, partition)
+        return ObjectStoreBase.get_object_filename(store_config, self._ds.namespace, stream, self._dt, self._batch_id, batch_index)
 
     
     def write(self, ds:Dataset, progress_callback=None):
@@ -141,37 +522,263 @@ class ObjectStoreBase(Destination):
         self._ds = ds
         self._batch_id = ds.meta.get('batch_id')
         self._dt = ds.meta.get('dt')
-
-
-        # write streams in batches
-        for stream in ds.streams:
-
-            # configure progress tracking
-            progress = Progress(
-                f"destination+object://{ds.namespace}/{stream.schema_name}/{stream.name}",
-                total=ds.size(stream),
-                processed=0
+        self._written = {}
+        for mirror in self._mirrors:
+            mirror._ds = ds
+            mirror._batch_id = self._batch_id
+            mirror._dt = self._dt
+            mirror._written = {}
+
+        # clients and connections are opened once and shared by every batch of the write
+        # streams another leg writes directly (e.g. the BigQuery Storage Write API) need no files
+        skip = ds.meta.get('skip_streams', set())
+
+        try:
+            for stream in ds.streams:
+                if f"{stream.schema_name}.{stream.name}" in skip:
+                    continue
+                self._write_dataset_stream(ds, stream, progress_callback)
+        finally:
+            for dest in [self] + self._mirrors:
+                dest._release_clients()
+
+
+    def _write_dataset_stream(self, ds:Dataset, stream:Stream, progress_callback=None):
+        # configure progress tracking
+        progress = Progress(
+            f"destination+object://{ds.namespace}/{stream.schema_name}/{stream.name}",
+            total=ds.size(stream),
+            processed=0
+        )
+        if callable(progress_callback):
+            progress.subscribe(progress_callback)
+
+        for dest in [self] + self._mirrors:
+            dest._write_stream(stream)
+
+        progress_lock = threading.Lock()
+        slots = threading.BoundedSemaphore(self._max_pending_files)
+        failed = threading.Event()
+        encode_pool = ThreadPoolExecutor(self._encode_workers, thread_name_prefix='pontoon-encode')
+        upload_pool = ThreadPoolExecutor(self._upload_workers, thread_name_prefix='pontoon-upload')
+        encodes = []
+        written = []
+
+        def upload(obj:ParquetObject, batch_index:int):
+            try:
+                size = obj.size
+                for dest in [self] + self._mirrors:
+                    dest._upload_object(stream, obj, batch_index)
+                with progress_lock:
+                    written.append((batch_index, size, obj.rows))
+                    progress.update(obj.rows, increment=True)
+            except Exception:
+                failed.set()
+                raise
+            finally:
+                obj.cleanup()
+                slots.release()
+
+        def encode(batch:List[pa.RecordBatch], batch_index:int):
+            try:
+                obj = self._encode_batch(stream, batch, batch_index)
+            except Exception:
+                failed.set()
+                slots.release()
+                raise
+            return upload_pool.submit(upload, obj, batch_index)
+
+        def submit(batch:List[pa.RecordBatch], batch_index:int):
+            # blocks while max_pending_files files are in flight
+            slots.acquire()
+            encodes.append(encode_pool.submit(encode, batch, batch_index))
+
+        uploads = []
+        partitioned = self._format == 'hive' and self._partitioning.applies(stream.schema)
+        if (partitioned or self._target_file_bytes) and (self._file_multiple or ds.meta.get('file_multiple')):
+            logger.warning(
+                f"file_multiple is not applied to {stream.schema_name}.{stream.name}, "
+                f"files are {'partitioned' if partitioned else 'rolled by target_file_size_mb'}"
             )
-            if callable(progress_callback):
-                progress.subscribe(progress_callback)
-
-            self._write_stream(stream)
-
-            batch = []
-            batch_index = 0
-            for record in ds.read(stream):
-                batch.append(record)
-                if len(batch) == self._batch_size:
-                    self._write_batch(stream, batch, batch_index)
-                    progress.update(self._batch_size, increment=True)
+        try:
+            if partitioned:
+                for obj, batch_index, partition in self._iter_partitioned_files(ds, stream):
+                    if failed.is_set():
+                        obj.cleanup()
+                        break
+                    self._file_partitions[(stream.schema_name, stream.name, batch_index)] = partition
+                    slots.acquire()
+                    uploads.append(upload_pool.submit(upload, obj, batch_index))
+            elif self._target_file_bytes:
+                for obj, batch_index in self._iter_sized_files(ds, stream):
+                    if failed.is_set():
+                        obj.cleanup()
+                        break
+                    slots.acquire()
+                    uploads.append(upload_pool.submit(upload, obj, batch_index))
+            else:
+                for batch, batch_index in self._iter_files(ds, stream):
+                    if failed.is_set():
+                        break
+                    submit(batch, batch_index)
+        finally:
+            encode_pool.shutdown(wait=True)
+            upload_pool.shutdown(wait=True)
+
+        # surface the first encode or upload error
+        for future in encodes:
+            future.result().result()
+        for future in uploads:
+            future.result()
+
+        if partitioned:
+            # partitions written for the stream, a catalog destination can register them
+            key = (stream.schema_name, stream.name)
+            ds.meta.setdefault('hive_partitions', {})[f"{stream.schema_name}.{stream.name}"] = sorted(set(
+                partition for (schema_name, name, _), partition in self._file_partitions.items() if (schema_name, name) == key
+            ))
+
+        for dest in [self] + self._mirrors:
+            dest._written[f"{stream.schema_name}.{stream.name}"] = (stream, sorted(written))
+            dest._finish_stream(stream, sorted(written))
+
+
+    def _written_objects(self, object_key:Callable[[Stream, int], str]) -> Dict[str, List[Tuple[str, int, int]]]:
+        # the (key, size, rows) of every object the last write uploaded, by stream
+        return {
+            name: [(object_key(stream, batch_index), size, rows) for batch_index, size, rows in objects]
+            for name, (stream, objects) in self._written.items()
+        }
+
+
+    def _file_rows(self, ds:Dataset, stream:Stream) -> Callable[[int], int]:
+        # the number of rows in each file by file index
+        multiple = self._file_multiple or ds.meta.get('file_multiple')
+        if not multiple:
+            return lambda batch_index: self._batch_size
+
+        # a multiple of file_multiple files for a small stream would only be many tiny files
+        size = ds.size(stream)
+        if size < multiple * self._min_file_rows:
+            return lambda batch_index: self._batch_size
+
+        # the fewest files of at most batch_size rows that are a multiple of file_multiple, evenly filled
+        files = multiple * max(1, math.ceil(size / (multiple * self._batch_size)))
+        rows, extra = divmod(size, files)
+        return lambda batch_index: max(1, rows + 1 if batch_index < extra else rows)
+
+
+    def _iter_files(self, ds:Dataset, stream:Stream):
+        # slice the cached arrow batches into files, slices are zero-copy
+        file_rows = self._file_rows(ds, stream)
+        batch = []
+        batch_rows = 0
+        batch_index = 0
+        for record_batch in ds.read_batches(stream, self._batch_size):
+            offset = 0
+            while offset < record_batch.num_rows:
+                length = min(file_rows(batch_index) - batch_rows, record_batch.num_rows - offset)
+                batch.append(record_batch.slice(offset, length))
+                batch_rows += length
+                offset += length
+                if batch_rows == file_rows(batch_index):
+                    yield batch, batch_index
                     batch = []
+                    batch_rows = 0
                     batch_index += 1
-            
-            if batch:
-                self._write_batch(stream, batch, batch_index)
-                progress.update(len(batch), increment=True)
- 
 
-    def close(self):
+        if batch:
+            yield batch, batch_index
+
+
+    def _iter_sized_files(self, ds:Dataset, stream:Stream):
+        # encode the stream into files of about target_file_size_mb, sizes are checked as row groups are flushed
+        row_group_bytes = max(1, self._target_file_bytes // 4)
+        sink = None
+        writer = None
+        batch_index = 0
+        try:
+            for record_batch in ds.read_batches(stream, self._batch_size):
+                offset = 0
+                while offset < record_batch.num_rows:
+                    if writer is None:
+                        sink = self._new_sink()
+                        writer = ParquetFileWriter(sink, stream.schema, self._parquet_config, row_group_bytes)
+
+                    length = min(self._max_file_rows - writer.rows, record_batch.num_rows - offset)
+                    writer.write(record_batch.slice(offset, length))
+                    offset += length
+
+                    full = writer.rows >= self._min_file_rows and sink.tell() >= self._target_file_bytes
+                    if full or writer.rows >= self._max_file_rows:
+                        writer.close()
+                        yield sink.to_object(writer.rows), batch_index
+                        sink = None
+                        writer = None
+                        batch_index += 1
+
+            if writer is not None:
+                writer.close()
+                yield sink.to_object(writer.rows), batch_index
+                sink = None
+        finally:
+            if sink is not None:
+                # abandoned mid-file, drop what was encoded so far
+                sink.to_object(0).cleanup()
+
+
+    def _iter_partitioned_files(self, ds:Dataset, stream:Stream):
+        # route each cached batch to its partitions' writers, files roll like sized files or every batch_size rows
+        schema = self._partitioning.file_schema(stream.schema)
+        max_rows = self._max_file_rows if self._target_file_bytes else self._batch_size
+        row_group_bytes = max(1, self._target_file_bytes // 4) if self._target_file_bytes else None
+        writers = OrderedDict()
+        batch_index = 0
+
+        def close(partition):
+            nonlocal batch_index
+            sink, writer = writers.pop(partition)
+            writer.close()
+            obj = sink.to_object(writer.rows)
+            batch_index += 1
+            return obj, batch_index - 1, partition
+
+        try:
+            for record_batch in ds.read_batches(stream, self._batch_size):
+                for partition, rows in self._partitioning.split(record_batch):
+                    offset = 0
+                    while offset < rows.num_rows:
+                        if partition in writers:
+                            writers.move_to_end(partition)
+                        else:
+                            if len(writers) >= self._max_open_partitions:
+                                # close the least recently used partition to make room
+                                yield close(next(iter(writers)))
+                            sink = self._new_sink()
+                            writers[partition] = (sink, ParquetFileWriter(sink, schema, self._parquet_config, row_group_bytes))
+
+                        sink, writer = writers[partition]
+                        length = min(max_rows - writer.rows, rows.num_rows - offset)
+                        writer.write(rows.slice(offset, length))
+                        offset += length
+
+                        full = self._target_file_bytes and writer.rows >= self._min_file_rows and sink.tell() >= self._target_file_bytes
+                        if full or writer.rows >= max_rows:
+                            yield close(partition)
+
+            while writers:
+                yield close(next(iter(writers)))
+        finally:
+            # abandoned mid-stream, drop what was encoded so far
+            for sink, _ in writers.values():
+                sink.to_object(0).cleanup()
+
+
+    def _release_clients(self):
+        # close clients and connections opened during a write, destinations that cache them override this
         pass
+
+
+    def close(self):
+        self._release_clients()
     
@@ -1,9 +1,15 @@
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import psycopg2
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 from psycopg2 import sql
 from psycopg2.extras import execute_values
-from typing import List, Dict, Tuple, Generator, Any
+from typing import List, Dict, Tuple, Generator, Iterable, Callable, Any
 
 from sqlalchemy.exc import SQLAlchemyError, OperationalError, NoSuchTableError
+from pontoon import logger
 from pontoon.base import Destination, Dataset, Stream, Record, Progress, Mode
 from pontoon.base import DestinationConnectionFailed, \
                         DestinationStreamInvalidSchema
@@ -26,7 +32,11 @@ class PostgresSQLUtil:
 
 
     @staticmethod
-    def create_temp_table(table_name:str, like_table_name:str) -> str:
+    def create_temp_table(table_name:str, like_table_name:str, kind:str='TEMP') -> str:
+        # kind 'UNLOGGED' skips the WAL and is visible to other sessions, unlike a TEMP table
+        if kind not in ('TEMP', 'UNLOGGED'):
+            raise ValueError(f"Unsupported staging table kind: {kind}")
+
         temp_schema, temp_table = PostgresSQLUtil.parse_table(table_name)
         like_schema, like_table = PostgresSQLUtil.parse_table(like_table_name)
 
@@ -40,7 +50,8 @@ class PostgresSQLUtil:
         else:
             like_table_sql = like_table
 
-        return sql.SQL('CREATE TEMP TABLE {} (LIKE {})').format(
+        return sql.SQL('CREATE {} TABLE {} (LIKE {})').format(
+            sql.SQL(kind),
             temp_table_sql,
             like_table_sql
         )
@@ -56,7 +67,7 @@ class PostgresSQLUtil:
 
 
     @staticmethod
-    def upsert(target_table_name:str, stage_table_name:str, cols:List[str], primary_key:str) -> str:
+    def upsert(target_table_name:str, stage_table_name:str, cols:List[str], primary_key:str, checksum_field:str=None) -> str:
         # Split schema and table parts safely if needed
 
         target_schema, target_table = PostgresSQLUtil.parse_table(target_table_name)
@@ -79,29 +90,92 @@ class PostgresSQLUtil:
         else:
             stage_table_sql = stage_table
 
+        # only rewrite conflicting rows whose content changed
+        if checksum_field:
+            update_where = sql.SQL("WHERE target.{ck} IS DISTINCT FROM EXCLUDED.{ck}").format(ck=sql.Identifier(checksum_field))
+        else:
+            update_where = sql.SQL("")
+
         # Build the full SQL statement
         upsert_sql = sql.SQL("""
-            INSERT INTO {target_table} ({columns})
+            INSERT INTO {target_table} AS target ({columns})
             SELECT DISTINCT ON ({pk}) {columns}
             FROM {stage_table}
             ON CONFLICT ({pk})
             DO UPDATE SET {updates}
+            {update_where}
         """).format(
             target_table=target_table_sql,
             stage_table=stage_table_sql,
             columns=sql.SQL(', ').join(column_identifiers),
             pk=sql.Identifier(primary_key),
-            updates=sql.SQL(', ').join(excluded_assignments)
+            updates=sql.SQL(', ').join(excluded_assignments),
+            update_where=update_where
         )
 
         return upsert_sql
 
 
 
+class ArrowCopyStream(io.RawIOBase):
+    """ A file-like object that encodes Arrow record batches to CSV as COPY FROM STDIN reads it
+
+        Encoding is done by Arrow's CSV writer, so rows are never materialized as python
+        objects. Arrow writes nulls as unquoted empty fields and strings quoted when needed,
+        which is how Postgres CSV tells NULL and '' apart.
+    """
+
+    WRITE_OPTIONS = pa_csv.WriteOptions(include_header=False)
+
+    def __init__(self, batches:Iterable[pa.RecordBatch], on_batch:Callable[[int], None]=None):
+        self._batches = iter(batches)
+        self._on_batch = on_batch
+        self._buffer = b''
+        self._pos = 0
+
+
+    def readable(self):
+        return True
+
+
+    def _next_chunk(self) -> bytes:
+        for batch in self._batches:
+            if batch.num_rows == 0:
+                continue
+            sink = pa.BufferOutputStream()
+            pa_csv.write_csv(batch, sink, ArrowCopyStream.WRITE_OPTIONS)
+            if callable(self._on_batch):
+                self._on_batch(batch.num_rows)
+            return sink.getvalue().to_pybytes()
+        return b''
+
+
+    def read(self, size:int=-1) -> bytes:
+        if self._pos >= len(self._buffer):
+            self._buffer = self._next_chunk()
+            self._pos = 0
+        end = len(self._buffer) if size is None or size < 0 else self._pos + size
+        data = self._buffer[self._pos:end]
+        self._pos += len(data)
+        return data
+
+
+    @staticmethod
+    def supports(schema:pa.Schema) -> bool:
+        # binary and nested values have no CSV text form Postgres understands
+        for field in schema:
+            t = field.type
+            if pa.types.is_binary(t) or pa.types.is_large_binary(t) or pa.types.is_nested(t):
+                return False
+        return True
+
+
+
 class PostgresDestination(SQLDestination):
     """ A Destination that writes to Postgres:
             - creates the target table (but not schema) if not exists
-            - batch inserts records to a temporary staging table
+            - streams records into a temporary staging table with COPY (or batch inserts),
+              optionally over several connections into an unlogged staging table
             - merges the staging table into the target table
     """
 
@@ -109,8 +183,21 @@ class PostgresDestination(SQLDestination):
     def __init__(self, config):
         config['connect']['driver'] = 'postgresql+psycopg2'
         super().__init__(config)  # Call SQLDestination constructor
+
+        # 'copy' streams cached Arrow batches with COPY FROM STDIN, 'insert' uses execute_values
+        self._load_method = config['connect'].get('load_method', 'copy')
+
+        # COPY each stream over N connections into an unlogged stage (streams at once is parallel_streams)
+        self._parallel_connections = int(config['connect'].get('parallel_connections', 1))
     
 
+    def _max_connections(self, connect:dict) -> int:
+        # a parallel stream holds its own connection plus parallel_connections COPY loaders
+        parallel_connections = int(connect.get('parallel_connections', 1))
+        per_stream = 1 + parallel_connections if parallel_connections > 1 else 1
+        return self._parallel_streams * per_stream
+
+
     def _write_batch(self, conn, stage_table_name:str, cols:List[str], batch:List[Record]):
         with conn.cursor() as cur:
             execute_values(
@@ -120,6 +207,68 @@ class PostgresDestination(SQLDestination):
             )
 
 
+    def _copy_stream(self, conn, stage_table_name:str, cols:List[str], batches:Iterable[pa.RecordBatch], on_batch:Callable[[int], None]):
+        copy_sql = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+            sql.SQL(stage_table_name),
+            sql.SQL(', ').join([sql.Identifier(col) for col in cols])
+        )
+        stream = ArrowCopyStream(batches, on_batch=on_batch)
+        with conn.cursor() as cur:
+            cur.copy_expert(copy_sql, stream, size=1024*1024)
+
+
+    def _copy_parallel(self, stage_table_name:str, cols:List[str], batches:Iterable[pa.RecordBatch], progress:Progress):
+        # N connections pull the next cached batch from a shared iterator, so each one
+        # COPYs a disjoint slice of the stream into the (unlogged) staging table
+        batches = iter(batches)
+        batch_lock = threading.Lock()
+        progress_lock = threading.Lock()
+
+        def next_batches():
+            while True:
+                with batch_lock:
+                    batch = next(batches, None)
+                if batch is None:
+                    return
+                yield batch
+
+        def on_batch(n:int):
+            with progress_lock:
+                progress.update(n, increment=True)
+
+        def load_slice():
+            conn = self._raw_connection()
+            try:
+                self._copy_stream(conn, stage_table_name, cols, next_batches(), on_batch)
+                conn.commit()
+            finally:
+                conn.close()
+
+        with ThreadPoolExecutor(max_workers=self._parallel_connections) as executor:
+            futures = [executor.submit(load_slice) for _ in range(self._parallel_connections)]
+            for future in futures:
+                future.result()
+
+
+    def _drop_stage(self, conn, stage_table_name:str):
+        # best effort, a failed load or upsert must not be hidden by a failed cleanup
+        try:
+            conn.rollback()
+            with conn.cursor() as cur:
+                cur.execute(PostgresSQLUtil.drop_table(stage_table_name))
+            conn.commit()
+        except psycopg2.Error as e:
+            logger.warning(f"Could not drop staging table {stage_table_name}: {e}")
+
+
+    def _raw_connection(self):
+        # using the raw psycopg2 connection for efficiency
+        try:
+            return self._engine.raw_connection()
+        except OperationalError as e:
+            raise DestinationConnectionFailed("Could not connect to destination databse") from e
+
+
     def write(self, ds:Dataset, progress_callback = None):
         # Write a dataset to the destination database 
         self._ds = ds
@@ -135,33 +284,44 @@ class PostgresDestination(SQLDestination):
                     target_schema,         # new schema name
                 )
 
-        # sync each stream
-        for stream in ds.streams:
+        # sync each stream, optionally several at once
+        self._write_streams(ds.streams, lambda stream: self._write_stream(ds, stream, progress_callback))
 
-            # configure progress tracking
-            progress = Progress(
-                f"destination+postgresql://{ds.namespace}/{stream.schema_name}/{stream.name}",
-                total=ds.size(stream),
-                processed=0
-            )
-            if callable(progress_callback):
-                progress.subscribe(progress_callback)
 
-            # Check if there are any records to process
-            stream_size = ds.size(stream)
-            if stream_size == 0:
-                progress.message("No records to process for this stream")
-                continue
+    def _write_stream(self, ds:Dataset, stream:Stream, progress_callback = None):
+
+        # configure progress tracking
+        progress = Progress(
+            f"destination+postgresql://{ds.namespace}/{stream.schema_name}/{stream.name}",
+            total=ds.size(stream),
+            processed=0
+        )
+        if callable(progress_callback):
+            progress.subscribe(progress_callback)
 
-            target_table_name = f"{stream.schema_name}.{stream.name}"
+        # Check if there are any records to process
+        stream_size = ds.size(stream)
+        if stream_size == 0:
+            progress.message("No records to process for this stream")
+            return
+
+        copy = self._load_method == 'copy' and ArrowCopyStream.supports(stream.schema)
+        parallel = copy and self._parallel_connections > 1
+
+        target_table_name = f"{stream.schema_name}.{stream.name}"
+
+        if parallel:
+            # a TEMP table is only visible to its own session, loader connections need a real one
+            batch_id = ds.meta.get('batch_id', '')
+            stage_table_name = f"{stream.schema_name}.pontoon_stage_{stream.name}_{batch_id}"
+            create_stage_sql = PostgresSQLUtil.create_temp_table(stage_table_name, target_table_name, kind='UNLOGGED')
+        else:
             stage_table_name = f"temp_{stream.schema_name}_{stream.name}"
+            create_stage_sql = PostgresSQLUtil.create_temp_table(stage_table_name, target_table_name)
 
-            # using the raw psycopg2 connection for efficiency
-            try:
-                conn = self._engine.raw_connection()
-            except OperationalError as e:
-                raise DestinationConnectionFailed("Could not connect to destination databse") from e
+        conn = self._raw_connection()
 
+        try:
             # Drop existing table if needed
             if self._mode.type == Mode.FULL_REFRESH:
                 with conn.cursor() as cur:
@@ -172,17 +332,14 @@ class PostgresDestination(SQLDestination):
             with self._connect() as base_conn:
                 # create target table for the stream if it doesn't exist
                 table = SQLDestination.create_table_if_not_exists(base_conn, stream)
-
-
-            # temporary staging table
-            create_stage_sql = PostgresSQLUtil.create_temp_table(stage_table_name, target_table_name)
             
             # upsert statement (INSERT ON CONFLICT UPDATE)
             upsert_sql = PostgresSQLUtil.upsert(
                 target_table_name,
                 stage_table_name,
                 stream.schema.names,
-                stream.primary_field
+                stream.primary_field,
+                SQLDestination.checksum_field(stream)
             )
 
             # create the staging table
@@ -193,44 +350,62 @@ class PostgresDestination(SQLDestination):
             
             # load into the stage table
             # note: standard postgresql doesn't support copy from cloud storage
-            batch = []
-            for record in ds.read(stream):
-                batch.append(record)
-                if len(batch) == self._chunk_size:
-                    self._write_batch(conn, stage_table_name, stream.schema.names, batch)
-                    progress.update(self._chunk_size, increment=True)
+            try:
+                if parallel:
+                    self._copy_parallel(stage_table_name, stream.schema.names, ds.read_batches(stream), progress)
+                elif copy:
+                    self._copy_stream(
+                        conn, 
+                        stage_table_name, 
+                        stream.schema.names, 
+                        ds.read_batches(stream), 
+                        lambda n: progress.update(n, increment=True)
+                    )
+                else:
                     batch = []
-            
-            if batch:
-                self._write_batch(conn, stage_table_name, stream.schema.names, batch)
-                progress.update(len(batch), increment=True)
+                    for record in ds.read(stream):
+                        batch.append(record)
+                        if len(batch) == self._chunk_size:
+                            self._write_batch(conn, stage_table_name, stream.schema.names, batch)
+                            progress.update(self._chunk_size, increment=True)
+                            batch = []
+                    
+                    if batch:
+                        self._write_batch(conn, stage_table_name, stream.schema.names, batch)
+                        progress.update(len(batch), increment=True)
+                
+                conn.commit()
                 
-            
-            conn.commit()
-            
-            with conn.cursor() as cur:
-            
-                # upsert staging into target table
-                progress.message("Upserting records into target table")
-                cur.execute(upsert_sql)
-
-                # drop the staging table
                 with conn.cursor() as cur:
-                    cur.execute(
-                        PostgresSQLUtil.drop_table(stage_table_name)
-                    )
+                
+                    # upsert staging into target table
+                    progress.message("Upserting records into target table")
+                    cur.execute(upsert_sql)
+                    self._count_unchanged(stream, ds.size(stream), cur.rowcount)
 
-                # drop target table after loading?
-                if self._drop_after_complete == True:
+                    # drop the staging table
                     with conn.cursor() as cur:
                         cur.execute(
-                            PostgresSQLUtil.drop_table(target_table_name)
+                            PostgresSQLUtil.drop_table(stage_table_name)
                         )
 
-                progress.message("Load complete")
+                    # drop target table after loading?
+                    if self._drop_after_complete == True:
+                        with conn.cursor() as cur:
+                            cur.execute(
+                                PostgresSQLUtil.drop_table(target_table_name)
+                            )
 
-            conn.commit()
+                    progress.message("Load complete")
+
+                conn.commit()
+
+            finally:
+                if parallel:
+                    # unlike a TEMP table the unlogged stage outlives this session
+                    self._drop_stage(conn, stage_table_name)
 
+        finally:
             conn.close()
 
     
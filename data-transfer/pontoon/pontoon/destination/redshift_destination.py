@@ -1,6 +1,7 @@
 from typing import List, Dict, Tuple, Generator, Any
 from sqlalchemy import text, MetaData, Table
 
+from pontoon import logger
 from pontoon.base import Destination, Dataset, Stream, Record, Progress, Mode
 from pontoon.source.sql_source import SQLUtil
 from pontoon.destination.sql_destination import SQLDestination
@@ -17,12 +18,18 @@ class RedshiftSQLUtil:
     
 
     @staticmethod
-    def copy_from_s3(table_name:str, s3_uri:str, iam_role:str, s3_region:str) -> str:
+    def copy_from_s3(table_name:str, s3_uri:str, iam_role:str, s3_region:str, manifest:bool=False) -> str:
         return f"COPY {SQLUtil.safe_identifier(table_name)} "\
                f"FROM '{s3_uri}' "\
                f"IAM_ROLE '{iam_role}' "\
                f"FORMAT AS PARQUET "\
+               f"{'MANIFEST ' if manifest else ''}"\
                f"REGION '{s3_region}'"
+
+
+    @staticmethod
+    def slice_count() -> str:
+        return "SELECT COUNT(*) FROM stv_slices"
     
 
     @staticmethod
@@ -58,85 +65,111 @@ class RedshiftDestination(SQLDestination):
         self._s3_config = S3Config(connect)
         self._iam_role = connect.get('iam_role')
 
+        # files per stream are written as a multiple of the cluster's slices so every slice loads
+        self._slice_count = connect.get('slice_count')
+
+
+    def prepare(self, ds:Dataset):
+        # ask the S3 leg for a COPY manifest of the files it writes
+        ds.meta['copy_manifest'] = True
+
+        # and for a file count that is a multiple of the slice count
+        slices = self._slice_count
+        if slices is None:
+            try:
+                with self._connect() as conn:
+                    slices = conn.execute(text(RedshiftSQLUtil.slice_count())).scalar()
+            except Exception as e:
+                logger.warning(f"Could not read the Redshift slice count, file layout is not slice aligned: {e}")
+                return
+        if slices:
+            ds.meta['file_multiple'] = int(slices)
+
     
     def write(self, ds:Dataset, progress_callback = None):
         # Write a dataset to the destination database 
         self._ds = ds
 
-        with self._connect() as conn:
+        # load each stream, optionally several at once on separate connections
+        self._write_streams(ds.streams, lambda stream: self._write_stream(ds, stream, progress_callback))
 
-            for stream in ds.streams:
-
-                # configure progress tracking
-                progress = Progress(
-                    f"destination+redshift://{ds.namespace}/{stream.schema_name}/{stream.name}",
-                    total=ds.size(stream),
-                    processed=0
-                )
-                if callable(progress_callback):
-                    progress.subscribe(progress_callback)
-
-                # Check if there are any records to process
-                stream_size = ds.size(stream)
-                if stream_size == 0:
-                    progress.message("No records to process for this stream")
-                    continue
-
-                target_table_name = f"{stream.schema_name}.{stream.name}"
-                stage_table_name = f"temp_{stream.schema_name}_{stream.name}"
-
-                if self._mode.type == Mode.FULL_REFRESH:
-                    with conn.begin():
-                        SQLDestination.drop_table(conn, target_table_name)       
-
-                # create a table for the stream if it doesn't exist
-                table = SQLDestination.create_table_if_not_exists(conn, stream)
-
-                # temporary staging table
-                create_stage_sql = RedshiftSQLUtil.create_temp_table(stage_table_name, target_table_name)
-                
-                # S3 copy into the stage table
-                copy_sql = RedshiftSQLUtil.copy_from_s3(
-                    stage_table_name,
-                    S3Destination.get_object_path_uri(
-                        self._s3_config, 
-                        ds.namespace, 
-                        stream,
-                        self._ds.meta.get('dt'),
-                        self._ds.meta.get('batch_id')
-                    ),
-                    self._iam_role,
-                    self._s3_config.region
-                )
-
-                # upsert statements
-                upsert_delete_sql, upsert_insert_sql = RedshiftSQLUtil.upsert(
-                    target_table_name,
-                    stage_table_name,
-                    stream.schema.names,
-                    stream.primary_field
-                )
-
-                # create the staging table and load data into it
-                with conn.begin():
-                    progress.message("Copying records from S3")
-                    conn.execute(text(create_stage_sql))
-                    conn.execute(text(copy_sql))
-                
-                # upsert staging into target table
-                with conn.begin():
-                    progress.message("Upserting records into target table")
-                    conn.execute(text(upsert_delete_sql))
-                    conn.execute(text(upsert_insert_sql))
 
-                # drop the staging table
-                SQLDestination.drop_table(conn, stage_table_name)
+    def _write_stream(self, ds:Dataset, stream:Stream, progress_callback = None):
 
-                # drop target table after loading?
-                if self._drop_after_complete == True:
-                    SQLDestination.drop_table(conn, target_table_name)
+        # configure progress tracking
+        progress = Progress(
+            f"destination+redshift://{ds.namespace}/{stream.schema_name}/{stream.name}",
+            total=ds.size(stream),
+            processed=0
+        )
+        if callable(progress_callback):
+            progress.subscribe(progress_callback)
 
-                progress.update(ds.size(stream))
+        # Check if there are any records to process
+        stream_size = ds.size(stream)
+        if stream_size == 0:
+            progress.message("No records to process for this stream")
+            return
+
+        with self._connect() as conn:
+
+            target_table_name = f"{stream.schema_name}.{stream.name}"
+            stage_table_name = f"temp_{stream.schema_name}_{stream.name}"
+
+            if self._mode.type == Mode.FULL_REFRESH:
+                with conn.begin():
+                    SQLDestination.drop_table(conn, target_table_name)       
+
+            # create a table for the stream if it doesn't exist
+            table = SQLDestination.create_table_if_not_exists(conn, stream)
+
+            # temporary staging table
+            create_stage_sql = RedshiftSQLUtil.create_temp_table(stage_table_name, target_table_name)
+
+            # S3 copy into the stage table, from the manifest of the S3 leg if it wrote one
+            manifest_uri = ds.meta.get('manifests', {}).get(f"{stream.schema_name}.{stream.name}")
+            copy_sql = RedshiftSQLUtil.copy_from_s3(
+                stage_table_name,
+                manifest_uri or S3Destination.get_object_path_uri(
+                    self._s3_config, 
+                    ds.namespace, 
+                    stream,
+                    self._ds.meta.get('dt'),
+                    self._ds.meta.get('batch_id')
+                ),
+                self._iam_role,
+                self._s3_config.region,
+                manifest=manifest_uri is not None
+            )
+
+            # upsert statements
+            upsert_delete_sql, upsert_insert_sql = RedshiftSQLUtil.upsert(
+                target_table_name,
+                stage_table_name,
+                stream.schema.names,
+                stream.primary_field
+            )
+
+            # create the staging table and load data into it
+            with conn.begin():
+                progress.message("Copying records from S3")
+                conn.execute(text(create_stage_sql))
+                conn.execute(text(copy_sql))
+
+            # upsert staging into target table
+            with conn.begin():
+                progress.message("Upserting records into target table")
+                conn.execute(text(upsert_delete_sql))
+                conn.execute(text(upsert_insert_sql))
+
+            # drop the staging table
+            SQLDestination.drop_table(conn, stage_table_name)
+
+            # drop target table after loading?
+            if self._drop_after_complete == True:
+                SQLDestination.drop_table(conn, target_table_name)
+
+            progress.update(ds.size(stream))
 
     
     def close(self):
@@ -1,9 +1,14 @@
 import os
-from typing import List, Dict, Any
+import json
+from typing import List, Dict, Any, Tuple
+import pyarrow as pa
 import boto3
+from botocore.config import Config
+from boto3.s3.transfer import TransferConfig
 from pontoon.base import Namespace, Destination, Stream, Dataset, Record, Progress
 from pontoon.base import DestinationError
 from pontoon.destination import ObjectStoreBase
+from pontoon.destination.object_store_base import ParquetObject
 from pontoon.destination.integrity import S3Integrity
 
 
@@ -31,11 +36,28 @@ class S3Destination(ObjectStoreBase):
 
         # our s3 config
         self._s3_config = S3Config(config['connect'])
+        self._s3 = None
+
+        # multipart settings for each upload, every upload worker can run multipart_concurrency parts at once
+        connect = config['connect']
+        self._transfer_config = TransferConfig(
+            multipart_threshold=connect.get('multipart_threshold_mb', 8) * 1024 * 1024,
+            multipart_chunksize=connect.get('multipart_chunksize_mb', 8) * 1024 * 1024,
+            max_concurrency=connect.get('multipart_concurrency', 4),
+            use_threads=True
+        )
 
         if self._format not in ['staging', 'hive']:
             raise DestinationError(f'Format {self._format} is not supported by S3')
 
     def _get_s3_client(self):
+        # the S3 client is thread-safe, create it once and share it across batches
+        with self._client_lock:
+            if self._s3 is None:
+                self._s3 = self._create_s3_client()
+            return self._s3
+
+    def _create_s3_client(self):
         # get S3 client using configured auth type
 
         connect = self._config.get('connect')
@@ -48,49 +70,67 @@ class S3Destination(ObjectStoreBase):
             's3',
             aws_access_key_id=connect.get('aws_access_key_id'),
             aws_secret_access_key=connect.get('aws_secret_access_key'),
-            region_name=self._s3_config.region
+            region_name=self._s3_config.region,
+            config=Config(
+                max_pool_connections=max(self._max_connections, self._upload_workers * self._transfer_config.max_concurrency),
+                retries={'max_attempts': 5, 'mode': 'adaptive'},
+                tcp_keepalive=True
+            )
         )
 
+    def _release_clients(self):
+        with self._client_lock:
+            if self._s3 is not None:
+                self._s3.close()
+                self._s3 = None
+
     def _write_stream(self, stream:Stream):
         pass
     
-    def _write_batch(self, stream:Stream, batch:List[Record], batch_index:int):
-       
-        # Write a batch of records to S3 formatted as Parquet
-        s3 = self._get_s3_client()
-
-        # write the parquet file
-        parquet_file_path = ObjectStoreBase._write_parquet(
-            stream,
-            batch,
-            parquet_config=self._config.get('parquet', {})
-        )
-        
-        # upload to s3
-        if self._format == 'staging':
-            parquet_s3_path = ObjectStoreBase.get_object_filename(
-                self._s3_config, 
-                self._ds.namespace, 
-                stream, 
-                self._dt,
-                self._batch_id, 
-                batch_index
-            )
-        elif self._format == 'hive':
-            parquet_s3_path = ObjectStoreBase.get_hive_filename(
-                self._s3_config, 
-                self._ds.namespace, 
-                stream, 
-                self._dt,
-                self._batch_id, 
-                batch_index
+    def _upload_object(self, stream:Stream, obj:ParquetObject, batch_index:int):
+        # upload an encoded parquet file to S3, large files are sent as concurrent multipart uploads
+        parquet_s3_path = self._object_filename(self._s3_config, stream, batch_index)
+
+        with obj.open() as data:
+            self._get_s3_client().upload_fileobj(
+                data,
+                self._s3_config.bucket_name,
+                parquet_s3_path,
+                Config=self._transfer_config
             )
 
-        s3.upload_file(parquet_file_path, self._s3_config.bucket_name, parquet_s3_path)
-        
-        # clean up
-        os.remove(parquet_file_path)
-   
+
+    def _finish_stream(self, stream:Stream, objects:List[Tuple[int, int, int]]):
+        # write a COPY manifest listing exactly the files of this batch, with their sizes,
+        # only when a later destination (e.g. Redshift COPY) asked for one
+        if self._format != 'staging' or not self._ds.meta.get('copy_manifest'):
+            return
+
+        manifest = {
+            'entries': [
+                {
+                    'url': f"s3://{self._s3_config.bucket_name}/{self._object_filename(self._s3_config, stream, batch_index)}",
+                    'mandatory': True,
+                    'meta': {'content_length': size}
+                }
+                for batch_index, size, _ in objects
+            ]
+        }
+        self._get_s3_client().put_object(
+            Bucket=self._s3_config.bucket_name,
+            Key=ObjectStoreBase.get_manifest_filename(self._s3_config, self._ds.namespace, stream, self._dt, self._batch_id),
+            Body=json.dumps(manifest).encode('utf-8')
+        )
+
+        # tell later destinations (e.g. Redshift COPY) where to find it
+        self._ds.meta.setdefault('manifests', {})[f"{stream.schema_name}.{stream.name}"] = ObjectStoreBase.get_manifest_uri(
+            self._s3_config, self._ds.namespace, stream, self._dt, self._batch_id
+        )
+
 
     def integrity(self):
-        return S3Integrity(self._get_s3_client())    
+        return S3Integrity(
+            self._get_s3_client(),
+            self._s3_config.bucket_name,
+            self._written_objects(lambda stream, batch_index: self._object_filename(self._s3_config, stream, batch_index))
+        )    
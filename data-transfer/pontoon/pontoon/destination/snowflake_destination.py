@@ -1,6 +1,7 @@
 from typing import List, Dict, Tuple, Generator, Any
 from sqlalchemy import create_engine, text
 
+from pontoon.engine_registry import registry
 from pontoon.base import Destination, Dataset, Stream, Record, Progress, Mode
 from pontoon.source.sql_source import SQLUtil
 from pontoon.destination.sql_destination import SQLDestination
@@ -20,17 +21,41 @@ class SnowflakeSQLUtil:
                f"MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE "\
                f"PATTERN = '{pattern}'"
 
+    # COPY accepts at most 1000 names in FILES
+    MAX_COPY_FILES = 1000
+
+    @staticmethod
+    def copy_files_into_table(target_table_name:str, stage_name:str, files:List[str], purge:bool=False) -> List[str]:
+        # one COPY per chunk of files, only the listed files are read from the stage
+        statements = []
+        for i in range(0, len(files), SnowflakeSQLUtil.MAX_COPY_FILES):
+            files_str = ','.join([f"'{f}'" for f in files[i:i + SnowflakeSQLUtil.MAX_COPY_FILES]])
+            statements.append(
+                f"COPY INTO {SQLUtil.safe_identifier(target_table_name)} "\
+                f"FROM @{SQLUtil.safe_identifier(stage_name)} "\
+                f"FILES = ({files_str}) "\
+                f"FILE_FORMAT = (TYPE = PARQUET) "\
+                f"MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE"\
+                f"{' PURGE = TRUE' if purge else ''}"
+            )
+        return statements
+
     @staticmethod
-    def merge(target_table_name:str, stage_table_name:str, cols:List[str], primary_key:str) -> str:
+    def merge(target_table_name:str, stage_table_name:str, cols:List[str], primary_key:str, checksum_field:str=None) -> str:
         s = SQLUtil.safe_identifier
         cols_str = ','.join([s(col) for col in cols])
         cols_stage_str = ','.join([f"stage.{s(col)}" for col in cols])
         update_set_str = ','.join([f"target.{s(col)}=stage.{s(col)}" for col in cols if col != primary_key])
 
+        # only rewrite matched rows whose content changed
+        matched_str = "WHEN MATCHED THEN "
+        if checksum_field:
+            matched_str = f"WHEN MATCHED AND target.{s(checksum_field)} IS DISTINCT FROM stage.{s(checksum_field)} THEN "
+
         merge_sql = f"MERGE INTO {s(target_table_name)} AS target "\
                     f"USING {s(stage_table_name)} AS stage "\
                     f"ON target.{s(primary_key)} = stage.{s(primary_key)} "\
-                    f"WHEN MATCHED THEN "\
+                    f"{matched_str}"\
                     f"UPDATE SET {update_set_str} "\
                     f"WHEN NOT MATCHED THEN "\
                     f"INSERT ({cols_str}) "\
@@ -51,12 +76,16 @@ class SnowflakeDestination(SQLDestination):
         connect = config.get('connect')
         self._stage_name = connect.get('stage_name')
         self._delete_stage = connect.get('delete_stage', False)
+        self._purge_stage_files = connect.get('purge_stage_files', False)
 
         auth_type = connect.get('auth_type')
         if auth_type == 'access_token':
-            self._engine = create_engine(
-                f"snowflake://{connect['user']}:{connect['access_token']}@"\
-                f"{connect['account']}/{connect['database']}/{connect['target_schema']}?warehouse={connect['warehouse']}"
+            url = f"snowflake://{connect['user']}:{connect['access_token']}@"\
+                  f"{connect['account']}/{connect['database']}/{connect['target_schema']}?warehouse={connect['warehouse']}"
+            self._engine = registry.get(
+                type(self).__name__,
+                connect,
+                lambda: create_engine(url, **registry.pool_options(url, self._max_connections(connect)))
             )
         else:
             raise Exception(f"Snowflake (destination-snowflake) does not support auth type '{auth_type}'")
@@ -67,82 +96,100 @@ class SnowflakeDestination(SQLDestination):
         self._ds = ds
 
         if self._stage_name == None:
-            self._stage_name = self._ds.meta('stage_name')
+            self._stage_name = self._ds.meta.get('stage_name')
 
-        with self._connect() as conn:
+        # load each stream, optionally several at once on separate connections
+        self._write_streams(ds.streams, lambda stream: self._write_stream(ds, stream, progress_callback))
 
-            for stream in ds.streams:
+        # delete the loading stage if configured to
+        if self._delete_stage:
+            with self._connect() as conn:
+                with conn.begin():
+                    conn.execute(text(f"DROP STAGE {self._stage_name}"))
 
-                # configure progress tracking
-                progress = Progress(
-                    f"destination+snowflake://{ds.namespace}/{stream.schema_name}/{stream.name}",
-                    total=ds.size(stream),
-                    processed=0
-                )
-                if callable(progress_callback):
-                    progress.subscribe(progress_callback)
 
-                # Check if there are any records to process
-                stream_size = ds.size(stream)
-                if stream_size == 0:
-                    progress.message("No records to process for this stream")
-                    continue
+    def _write_stream(self, ds:Dataset, stream:Stream, progress_callback = None):
 
-                target_table_name = f"{stream.schema_name}.{stream.name}"
-                stage_table_name = f"{stream.schema_name}.__temp_{stream.name}"
+        # configure progress tracking
+        progress = Progress(
+            f"destination+snowflake://{ds.namespace}/{stream.schema_name}/{stream.name}",
+            total=ds.size(stream),
+            processed=0
+        )
+        if callable(progress_callback):
+            progress.subscribe(progress_callback)
 
-                # drop target depending on sync mode
-                if self._mode.type == Mode.FULL_REFRESH:
-                    SQLDestination.drop_table(conn, target_table_name)
+        # Check if there are any records to process
+        stream_size = ds.size(stream)
+        if stream_size == 0:
+            progress.message("No records to process for this stream")
+            return
 
-                # create a table for the stream if it doesn't exist
-                SQLDestination.create_table_if_not_exists(conn, stream)
+        with self._connect() as conn:
 
-                # sql to create staging table
-                stage_table_sql = SnowflakeSQLUtil.create_temp_table(
-                    stage_table_name, 
-                    target_table_name
-                )
+            target_table_name = f"{stream.schema_name}.{stream.name}"
+            stage_table_name = f"{stream.schema_name}.__temp_{stream.name}"
 
-                # sql to copy from storage stage into the staging table
-                copy_sql = SnowflakeSQLUtil.copy_into_table(
-                    stage_table_name, 
-                    self._stage_name, 
-                    f".*{stream.schema_name}__{stream.name}.*\\.parquet"
-                )
+            # drop target depending on sync mode
+            if self._mode.type == Mode.FULL_REFRESH:
+                SQLDestination.drop_table(conn, target_table_name)
 
-                # sql to MERGE the staging table into the target table
-                merge_sql = SnowflakeSQLUtil.merge(
-                    target_table_name,
+            # create a table for the stream if it doesn't exist
+            SQLDestination.create_table_if_not_exists(conn, stream)
+
+            # sql to create staging table
+            stage_table_sql = SnowflakeSQLUtil.create_temp_table(
+                stage_table_name, 
+                target_table_name
+            )
+
+            # sql to copy from storage stage into the staging table, driven by the files the
+            # storage leg uploaded for this batch when it published them
+            stage_files = ds.meta.get('stage_files', {}).get(f"{stream.schema_name}.{stream.name}")
+            if stage_files:
+                copy_statements = SnowflakeSQLUtil.copy_files_into_table(
                     stage_table_name,
-                    stream.schema.names,
-                    stream.primary_field
+                    self._stage_name,
+                    stage_files,
+                    self._purge_stage_files
                 )
+            else:
+                copy_statements = [SnowflakeSQLUtil.copy_into_table(
+                    stage_table_name, 
+                    self._stage_name, 
+                    f".*{stream.schema_name}__{stream.name}.*\\.parquet"
+                )]
+
+            # sql to MERGE the staging table into the target table
+            merge_sql = SnowflakeSQLUtil.merge(
+                target_table_name,
+                stage_table_name,
+                stream.schema.names,
+                stream.primary_field,
+                SQLDestination.checksum_field(stream)
+            )
 
-                # run the copy
-                with conn.begin():
-                    progress.message("Loading records from stage")
-                    conn.execute(text(stage_table_sql))
+            # run the copy
+            with conn.begin():
+                progress.message("Loading records from stage")
+                conn.execute(text(stage_table_sql))
+                for copy_sql in copy_statements:
                     conn.execute(text(copy_sql))
-                
-                # run the merge
-                with conn.begin():
-                    progress.message("Merging records into target table")
-                    conn.execute(text(merge_sql))
-                
-                # clean up
-                SQLDestination.drop_table(conn, stage_table_name)
-
-                 # drop target table after loading?
-                if self._drop_after_complete == True:
-                    SQLDestination.drop_table(conn, target_table_name)
-            
-                progress.update(ds.size(stream))
-
-            # delete the loading stage if configured to
-            if self._delete_stage:
-                with conn.begin():
-                    conn.execute(text(f"DROP STAGE {self._stage_name}"))
+
+            # run the merge
+            with conn.begin():
+                progress.message("Merging records into target table")
+                result = conn.execute(text(merge_sql))
+                self._count_unchanged(stream, ds.size(stream), result.rowcount)
+
+            # clean up
+            SQLDestination.drop_table(conn, stage_table_name)
+
+             # drop target table after loading?
+            if self._drop_after_complete == True:
+                SQLDestination.drop_table(conn, target_table_name)
+
+            progress.update(ds.size(stream))
 
 
     
@@ -1,16 +1,29 @@
 import os
-from typing import List, Dict, Any
+import shutil
+import tempfile
+from typing import List, Dict, Any, Tuple
+import pyarrow as pa
 from datetime import datetime
 import snowflake.connector
 from pontoon.base import Namespace, Destination, Stream, Dataset, Record, Progress
 from pontoon.base import DestinationError, DestinationConnectionFailed
 from pontoon.source.sql_source import SQLUtil
 from pontoon.destination import ObjectStoreBase
-from pontoon.destination.integrity import SMSIntegrity
+from pontoon.destination.object_store_base import ParquetObject
+from pontoon.destination.integrity import SMSExistenceIntegrity
 
 
 class SnowflakeStorageDestination(ObjectStoreBase):
-    """ A Destination that writes to Snowflake managed storage as Parquet """
+    """ A Destination that writes to Snowflake managed storage as Parquet
+
+    Encoded files of a stream are collected in a local staging directory and sent with
+    a single PUT per stream that uploads put_parallel files at once. With temp_files
+    disabled nothing is written locally, each file is PUT from memory as it is encoded.
+    """
+
+
+    # staged files are moved into the stream's PUT directory
+    SHARES_OBJECTS = False
 
 
     def __init__(self, config):
@@ -23,11 +36,17 @@ class SnowflakeStorageDestination(ObjectStoreBase):
         connect = config.get('connect')
         self._stage_name = connect.get('stage_name')
         self._create_stage = connect.get('create_stage', False)
-        self._parquet_config = connect.get('parquet', {})
 
         if self._format != 'staging':
             raise DestinationError(f'Format {self._format} is not supported by Snowflake Storage')
 
+        # the connection shared by every PUT of a write
+        self._snow = None
+
+        # threads the snowflake connector uploads a directory PUT with (1-99)
+        self._put_parallel = connect.get('put_parallel', 16)
+        self._put_dir = None
+
     
     def _get_snowflake_client(self):
         c = self._config.get('connect')
@@ -44,44 +63,103 @@ class SnowflakeStorageDestination(ObjectStoreBase):
             raise DestinationConnectionFailed("Failed to connect to Snowflake") from e
 
 
-    def _write_stream(self, stream:Stream):
-        pass
+    def _get_connection(self):
+        # open one connection per write instead of one per batch
+        with self._client_lock:
+            if self._snow is None:
+                self._snow = self._get_snowflake_client()
+            return self._snow
 
 
-    def _write_batch(self, stream:Stream, batch:List[Record], batch_index:int):
-        # Write a batch of records to snowflake storage formatted as Parquet
-        
-        snow = self._get_snowflake_client()
-        cur = snow.cursor()
+    def _release_clients(self):
+        with self._client_lock:
+            if self._snow is not None:
+                self._snow.close()
+                self._snow = None
+        if self._put_dir is not None:
+            shutil.rmtree(self._put_dir, ignore_errors=True)
+            self._put_dir = None
 
-        # get the filename for our parquet file
-        parquet_file_path = ObjectStoreBase.get_object_name(
+
+    def _stream_put_dir(self, stream:Stream) -> str:
+        return os.path.join(self._put_dir, f"{stream.schema_name}__{stream.name}")
+
+
+    def _write_stream(self, stream:Stream):
+        # collect the stream's files in a local directory for a single PUT
+        if self._temp_files:
+            if self._put_dir is None:
+                self._put_dir = tempfile.mkdtemp(prefix='pontoon_put_', dir=self._spill_dir)
+            os.makedirs(self._stream_put_dir(stream), exist_ok=True)
+
+
+    def _upload_object(self, stream:Stream, obj:ParquetObject, batch_index:int):
+        # PUT the encoded file from a stream under its object name, the connection is shared by the upload threads
+        parquet_file_name = ObjectStoreBase.get_object_name(
             stream,
             self._dt,
             self._batch_id,
             batch_index
         )
 
-        # write the parquet file locally
-        ObjectStoreBase._write_parquet(
-            stream,
-            batch,
-            output_path=parquet_file_path,
-            parquet_config=self._parquet_config
-        )
+        if self._temp_files:
+            # staged locally, sent by the stream's PUT in _finish_stream
+            staged_path = os.path.join(self._stream_put_dir(stream), parquet_file_name)
+            if obj.path is not None:
+                shutil.move(obj.path, staged_path)
+            else:
+                with open(staged_path, 'wb') as f:
+                    f.write(obj.buffer)
+            return
+
+        cur = self._get_connection().cursor()
+        try:
+            with obj.open() as data:
+                cur.execute(f"PUT file://{parquet_file_name} @{self._stage_name} AUTO_COMPRESS = FALSE", file_stream=data)
+                SnowflakeStorageDestination._check_put(cur.fetchall())
+        finally:
+            cur.close()
 
-        # upload to snowflake
-        upload_query = f"PUT file://{parquet_file_path} @{self._stage_name}"
-        cur.execute(upload_query)
-        cur.close()
-        snow.close()
-        
-        # clean up
-        os.remove(parquet_file_path)
+
+    def _finish_stream(self, stream:Stream, objects:List[Tuple[int, int, int]]):
+        # tell the Snowflake COPY exactly which staged files belong to this batch
+        self._ds.meta.setdefault('stage_files', {})[f"{stream.schema_name}.{stream.name}"] = [
+            ObjectStoreBase.get_object_name(stream, self._dt, self._batch_id, batch_index)
+            for batch_index, _, _ in objects
+        ]
+
+        # upload every staged file of the stream with one parallel PUT
+        if not self._temp_files or not objects:
+            return
+
+        put_dir = self._stream_put_dir(stream)
+        cur = self._get_connection().cursor()
+        try:
+            # parquet is already compressed, skip gzip on the client
+            cur.execute(
+                f"PUT 'file://{put_dir}/*' @{self._stage_name} "
+                f"PARALLEL = {self._put_parallel} AUTO_COMPRESS = FALSE"
+            )
+            SnowflakeStorageDestination._check_put(cur.fetchall())
+        finally:
+            cur.close()
+            shutil.rmtree(put_dir, ignore_errors=True)
+
+
+    @staticmethod
+    def _check_put(rows:List[Tuple]):
+        # PUT reports a status per file (source, target, sizes, compression, status, message)
+        failed = [row for row in rows if len(row) > 6 and row[6] not in ('UPLOADED', 'SKIPPED')]
+        if failed:
+            raise DestinationError(f"Snowflake PUT failed for {len(failed)} file(s): {failed[0][0]} {failed[0][6]} {failed[0][7] if len(failed[0]) > 7 else ''}")
    
     
     def integrity(self):
-        return SMSIntegrity(self._get_snowflake_client())
+        return SMSExistenceIntegrity(
+            self._get_connection(),
+            self._stage_name,
+            self._written_objects(lambda stream, batch_index: ObjectStoreBase.get_object_name(stream, self._dt, self._batch_id, batch_index))
+        )
         
     
     def write(self, ds:Dataset, progress_callback=None):
@@ -93,11 +171,9 @@ class SnowflakeStorageDestination(ObjectStoreBase):
             
             ds.meta['stage_name'] = self._stage_name
 
-            snow = self._get_snowflake_client()
-            cur = snow.cursor()
+            cur = self._get_connection().cursor()
             cur.execute(f"CREATE OR REPLACE STAGE {SQLUtil.safe_identifier(self._stage_name)} FILE_FORMAT = (TYPE = PARQUET)")
             cur.close()
-            snow.close()
 
         # defer to ObjectStoreBase for the rest
         super().write(ds, progress_callback)
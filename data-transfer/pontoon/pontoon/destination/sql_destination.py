@@ -1,20 +1,34 @@
-from typing import List, Dict, Tuple, Generator, Any
+import os
+import tempfile
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Generator, Any, Callable
 import pyarrow as pa
+from psycopg2.extras import execute_values
 from sqlalchemy import create_engine, inspect, MetaData, Table, Column, text, insert
 from sqlalchemy import Integer, BigInteger, SmallInteger, String, Text, Float, Numeric, Boolean, Date, Time, DateTime
 from sqlalchemy.exc import SQLAlchemyError, OperationalError, DatabaseError, InterfaceError, NoSuchTableError
 from snowflake.sqlalchemy import TIMESTAMP_LTZ, TIMESTAMP_NTZ, TIMESTAMP_TZ 
 from sqlalchemy.orm import sessionmaker
 
+from pontoon import logger
+from pontoon.engine_registry import registry
 from pontoon.base import Destination, Dataset, Stream, Record, Mode, Progress
-from pontoon.base import DestinationConnectionFailed, DestinationStreamInvalidSchema
+from pontoon.base import DestinationConnectionFailed, DestinationStreamInvalidSchema, DestinationStreamsFailed
 
+from pontoon.source.sql_source import SQLUtil
 from pontoon.destination.integrity import SQLIntegrity
 
 
 class SQLDestination(Destination):
     """ A Destination that writes to SQL data stores supported by SQLAlchemy """
 
+    # row checksum column added by Stream.with_checksum()
+    CHECKSUM_FIELD = 'pontoon__checksum'
+
+    # MySQL errors for LOAD DATA LOCAL INFILE being disabled on the server or the client
+    MYSQL_INFILE_REJECTED = (1148, 2068, 3948)
+
 
     # map arrow types to sqlalchemy types
     PYARROW_TO_ALCHEMY = {
@@ -146,7 +160,12 @@ class SQLDestination(Destination):
             
             # Use flexible schema comparison that ignores column order
             if not SQLDestination.schemas_compatible(stream.schema, existing_schema):
-                raise DestinationStreamInvalidSchema(f"Existing schema for stream {name} does not match.")
+                if not SQLDestination.missing_checksum(stream.schema, existing_schema):
+                    raise DestinationStreamInvalidSchema(f"Existing schema for stream {name} does not match.")
+
+                # skip_unchanged was turned on for a table loaded without checksums
+                SQLDestination.add_column(conn, table, stream, SQLDestination.CHECKSUM_FIELD)
+                table = Table(name, MetaData(), schema=stream.schema_name, autoload_with=conn)
 
         else:
 
@@ -166,6 +185,33 @@ class SQLDestination(Destination):
         return table
 
 
+    @staticmethod
+    def checksum_field(stream:Stream) -> str:
+        # the row checksum column, if the stream carries one (see Stream.with_checksum)
+        return SQLDestination.CHECKSUM_FIELD if SQLDestination.CHECKSUM_FIELD in stream.schema.names else None
+
+
+    @staticmethod
+    def missing_checksum(stream_schema:pa.Schema, existing_schema:pa.Schema) -> bool:
+        # the existing table matches the stream except for the checksum column it doesn't have yet
+        field = SQLDestination.CHECKSUM_FIELD
+        if field not in stream_schema.names or field in existing_schema.names:
+            return False
+        return SQLDestination.schemas_compatible(stream_schema.remove(stream_schema.get_field_index(field)), existing_schema)
+
+
+    @staticmethod
+    def add_column(conn, table, stream:Stream, field_name:str):
+        # add a stream field to an existing table, rows already in it get NULL
+        preparer = conn.dialect.identifier_preparer
+        col_type = SQLDestination.PYARROW_TO_ALCHEMY[stream.schema.field(field_name).type]
+        with conn.begin():
+            conn.execute(text(
+                f"ALTER TABLE {preparer.format_table(table)} "
+                f"ADD COLUMN {preparer.quote(field_name)} {col_type().compile(dialect=conn.dialect)}"
+            ))
+
+
     @staticmethod
     def drop_table(conn, table_name:str):
         # drop a table
@@ -181,23 +227,49 @@ class SQLDestination(Destination):
         self._drop_after_complete = config.get('drop_after_complete', False)
         self._connection_info = config.get('connect')
 
+        # rows per stream the merge skipped because their checksum didn't change
+        self._unchanged = {}
+
         connect = config.get('connect')
 
         # batch size for reading records from cache and writing to destination
         self._chunk_size = connect.get('chunk_size', 1024)
 
+        # how a full refresh clears the target: 'delete', 'truncate' or 'swap' (load a new table, then rename it)
+        self._full_refresh = connect.get('full_refresh', 'delete')
+
+        # opt in to MySQL LOAD DATA LOCAL INFILE, the server has to allow local_infile too
+        self._local_infile = connect.get('local_infile', False)
+
+        # streams loaded at once, each on its own connection
+        self._parallel_streams = int(connect.get('parallel_streams', 1))
+
         # configure the SQLAlchemy engine
         auth_type = connect.get('auth_type')
 
         # implement basic auth type here
         if auth_type == 'basic':
             if connect.get('dsn'):
-                self._engine = create_engine(connect.get('dsn'))
+                url = connect.get('dsn')
             else:
-                self._engine = create_engine(
-                    f"{connect['driver']}://{connect['user']}:{connect['password']}@"\
-                    f"{connect['host']}:{connect['port']}/{connect['database']}"
-                ) 
+                url = f"{connect['driver']}://{connect['user']}:{connect['password']}@"\
+                      f"{connect['host']}:{connect['port']}/{connect['database']}"
+
+            engine_options = registry.pool_options(url, self._max_connections(connect))
+            if url.startswith('mysql') and self._local_infile:
+                # LOAD DATA LOCAL INFILE has to be enabled on the client
+                engine_options['connect_args'] = {'local_infile': True}
+
+            self._engine = registry.get(
+                type(self).__name__,
+                connect,
+                lambda: create_engine(url, **engine_options)
+            )
+
+
+    def _max_connections(self, connect:dict) -> int:
+        # connections a write holds at once, one per stream loaded in parallel
+        return self._parallel_streams
 
 
     def _connect(self):
@@ -207,6 +279,30 @@ class SQLDestination(Destination):
             raise DestinationConnectionFailed("Failed to connect to destination database") from e
 
 
+    def _write_streams(self, streams:List[Stream], write_stream:Callable[[Stream], None]):
+        # run write_stream for every stream, up to parallel_streams at once
+        if self._parallel_streams <= 1:
+            for stream in streams:
+                write_stream(stream)
+            return
+
+        # let every stream finish and report all failures together
+        errors = {}
+        with ThreadPoolExecutor(max_workers=self._parallel_streams, thread_name_prefix='pontoon-stream') as executor:
+            futures = [(stream, executor.submit(write_stream, stream)) for stream in streams]
+            for stream, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Writing stream {stream.schema_name}.{stream.name} failed: {e}")
+                    errors[f"{stream.schema_name}.{stream.name}"] = e
+
+        if len(errors) == 1:
+            raise next(iter(errors.values()))
+        if errors:
+            raise DestinationStreamsFailed(errors)
+
+
     def _batch_to_rows(self, stream:Stream, batch:List[Record]):
         # Turn a batch of records into a list of python dicts
         cols = stream.schema.names
@@ -217,12 +313,180 @@ class SQLDestination(Destination):
 
 
     def _write_batch(self, conn, table, stream:Stream, batch:List[Record]):
-        # write a batch of records to the database
-        conn.execute(insert(table), self._batch_to_rows(stream, batch))
+        # write a batch of records to the database with the fastest bulk path for the dialect
+        dialect = conn.dialect
+
+        if dialect.name == 'postgresql' and dialect.driver == 'psycopg2':
+            self._write_batch_values(conn, table, stream, batch)
+        elif dialect.name == 'mysql':
+            self._write_batch_mysql(conn, table, stream, batch)
+        elif dialect.paramstyle in ('qmark', 'format'):
+            self._write_batch_many(conn, table, stream, batch)
+        else:
+            conn.execute(insert(table), self._batch_to_rows(stream, batch))
+
+
+    @staticmethod
+    def _table_ref(conn, table) -> str:
+        preparer = conn.dialect.identifier_preparer
+        return preparer.format_table(table)
+
+
+    @staticmethod
+    def _column_refs(conn, stream:Stream) -> str:
+        preparer = conn.dialect.identifier_preparer
+        return ', '.join([preparer.quote(col) for col in stream.schema.names])
+
+
+    def _write_batch_values(self, conn, table, stream:Stream, batch:List[Record]):
+        # psycopg2 multi-row VALUES from tuples
+        with conn.connection.cursor() as cur:
+            execute_values(
+                cur,
+                f"INSERT INTO {SQLDestination._table_ref(conn, table)} ({SQLDestination._column_refs(conn, stream)}) VALUES %s",
+                [tuple(record.data) for record in batch],
+                page_size=len(batch)
+            )
+
+
+    def _write_batch_many(self, conn, table, stream:Stream, batch:List[Record]):
+        # DBAPI executemany with tuple rows, values still go through the column type bind processors
+        processors = [table.c[col].type.dialect_impl(conn.dialect).bind_processor(conn.dialect) for col in stream.schema.names]
+        placeholder = '?' if conn.dialect.paramstyle == 'qmark' else '%s'
+        insert_sql = f"INSERT INTO {SQLDestination._table_ref(conn, table)} ({SQLDestination._column_refs(conn, stream)}) "\
+                     f"VALUES ({', '.join([placeholder] * len(processors))})"
+
+        rows = [
+            tuple(p(v) if p is not None and v is not None else v for p, v in zip(processors, record.data))
+            for record in batch
+        ]
+
+        cur = conn.connection.cursor()
+        try:
+            cur.executemany(insert_sql, rows)
+        finally:
+            cur.close()
+
+
+    def _write_batch_mysql(self, conn, table, stream:Stream, batch:List[Record]):
+        # LOAD DATA LOCAL INFILE when enabled, executemany otherwise (MySQL drivers take %s placeholders)
+        if not self._local_infile:
+            self._write_batch_many(conn, table, stream, batch)
+            return
+
+        try:
+            self._write_batch_infile(conn, table, stream, batch)
+        except DatabaseError as e:
+            if getattr(e.orig, 'args', [None])[0] not in SQLDestination.MYSQL_INFILE_REJECTED:
+                raise
+            # the server doesn't allow local files, insert this and later batches instead
+            logger.warning(f"LOAD DATA LOCAL INFILE was rejected, falling back to inserts: {e.orig}")
+            self._local_infile = False
+            self._write_batch_many(conn, table, stream, batch)
+
+
+    @staticmethod
+    def _infile_value(value:Any) -> str:
+        # a field for LOAD DATA with FIELDS ENCLOSED BY '"' ESCAPED BY ''
+        if value is None:
+            return 'NULL'
+        if isinstance(value, bool):
+            return '1' if value else '0'
+        if isinstance(value, (int, float)):
+            return str(value)
+        if isinstance(value, (bytes, bytearray)):
+            # loaded through a user variable with UNHEX(), see _infile_columns
+            return value.hex()
+        if isinstance(value, datetime):
+            if value.tzinfo is not None:
+                value = value.astimezone(timezone.utc).replace(tzinfo=None)
+            value = value.isoformat(sep=' ')
+        return '"' + str(value).replace('"', '""') + '"'
+
+
+    @staticmethod
+    def _infile_columns(conn, stream:Stream) -> Tuple[str, str]:
+        # LOAD DATA column list and SET clause, binary fields are read into variables as hex
+        preparer = conn.dialect.identifier_preparer
+        columns = []
+        assignments = []
+        for i, field in enumerate(stream.schema):
+            if pa.types.is_binary(field.type) or pa.types.is_large_binary(field.type):
+                columns.append(f"@v{i}")
+                assignments.append(f"{preparer.quote(field.name)} = UNHEX(@v{i})")
+            else:
+                columns.append(preparer.quote(field.name))
+
+        set_clause = f" SET {', '.join(assignments)}" if assignments else ''
+        return ', '.join(columns), set_clause
+
+
+    def _write_batch_infile(self, conn, table, stream:Stream, batch:List[Record]):
+        # MySQL bulk load from a local CSV file
+        columns, set_clause = SQLDestination._infile_columns(conn, stream)
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+                for record in batch:
+                    f.write(','.join([SQLDestination._infile_value(v) for v in record.data]))
+                    f.write('\n')
+
+            conn.execute(text(
+                f"LOAD DATA LOCAL INFILE '{path}' INTO TABLE {SQLDestination._table_ref(conn, table)} "
+                f"CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+                f"LINES TERMINATED BY '\\n' "
+                f"({columns}){set_clause}"
+            ))
+        finally:
+            os.unlink(path)
+
+
+    def _clear_table(self, conn, table):
+        # remove existing rows before a full refresh load
+        # TRUNCATE is opt-in, on MySQL and Redshift it commits and an empty target survives a failed load
+        if self._full_refresh == 'truncate' and conn.dialect.name != 'sqlite':
+            conn.execute(text(f"TRUNCATE TABLE {SQLDestination._table_ref(conn, table)}"))
+        else:
+            conn.execute(table.delete())
+
+
+    @staticmethod
+    def swap_tables(conn, schema_name:str, table_name:str, new_table_name:str):
+        # replace a table with a freshly loaded one
+        preparer = conn.dialect.identifier_preparer
+        schema = preparer.quote_schema(schema_name)
+        target = f"{schema}.{preparer.quote(table_name)}"
+        new = f"{schema}.{preparer.quote(new_table_name)}"
+
+        if conn.dialect.name == 'mysql':
+            old = f"{schema}.{preparer.quote(new_table_name + '_old')}"
+            conn.execute(text(f"DROP TABLE IF EXISTS {old}"))
+            if inspect(conn).has_table(table_name, schema_name):
+                # RENAME TABLE swaps both names atomically
+                conn.execute(text(f"RENAME TABLE {target} TO {old}, {new} TO {target}"))
+                conn.execute(text(f"DROP TABLE {old}"))
+            else:
+                conn.execute(text(f"RENAME TABLE {new} TO {target}"))
+        else:
+            with conn.begin():
+                conn.execute(text(f"DROP TABLE IF EXISTS {target}"))
+                conn.execute(text(f"ALTER TABLE {new} RENAME TO {preparer.quote(table_name)}"))
+
+    
+    def _count_unchanged(self, stream:Stream, staged:int, affected:int):
+        # remember how many staged rows a checksum merge skipped, for the integrity check,
+        # every staged row the merge didn't insert or update kept its old batch id
+        if SQLDestination.checksum_field(stream) is None or stream.primary_field is None:
+            return
+        if affected is None or affected < 0:
+            # the driver didn't report a rowcount for the merge
+            return
+        self._unchanged[f"{stream.schema_name}.{stream.name}"] = max(staged - affected, 0)
 
     
     def integrity(self):
-        return SQLIntegrity(self._engine)
+        return SQLIntegrity(self._engine, unchanged=self._unchanged)
 
     
     def write(self, ds:Dataset, progress_callback = None):
@@ -248,25 +512,39 @@ class SQLDestination(Destination):
                     progress.subscribe(progress_callback)
 
 
-                # create a table for the stream if it doesn't exist
-                table = SQLDestination.create_table_if_not_exists(conn, stream)
-                
-                # truncate the table
-                conn.execute(table.delete())
-
-                # now we have a destination table with matching schema
-                # write records to the destination table
-                batch = []
-                for record in ds.read(stream):
-                    batch.append(record)
-                    if len(batch) == self._chunk_size:
+                swap = self._full_refresh == 'swap'
+                swap_name = f"{stream.name}__pontoon_swap"
+
+                if swap:
+                    # load a fresh table next to the target and swap it in when complete
+                    SQLDestination.drop_table(conn, f"{stream.schema_name}.{swap_name}")
+                    table = SQLDestination.create_table_if_not_exists(conn, stream, override_name=swap_name)
+                else:
+                    # create a table for the stream if it doesn't exist
+                    table = SQLDestination.create_table_if_not_exists(conn, stream)
+
+                with conn.begin():
+
+                    if not swap:
+                        self._clear_table(conn, table)
+
+                    # now we have a destination table with matching schema
+                    # write records to the destination table
+                    batch = []
+                    for record in ds.read(stream):
+                        batch.append(record)
+                        if len(batch) == self._chunk_size:
+                            self._write_batch(conn, table, stream, batch)
+                            progress.update(self._chunk_size, increment=True)
+                            batch = []
+                    
+                    if batch:
                         self._write_batch(conn, table, stream, batch)
-                        progress.update(self._chunk_size, increment=True)
-                        batch = []
-                
-                if batch:
-                    self._write_batch(conn, table, stream, batch)
-                    progress.update(len(batch), increment=True)
+                        progress.update(len(batch), increment=True)
+
+                if swap:
+                    SQLDestination.swap_tables(conn, stream.schema_name, stream.name, swap_name)
+                    table = Table(stream.name, MetaData(), schema=stream.schema_name, autoload_with=conn)
                 
                 # drop tables after load?
                 if self._drop_after_complete == True:
@@ -2,7 +2,11 @@ from pontoon.base import Destination, Dataset, Progress
 from pontoon.destination.integrity import MockIntegrity
 
 class StdoutDestination(Destination):
-    """ A Destination implementation that writes records to stdout for debugging """
+    """ A Destination implementation that writes records to stdout for debugging
+
+    Only the first 'limit' records of each stream are read from the cache and printed,
+    counts come from the dataset and progress is reported once per stream.
+    """
 
     def __init__(self, config):
         self._config = config
@@ -17,11 +21,11 @@ class StdoutDestination(Destination):
         print('---')
         for stream in ds.streams:
 
-            count = 0
+            stream_size = ds.size(stream)
 
             progress = Progress(
                 f"{ds.namespace}/{stream.schema_name}/{stream.name}",
-                total=ds.size(stream),
+                total=stream_size,
                 processed=0
             )
             if callable(progress_callback):
@@ -30,14 +34,15 @@ class StdoutDestination(Destination):
             print(f"{stream.schema_name} / {stream.name}")
             print(stream.schema)
             print("===")
-            for record in ds.read(stream):
-                if count < self._limit:
-                    print(f"    {record.data}")
-                
-                count += 1
-                progress.update(1, increment=True)
+            for record in ds.read_limit(stream, self._limit):
+                print(f"    {record.data}")
+            if stream_size > self._limit:
+                print(f"    ... {stream_size - self._limit} more records")
             print('===')
 
+            # the preview is done with the stream, a single update instead of one per record
+            progress.update(stream_size)
+
 
     def close(self):
-        pass
\ No newline at end of file
+        pass
@@ -0,0 +1,149 @@
+import json
+import time
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Tuple
+from sqlalchemy.engine import Engine
+
+from pontoon import logger
+
+
+# connect config fields that hold secrets, a change in any of them invalidates an engine
+CREDENTIAL_FIELDS = {
+    'password',
+    'access_token',
+    'service_account',
+    'aws_access_key_id',
+    'aws_secret_access_key',
+    'private_key'
+}
+
+
+class EngineRegistry:
+    """ A process-wide registry of SQLAlchemy engines
+
+    Engines (and their connection pools) are keyed by a hash of the connector type and
+    its non-secret connection info, so consecutive commands that connect to the same
+    database reuse pooled connections instead of paying the connect, TLS and auth
+    handshake again. A credential change disposes the old engine, and engines that have
+    not been used for idle_timeout seconds are disposed on the next lookup.
+
+    The registry is disabled by default, get() then just calls the factory.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._engines: Dict[str, Tuple[str, Engine, float]] = {}
+        self.enabled = False
+        self.pool_size = 5
+        self.max_overflow = 5
+        self.pool_recycle = 1800
+        self.idle_timeout = 600
+
+
+    def configure(self, enabled:bool=True, pool_size:int=None, max_overflow:int=None, pool_recycle:int=None, idle_timeout:int=None):
+        with self._lock:
+            self.enabled = enabled
+            if pool_size is not None:
+                self.pool_size = pool_size
+            if max_overflow is not None:
+                self.max_overflow = max_overflow
+            if pool_recycle is not None:
+                self.pool_recycle = pool_recycle
+            if idle_timeout is not None:
+                self.idle_timeout = idle_timeout
+
+
+    @staticmethod
+    def _hash(value:Any) -> str:
+        return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+    @staticmethod
+    def keys(kind:str, connect:Dict[str, Any]) -> Tuple[str, str]:
+        """ Returns the (engine key, credentials fingerprint) for a connect config """
+        identity = {k: v for k, v in connect.items() if k not in CREDENTIAL_FIELDS}
+        credentials = {k: v for k, v in connect.items() if k in CREDENTIAL_FIELDS}
+        return EngineRegistry._hash([kind, identity]), EngineRegistry._hash(credentials)
+
+
+    def pool_options(self, url:str, connections:int=1) -> Dict[str, Any]:
+        """ create_engine() pool arguments for engines owned by the registry
+
+        connections is how many connections the caller holds at once (parallel streams,
+        parallel loaders), the pool is grown to fit them so no thread waits on a checkout.
+        """
+        if str(url).startswith('sqlite'):
+            # sqlite uses a non-queue pool that rejects sizing arguments
+            return {}
+        if not self.enabled:
+            # SQLAlchemy's default pool keeps 5 connections
+            return {'pool_size': connections} if connections > 5 else {}
+        return {
+            'pool_size': max(self.pool_size, connections),
+            'max_overflow': self.max_overflow,
+            'pool_recycle': self.pool_recycle,
+            'pool_pre_ping': True
+        }
+
+
+    def get(self, kind:str, connect:Dict[str, Any], factory:Callable[[], Engine]) -> Engine:
+        """ Return a pooled engine for a connect config, creating it with factory() if needed """
+        if not self.enabled:
+            return factory()
+
+        key, fingerprint = EngineRegistry.keys(kind, connect)
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_idle(now, keep=key)
+
+            entry = self._engines.get(key)
+            if entry is not None and entry[0] != fingerprint:
+                # credentials changed, never hand out a pool authenticated with the old ones
+                logger.info(f"Engine registry: credentials changed for {kind}, disposing engine")
+                entry[1].dispose()
+                entry = None
+
+            if entry is None:
+                engine = factory()
+            else:
+                engine = entry[1]
+
+            self._engines[key] = (fingerprint, engine, now)
+            return engine
+
+
+    def invalidate(self, kind:str, connect:Dict[str, Any]):
+        """ Dispose the engine for a connect config, e.g. after an authentication failure """
+        key, _ = EngineRegistry.keys(kind, connect)
+        with self._lock:
+            entry = self._engines.pop(key, None)
+        if entry is not None:
+            entry[1].dispose()
+
+
+    def clear(self):
+        """ Dispose every registered engine """
+        with self._lock:
+            entries = list(self._engines.values())
+            self._engines = {}
+        for _, engine, _ in entries:
+            engine.dispose()
+
+
+    def _evict_idle(self, now:float, keep:str):
+        for key in list(self._engines.keys()):
+            _, engine, last_used = self._engines[key]
+            if key != keep and now - last_used > self.idle_timeout:
+                logger.info("Engine registry: disposing idle engine")
+                del self._engines[key]
+                engine.dispose()
+
+
+    def __len__(self):
+        return len(self._engines)
+
+
+# the registry shared by every connector in this process
+registry = EngineRegistry()
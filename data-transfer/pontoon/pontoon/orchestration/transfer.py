@@ -10,7 +10,7 @@ import requests
 from requests.exceptions import JSONDecodeError
 from abc import ABC, abstractmethod
 from typing import List, Dict, Tuple, Any
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone, timedelta, date
 from pathlib import Path
 from pontoon import get_source, get_destination, \
                     get_source_by_vendor, get_destination_by_vendor, \
@@ -102,7 +102,7 @@ class Command(ABC):
         self._run_id = res['transfer_run_id']
     
 
-    def _failure(self, cause:str=None, error_code:str=None):
+    def _failure(self, cause:str=None, error_code:str=None, retry:bool=False):
         if self._complete:
             return
 
@@ -111,6 +111,9 @@ class Command(ABC):
             "error": error_code or "UNKNOWN_ERROR",
             "progress": self._progress_updates
         }
+        if retry:
+            # ask the task runner to retry this execution, e.g. to resume from a checkpoint
+            output["retry"] = True
         output_json = json.dumps(output)
         logger.error(output_json)
         if self._run_id:
@@ -161,6 +164,8 @@ class Command(ABC):
 class TransferCommand(Command):
     """ Implements a data transfer for a given destination ID """
 
+    # how far before the last loaded cursor value an incremental read starts, to catch late commits
+    DEFAULT_WATERMARK_SKEW = timedelta(minutes=15)
 
     def __init__(
         self, 
@@ -183,6 +188,9 @@ class TransferCommand(Command):
         self._model_ids = model_ids
         self._drop_after_complete = drop_after_complete
         self._run_id = None
+        self._watermarks = {}
+        self._plans = {}
+        self._watermark_skew = TransferCommand.DEFAULT_WATERMARK_SKEW
 
         # track whether we're running w/ overrides to ignore some checks + balances
         if replication_mode or model_ids:
@@ -263,6 +271,10 @@ class TransferCommand(Command):
     def _fetch_destination(self):
         self._destination = self._api.get(f"/destinations/{self._destination_id}")
         self._recipient = self._api.get(f"/recipients/{self._destination.get('recipient_id')}")
+
+        skew_minutes = (self._destination.get('schedule') or {}).get('watermark_skew_minutes')
+        if skew_minutes is not None:
+            self._watermark_skew = timedelta(minutes=skew_minutes)
         if self._replication_mode is None:
             self._replication_mode = self._schedule_to_replication_mode(
                 self._destination.get('schedule')
@@ -290,6 +302,68 @@ class TransferCommand(Command):
         self._last_run = self._api.get(f"/runs/{self._transfer_id}")
 
     
+    def _fetch_watermarks(self):
+        # max cursor value loaded per model, as recorded by the last successful run
+        last_success = self._api.get(f"/runs/{self._transfer_id}?status=SUCCESS")
+        if last_success and last_success.get('output'):
+            self._watermarks = last_success['output'].get('watermarks') or {}
+
+
+    def _stream_start(self, model) -> datetime:
+        # scheduled incremental runs start each model at its watermark rather than the padded window start
+        if self._override is True or self._replication_mode.type != Mode.INCREMENTAL:
+            return None
+
+        watermark = self._watermarks.get(model['model_id'])
+        if watermark is None:
+            return None
+
+        return TransferCommand._watermark_datetime(watermark) - self._watermark_skew
+
+
+    @staticmethod
+    def _watermark_datetime(value) -> datetime:
+        # cursor columns without a time zone are taken to be UTC, so naive and aware values compare
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        if not isinstance(value, datetime):
+            value = datetime(value.year, value.month, value.day)
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value
+
+
+    @staticmethod
+    def _watermark_value(value) -> str:
+        # watermarks are stored as ISO strings, only time-like cursors are tracked
+        if isinstance(value, (str, datetime, date)):
+            try:
+                return TransferCommand._watermark_datetime(value).isoformat()
+            except ValueError:
+                return None
+        return None
+
+
+    def _record_plans(self, models, ds):
+        # report whether each model's tenant + cursor select was index-backed
+        for model in models:
+            plan = ds.meta.get('plans', {}).get(f"{model['schema_name']}.{model['table_name']}")
+            if plan is not None:
+                self._plans[model['model_id']] = plan['index_scan']
+
+    def _update_watermarks(self, models, ds):
+        for model in models:
+            value = ds.meta.get('watermarks', {}).get(f"{model['schema_name']}.{model['table_name']}")
+            watermark = TransferCommand._watermark_value(value)
+            if watermark is None:
+                continue
+
+            # never move a watermark backwards, e.g. on a manual backfill of an older window
+            previous = self._watermarks.get(model['model_id'])
+            if previous is None or datetime.fromisoformat(watermark) > TransferCommand._watermark_datetime(previous):
+                self._watermarks[model['model_id']] = watermark
+
+    
     def _detect_run_gap(self) -> bool:
 
         # we're in manual mode, ignore checking for interval gap
@@ -304,6 +378,10 @@ class TransferCommand(Command):
         if not self._last_run or self._last_run.get('created_at') is None:
             return False
 
+        # every model reads from its own watermark, the padded interval start doesn't bound the read
+        if self._models and all(self._stream_start(model) is not None for model in self._models):
+            return False
+
         # check that our last successful run began within current interval:
         #   - we want some overlap to ensure we don't have a gap
         #   - we add buffer to the interval start to look back a little further than we need to
@@ -320,6 +398,7 @@ class TransferCommand(Command):
         self._fetch_models()
         self._fetch_sources()
         self._fetch_last_run()
+        self._fetch_watermarks()
         
     
     def run(self):
@@ -357,6 +436,10 @@ class TransferCommand(Command):
 
             if self._detect_run_gap() is True:
                 return self._failure(f"Last successful run was outside our current interval.")
+
+            # row checksums let SQL destinations skip rewriting rows that didn't change
+            if self._destination['connection_info'].get('skip_unchanged', False):
+                with_config['checksum'] = True
                                  
         except Exception as e:
             return self._failure(f"Starting transfer job failed: {e}")
@@ -365,10 +448,13 @@ class TransferCommand(Command):
         sources = []
         source_caches = []
 
+        source_models = []
+
         try:
             for source_id, source in self._sources.items():
             
-                cache_dir = f"./cache-{uuid.uuid4().hex}"
+                # keyed by execution so a retry finds the cache + checkpoint of the failed attempt
+                cache_dir = f"./cache-{self._execution_id}-{source_id}"
 
                 models = [model for model in self._models if model['source_id'] == source_id]
                 
@@ -378,7 +464,8 @@ class TransferCommand(Command):
                     'primary_field': model['primary_key_column'],
                     'cursor_field': model['last_modified_at_column'],
                     'filters': {model['tenant_id_column']: self._recipient['tenant_id']},
-                    'drop_fields': [model['tenant_id_column']]
+                    'drop_fields': [model['tenant_id_column']],
+                    'start': self._stream_start(model)
                 } for model in models]
 
                 connector = get_source(
@@ -387,15 +474,17 @@ class TransferCommand(Command):
                         'mode': self._replication_mode,
                         'with': with_config,
                         'streams': streams,
-                        'connect': source['connection_info']
+                        'connect': source['connection_info'],
+                        'checkpoint_path': f"{cache_dir}/checkpoint.json"
                     },
                     cache_implementation=ArrowIpcCache,
                     cache_config = {
                         'cache_dir': cache_dir
                     }
                 )
-                sources.append(connector)
+                sources.append((connector, source['connection_info'].get('keyset_pagination', False)))
                 source_caches.append(cache_dir)
+                source_models.append(models)
 
         except Exception as e:
             return self._failure(f"Configuring job source connector(s) failed: {e}")
@@ -416,12 +505,16 @@ class TransferCommand(Command):
         
         # move data
         logger.info(f"Starting to move data")
-        for source in sources:
+        for (source, resumable), models in zip(sources, source_models):
             
             try:
                 # read records into cache
                 ds = source.read(progress_callback=self._read_progress_handler)
+                self._record_plans(models, ds)
             except Exception as e:
+                # keyset paginated reads keep their cache so a retry can pick up where this one stopped
+                if resumable and self._retry_count < self._retry_max_attempts:
+                    return self._failure(f"Reading source failed, retrying from checkpoint: {e}", retry=True)
                 self._unlink_all(source_caches)
                 return self._failure(f"Reading source failed: {e}")
             
@@ -436,6 +529,9 @@ class TransferCommand(Command):
                 if self._drop_after_complete == False:
                     destination.integrity().check_batch_volume(ds)
 
+                # the data is in the destination, advance the watermarks
+                self._update_watermarks(models, ds)
+
             except Exception as e:
                 self._unlink_all(source_caches)
                 tb = "\n".join(traceback.format_tb(e.__traceback__))
@@ -443,7 +539,12 @@ class TransferCommand(Command):
         
 
         # complete our execution
-        return self._success({"success": True, "message": f"Job complete."})
+        return self._success({
+            "success": True, 
+            "message": f"Job complete.", 
+            "watermarks": self._watermarks,
+            "index_backed": self._plans
+        })
 
 
 
@@ -2,6 +2,7 @@ import json
 from typing import List
 from sqlalchemy import create_engine, inspect
 from sqlalchemy.engine import Engine
+from pontoon.engine_registry import registry
 from pontoon.base import Namespace
 from pontoon.source.sql_source import SQLSource
 
@@ -35,7 +36,8 @@ class BigQuerySource(SQLSource):
         return create_engine(
             connection_string,
             credentials_info=credentials_info,
-            arraysize=chunk_size
+            arraysize=chunk_size,
+            **registry.pool_options(connection_string)
         )
 
     def _validate_auth_type(self, auth_type: str) -> None:
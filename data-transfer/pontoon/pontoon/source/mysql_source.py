@@ -0,0 +1,109 @@
+from typing import List, Any, Optional, Tuple
+from urllib.parse import quote_plus
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from pontoon.engine_registry import registry
+from pontoon.base import Namespace, Stream, Mode, Progress
+from pontoon.source.sql_source import SQLSource, SQLUtil
+
+
+class MySQLUtil:
+    """ SQL generation helpers for primary key range partitioned MySQL reads """
+
+    @staticmethod
+    def build_pk_bounds_query(stream:Stream, mode:Mode) -> str:
+        s = SQLUtil.safe_identifier
+        pk = s(stream.primary_field)
+        filters = SQLUtil.build_filters(stream, mode)
+        where_clause = f" WHERE {' AND '.join(filters)}" if filters else ''
+        return f"SELECT MIN({pk}), MAX({pk}) FROM {s(stream.schema_name)}.{s(stream.name)}{where_clause}"
+
+
+    @staticmethod
+    def build_pk_range_query(stream:Stream, mode:Mode, cols:List[str], low:int, high:int) -> str:
+        # select rows with low <= primary key < high
+        s = SQLUtil.safe_identifier
+        pk = s(stream.primary_field)
+        filters = SQLUtil.build_filters(stream, mode)
+        filters.append(f"{pk} >= {int(low)}")
+        filters.append(f"{pk} < {int(high)}")
+        cols_str = ','.join([s(col) for col in cols])
+        return f"SELECT {cols_str} FROM {s(stream.schema_name)}.{s(stream.name)} WHERE {' AND '.join(filters)}"
+
+
+
+class MySQLSource(SQLSource):
+    """MySQL-specific implementation of SQLSource
+
+    Reads stream through PyMySQL's unbuffered SSCursor (SQLAlchemy picks it for
+    stream_results), so rows arrive as they are produced instead of the whole result
+    set being buffered client side. Setting 'partition_size' in the connect config
+    splits integer primary key streams into range queries of that width, which keeps
+    each statement short on large tables.
+    """
+
+    def __init__(self, config, cache_implementation, cache_config={}):
+        super().__init__(config, cache_implementation, cache_config)
+        self._partition_size = config.get('connect').get('partition_size')
+
+    def _create_engine(self, connect_config: dict) -> Engine:
+        """Create MySQL-specific SQLAlchemy engine"""
+        host = connect_config.get('host')
+        port = connect_config.get('port', '3306')
+        user = connect_config.get('user')
+        password = connect_config.get('password') or ''
+        database = connect_config.get('database')
+
+        # Build MySQL connection string using the PyMySQL driver
+        connection_string = f"mysql+pymysql://{quote_plus(user)}:{quote_plus(password)}@{host}:{port}/{database}?charset=utf8mb4"
+
+        return create_engine(connection_string, **registry.pool_options(connection_string))
+
+    def _validate_auth_type(self, auth_type: str) -> None:
+        """Validate authentication type for MySQL - only 'basic' is supported"""
+        if auth_type != 'basic':
+            raise ValueError(f"MySQL source only supports 'basic' authentication, got '{auth_type}'")
+
+    def _get_namespace(self, connect_config: dict) -> Namespace:
+        """Extract namespace from MySQL connection config"""
+        database = connect_config.get('database')
+        if not database:
+            raise ValueError("MySQL connection config must include 'database' field")
+
+        return Namespace(database)
+
+    def _explain_plan(self, conn, select_query: str) -> Optional[Tuple[bool, List[str]]]:
+        """EXPLAIN a query, it is index-backed if no table is read with a full scan"""
+        rows = [dict(row) for row in conn.execute(text(f"EXPLAIN {select_query}")).mappings()]
+        return MySQLSource.plan_uses_index(rows), [str(row) for row in rows]
+
+    @staticmethod
+    def plan_uses_index(rows: List[dict]) -> bool:
+        return len(rows) > 0 and all(row.get('type') != 'ALL' and row.get('key') is not None for row in rows)
+
+    def _read_stream(self, conn, stream:Stream, mode:Mode, select_cols:List[str], select_query:str, progress:Progress) -> Any:
+        """Read a stream in primary key ranges when partitioning is configured"""
+        if not self._partition_size or stream.primary_field is None:
+            return super()._read_stream(conn, stream, mode, select_cols, select_query, progress)
+
+        low, high = conn.execute(text(MySQLUtil.build_pk_bounds_query(stream, mode))).one()
+        if not isinstance(low, int) or not isinstance(high, int):
+            # only integer keys can be split into ranges
+            return super()._read_stream(conn, stream, mode, select_cols, select_query, progress)
+
+        cursor_index = select_cols.index(stream.cursor_field) if stream.cursor_field else None
+        watermark = None
+
+        for start in range(low, high + 1, self._partition_size):
+            range_query = MySQLUtil.build_pk_range_query(stream, mode, select_cols, start, start + self._partition_size)
+            result = conn.execution_options(
+                stream_results=True,
+                max_row_buffer=self._chunk_size
+            ).execute(
+                text(range_query)
+            )
+            _, _, range_watermark = self._cache_rows(stream, result, cursor_index, progress)
+            result.close()
+            watermark = SQLSource._max_value(watermark, range_watermark)
+
+        return watermark
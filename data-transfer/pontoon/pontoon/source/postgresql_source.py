@@ -1,5 +1,7 @@
-from sqlalchemy import create_engine
+from typing import List, Optional, Tuple
+from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Engine
+from pontoon.engine_registry import registry
 from pontoon.base import Namespace
 from pontoon.source.sql_source import SQLSource
 
@@ -18,7 +20,7 @@ class PostgreSQLSource(SQLSource):
         # Build PostgreSQL connection string using psycopg2 driver
         connection_string = f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{database}"
         
-        return create_engine(connection_string)
+        return create_engine(connection_string, **registry.pool_options(connection_string))
 
     def _validate_auth_type(self, auth_type: str) -> None:
         """Validate authentication type for PostgreSQL - only 'basic' is supported"""
@@ -33,4 +35,15 @@ class PostgreSQLSource(SQLSource):
         if not database:
             raise ValueError("PostgreSQL connection config must include 'database' field")
         
-        return Namespace(database)
\ No newline at end of file
+        return Namespace(database)
+
+    def _explain_plan(self, conn, select_query: str) -> Optional[Tuple[bool, List[str]]]:
+        """EXPLAIN a query, it is index-backed if it uses an index and never a sequential scan"""
+        plan = [row[0] for row in conn.execute(text(f"EXPLAIN {select_query}"))]
+        return PostgreSQLSource.plan_uses_index(plan), plan
+
+    @staticmethod
+    def plan_uses_index(plan: List[str]) -> bool:
+        if any('Seq Scan' in line for line in plan):
+            return False
+        return any('Index' in line and 'Scan' in line for line in plan)
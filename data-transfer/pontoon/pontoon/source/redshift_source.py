@@ -1,3 +1,4 @@
+from typing import List, Optional, Tuple
 from pontoon.source.postgresql_source import PostgreSQLSource
 
 
@@ -16,4 +17,8 @@ class RedshiftSource(PostgreSQLSource):
     def _validate_auth_type(self, auth_type: str) -> None:
         """Validate authentication type for Redshift - only 'basic' is supported"""
         if auth_type != 'basic':
-            raise ValueError(f"Redshift source only supports 'basic' authentication, got '{auth_type}'")
\ No newline at end of file
+            raise ValueError(f"Redshift source only supports 'basic' authentication, got '{auth_type}'")
+
+    def _explain_plan(self, conn, select_query: str) -> Optional[Tuple[bool, List[str]]]:
+        """Redshift has no indexes, every plan is a (zone map pruned) sequential scan"""
+        return None
@@ -1,5 +1,6 @@
 from sqlalchemy import create_engine
 from sqlalchemy.engine import Engine
+from pontoon.engine_registry import registry
 from pontoon.base import Namespace
 from pontoon.source.sql_source import SQLSource
 
@@ -33,7 +34,7 @@ class SnowflakeSource(SQLSource):
         schema = connect_config.get('schema', 'public')
         connection_string = f"snowflake://{user}:{access_token}@{account}/{database}/{schema}?warehouse={warehouse}"
         
-        return create_engine(connection_string)
+        return create_engine(connection_string, **registry.pool_options(connection_string))
 
     def _validate_auth_type(self, auth_type: str) -> None:
         """Validate authentication type for Snowflake - only 'access_token' is supported"""
@@ -1,7 +1,8 @@
+import os
 import json
 import re
 from abc import ABC, abstractmethod
-from typing import List, Dict, Tuple, Generator, Any
+from typing import List, Dict, Tuple, Generator, Any, Optional
 from datetime import datetime, timezone, date
 from decimal import Decimal
 from sqlalchemy import create_engine, inspect, MetaData, Table, text, select, func
@@ -9,6 +10,7 @@ from sqlalchemy.engine import Engine
 from sqlalchemy.exc import SQLAlchemyError, OperationalError, InterfaceError, DatabaseError, NoSuchTableError
 
 from pontoon import logger
+from pontoon.engine_registry import registry
 from pontoon.base import Source, Namespace, Stream, Dataset, Progress, Mode
 from pontoon.base import StreamMissingField
 from pontoon.base import SourceConnectionFailed, \
@@ -66,15 +68,14 @@ class SQLUtil:
 
 
     @staticmethod
-    def build_select_query(stream:Stream, mode:Mode, count:bool=False) -> str:
-        
+    def build_filters(stream:Stream, mode:Mode) -> List[str]:
+        # WHERE conditions for the replication window and any stream filters
+
         # shorthand pointers
         e = SQLUtil.to_sql_value
         s = SQLUtil.safe_identifier
 
-        cols = ','.join([s(col) for col in stream.schema.names])
         filters = []
-        where_clause = ''
 
         if mode.type == Mode.INCREMENTAL:
             filters.append({'col': stream.cursor_field, 'op': '>=', 'value': e(mode.start)})
@@ -84,9 +85,21 @@ class SQLUtil:
             for col, v in stream.filters.items():
                 filters.append({'col': col, 'op': '=', 'value': e(v)})
 
+        return [f"{s(f['col'])} {f['op']} {f['value']}" for f in filters]
+
+
+    @staticmethod
+    def build_select_query(stream:Stream, mode:Mode, count:bool=False) -> str:
+        
+        # shorthand pointers
+        s = SQLUtil.safe_identifier
+
+        cols = ','.join([s(col) for col in stream.schema.names])
+        filters = SQLUtil.build_filters(stream, mode)
+        where_clause = ''
+
         if filters:
-            serial = [f"{s(f['col'])} {f['op']} {f['value']}" for f in filters]
-            where_clause = f" WHERE {' AND '.join(serial)}"
+            where_clause = f" WHERE {' AND '.join(filters)}"
 
         if count == True:
             func = "count(1)"
@@ -98,6 +111,103 @@ class SQLUtil:
         return select_query
 
 
+    @staticmethod
+    def build_keyset_query(stream:Stream, mode:Mode, key_fields:List[str], page_size:int, after:List[Any]=None, cols:List[str]=None, nulls:bool=None) -> str:
+        # select one page of a stream ordered by key_fields, starting after the key values in `after`
+        # nulls=True selects only rows with a NULL cursor_field, nulls=False only the others
+
+        # shorthand pointers
+        e = SQLUtil.to_sql_value
+        s = SQLUtil.safe_identifier
+
+        cols = ','.join([s(col) for col in (cols or stream.schema.names)])
+        filters = SQLUtil.build_filters(stream, mode)
+
+        if nulls is not None:
+            filters.append(f"{s(stream.cursor_field)} IS {'NULL' if nulls else 'NOT NULL'}")
+
+        if after is not None:
+            # expanded form of (k1, k2) > (v1, v2), not every dialect supports row value comparison
+            seek = []
+            for i, field in enumerate(key_fields):
+                terms = [f"{s(key_fields[j])} = {e(after[j])}" for j in range(i)]
+                terms.append(f"{s(field)} > {e(after[i])}")
+                seek.append(f"({' AND '.join(terms)})")
+            filters.append(f"({' OR '.join(seek)})")
+
+        where_clause = f" WHERE {' AND '.join(filters)}" if filters else ''
+        order_by = ','.join([s(field) for field in key_fields])
+
+        return f"SELECT {cols} FROM {s(stream.schema_name)}.{s(stream.name)}{where_clause} "\
+               f"ORDER BY {order_by} LIMIT {int(page_size)}"
+
+
+
+class SQLCheckpoint:
+    """ A file backed record of how far a keyset paginated read got, per stream """
+
+    def __init__(self, path:str):
+        self._path = path
+        self._state = {}
+
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self._state = json.load(f)
+
+
+    @staticmethod
+    def _stream_key(stream:Stream) -> str:
+        return f"{stream.schema_name}.{stream.name}"
+
+
+    @staticmethod
+    def _json_value(value:Any) -> Any:
+        # key values are written back into SQL as quoted literals, so strings are fine
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        elif isinstance(value, (datetime, date)):
+            return value.isoformat()
+        else:
+            return str(value)
+
+
+    def sync_time(self, default:datetime) -> datetime:
+        # the time of ingestion of the first attempt, so resumed pages get the same batch id
+        if self._state.get('dt') is None:
+            self._state['dt'] = default.isoformat()
+        return datetime.fromisoformat(self._state['dt'])
+
+
+    def window(self, mode:Mode) -> Mode:
+        # the replication window of the first attempt, a retry in a later period would
+        # otherwise select a different window and could not resume
+        if self._state.get('mode') is None:
+            self._state['mode'] = json.loads(str(mode))
+        return Mode(self._state['mode'])
+
+
+    def get(self, stream:Stream) -> Dict[str, Any]:
+        return self._state.get('streams', {}).get(SQLCheckpoint._stream_key(stream))
+
+
+    def save(self, stream:Stream, query:str, after:List[Any], cache_state:Dict[str, Any], done:bool=False, page_pass:int=0):
+        self._state.setdefault('streams', {})[SQLCheckpoint._stream_key(stream)] = {
+            'query': query,
+            'pass': page_pass,
+            'after': [SQLCheckpoint._json_value(v) for v in after] if after is not None else None,
+            'cache': cache_state,
+            'done': done
+        }
+
+        # write then rename so a crash never leaves a torn checkpoint behind
+        tmp_path = f"{self._path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path)
+
+
 class SQLSource(Source, ABC):
     """ Abstract base class for SQL source implementations """
 
@@ -119,8 +229,21 @@ class SQLSource(Source, ABC):
         # batch size for reading records from source
         self._chunk_size = connect.get('chunk_size', 1024)
 
-        # time of ingestion
+        # optionally read in (cursor_field, primary_field) pages, checkpointing after each one
+        self._keyset = connect.get('keyset_pagination', False)
+        self._page_size = connect.get('page_size', 100000)
+        checkpoint_path = config.get('checkpoint_path')
+        self._checkpoint = SQLCheckpoint(checkpoint_path) if self._keyset and checkpoint_path else None
+
+        # EXPLAIN each generated select and report whether the plan is index-backed
+        self._explain = connect.get('explain', True)
+
+        # time of ingestion, a resumed read keeps the one of the attempt it resumes
         self._sync_time = config.get('dt', datetime.now(timezone.utc))
+        if self._checkpoint:
+            self._sync_time = self._checkpoint.sync_time(self._sync_time)
+            if self._mode is not None:
+                self._mode = self._checkpoint.window(self._mode)
         self._batch_id = str(int(self._sync_time.timestamp()*1000))
 
         # additional fields to augment streams with
@@ -130,8 +253,8 @@ class SQLSource(Source, ABC):
         auth_type = connect.get('auth_type')
         self._validate_auth_type(auth_type)
 
-        # Create database-specific engine
-        self._engine = self._create_engine(connect)
+        # Create database-specific engine, or reuse a pooled one from earlier commands
+        self._engine = registry.get(type(self).__name__, connect, lambda: self._create_engine(connect))
 
     @abstractmethod
     def _create_engine(self, connect_config: dict) -> Engine:
@@ -148,6 +271,19 @@ class SQLSource(Source, ABC):
         """Extract namespace from connection config"""
         pass
 
+    def _stream_mode(self, stream_config:dict) -> Mode:
+        """A stream may start its incremental window at its own watermark instead of the shared mode start"""
+        start = stream_config.get('start')
+        if start is None or self._mode.type != Mode.INCREMENTAL:
+            return self._mode
+
+        return Mode({
+            'type': self._mode.type,
+            'period': self._mode.period,
+            'start': start,
+            'end': self._mode.end
+        })
+
     def _inspect_streams_impl(self) -> List[dict]:
         """Database-specific stream inspection - default implementation"""
         return self.inspect_standard_streams()
@@ -156,6 +292,8 @@ class SQLSource(Source, ABC):
         try:
             return self._engine.connect()
         except (OperationalError, InterfaceError, DatabaseError) as e:
+            # don't keep handing out a pool that can't connect
+            registry.invalidate(type(self).__name__, self._config.get('connect'))
             raise SourceConnectionFailed("Failed to connect to source database") from e
 
     def test_connect(self):
@@ -203,100 +341,65 @@ class SQLSource(Source, ABC):
     def read(self, progress_callback=None) -> Dataset:
         """Read from source and write to a cached Dataset using template method pattern"""
 
-        with self._connect() as conn:
+        # max cursor_field value read per stream
+        watermarks = {}
 
-            # for each configured stream (i.e. table)...
-            for stream_config in self._config['streams']:
+        # query plan diagnostics per stream
+        plans = {}
 
-                # determine the schema
-                table_name = stream_config['table']
-                metadata = MetaData()
+        try:
+            with self._connect() as conn:
 
-                try:
-                    # table doesn't exist?
-                    table = Table(table_name, metadata, schema=stream_config['schema'], autoload_with=conn)
-                except NoSuchTableError as e:
-                    raise SourceStreamDoesNotExist(f"SQLSource (source-sql) table does not exist: {stream_config['schema']}.{table_name}") from e
-                
-                columns = []
-                for col in table.columns:
-                    try:
-                        # try to use the alchemy mapped python type if available
-                        columns.append((col.name, col.type.python_type))
-                    except NotImplementedError:
-                        columns.append((col.name, str(col.type)))
-
-                # create a schema from the column field + types
-                try:
-                    stream = Stream(
-                        name=stream_config['table'],
-                        schema_name=stream_config['schema'],
-                        primary_field=stream_config.get('primary_field', None),
-                        cursor_field=stream_config.get('cursor_field', None),
-                        filters=stream_config.get('filters', None),
-                        schema=Stream.build_schema(columns)
-                    )
-                except StreamMissingField as e:
-                    raise SourceStreamInvalidSchema(e) from e
-
-                count_query = SQLUtil.build_select_query(stream, self._mode, count=True) 
-                select_query = SQLUtil.build_select_query(stream, self._mode)
-
-                # ignore any stream fields?
-                if stream_config.get('drop_fields'):
-                    for field in stream_config.get('drop_fields'):
-                        stream.drop_field(field)
-
-                # add bookkeeping columns to stream if configured
-                if self._with.get('batch_id'):
-                    stream.with_batch_id(self._batch_id)
-                if self._with.get('checksum'):
-                    stream.with_checksum()
-                if self._with.get('version'):
-                    stream.with_version(self._with.get('version'))
-                if self._with.get('last_sync'):
-                    stream.with_last_synced_at(self._sync_time)
-
-                self._streams.append(stream)
-
-                # configure progress tracking
-                total_count = conn.execute(text(count_query)).scalar_one()
-
-                progress = Progress(
-                    f"source+sql://{self._namespace}/{stream.schema_name}/{stream.name}",
-                    total=total_count,
-                    processed=0
-                )
-                if callable(progress_callback):
-                    progress.subscribe(progress_callback)
-
-                if total_count == 0:
-                    progress.message("No records to process")
-                    continue
+                # for each configured stream (i.e. table)...
+                for stream_config in self._config['streams']:
 
-                # execute our main query 
-                result = conn.execution_options(
-                    stream_results=True, 
-                    max_row_buffer=self._chunk_size
-                ).execute(
-                    text(select_query)
-                )
+                    stream = self._build_stream(conn, stream_config)
 
-                # read the stream into cache
-                batch = []
-                for row in result:
-                    batch.append(stream.to_record(row))
-                    if(len(batch)) == self._chunk_size:
-                        self._cache.write(stream, batch)
-                        progress.update(self._chunk_size, increment=True)
-                        batch = []
+                    mode = self._stream_mode(stream_config)
+                    count_query = SQLUtil.build_select_query(stream, mode, count=True) 
+                    select_query = SQLUtil.build_select_query(stream, mode)
+                    select_cols = stream.schema.names
+                    watermark_key = f"{stream.schema_name}.{stream.name}"
 
-                # close the server side cursor
-                result.close()
+                    if self._explain:
+                        plans[watermark_key] = self._check_plan(conn, stream, select_query)
 
-                if len(batch) > 0:
-                    self._cache.write(stream, batch)
-                    progress.update(len(batch), increment=True)       
+                    self._finish_stream(stream, stream_config.get('drop_fields'))
+                    self._streams.append(stream)
+
+                    # configure progress tracking
+                    total_count = conn.execute(text(count_query)).scalar_one()
+
+                    progress = Progress(
+                        f"source+sql://{self._namespace}/{stream.schema_name}/{stream.name}",
+                        total=total_count,
+                        processed=0
+                    )
+                    if callable(progress_callback):
+                        progress.subscribe(progress_callback)
+
+                    if total_count == 0:
+                        progress.message("No records to process")
+                        continue
+
+                    if self._keyset and stream.primary_field is not None:
+                        watermarks[watermark_key] = self._read_keyset(conn, stream, mode, select_cols, select_query, progress)
+                    elif self._keyset:
+                        # without a unique key, rows tied on the cursor could be skipped between pages
+                        logger.warning(
+                            f"SQLSource keyset pagination needs a primary_field, reading {watermark_key} in a single select"
+                        )
+                        self._rewind(stream)
+                        watermarks[watermark_key] = self._read_stream(conn, stream, mode, select_cols, select_query, progress)
+                    else:
+                        watermarks[watermark_key] = self._read_stream(conn, stream, mode, select_cols, select_query, progress)
+        except Exception:
+            # release the cache writers of this attempt, a retry restores the streams from the checkpoint
+            try:
+                self.close()
+            except Exception as e:
+                logger.warning(f"SQLSource failed to close the cache after a failed read: {e}")
+            raise
 
         # return our dataset
         return Dataset(
@@ -305,11 +408,236 @@ class SQLSource(Source, ABC):
             self._cache,
             meta = {
                 'batch_id': self._batch_id, 
-                'dt': self._sync_time
+                'dt': self._sync_time,
+                'watermarks': watermarks,
+                'plans': plans
             }
         )
 
 
+    def _build_stream(self, conn, stream_config:dict) -> Stream:
+        """Reflect a configured table into a Stream"""
+
+        # determine the schema
+        table_name = stream_config['table']
+        metadata = MetaData()
+
+        try:
+            # table doesn't exist?
+            table = Table(table_name, metadata, schema=stream_config['schema'], autoload_with=conn)
+        except NoSuchTableError as e:
+            raise SourceStreamDoesNotExist(f"SQLSource (source-sql) table does not exist: {stream_config['schema']}.{table_name}") from e
+        
+        columns = []
+        for col in table.columns:
+            try:
+                # try to use the alchemy mapped python type if available
+                columns.append((col.name, col.type.python_type))
+            except NotImplementedError:
+                columns.append((col.name, str(col.type)))
+
+        # create a schema from the column field + types
+        try:
+            return Stream(
+                name=stream_config['table'],
+                schema_name=stream_config['schema'],
+                primary_field=stream_config.get('primary_field', None),
+                cursor_field=stream_config.get('cursor_field', None),
+                filters=stream_config.get('filters', None),
+                schema=Stream.build_schema(columns)
+            )
+        except StreamMissingField as e:
+            raise SourceStreamInvalidSchema(e) from e
+
+    def _finish_stream(self, stream:Stream, drop_fields:List[str]=None):
+        """Drop ignored fields and add bookkeeping fields, after the select has been built"""
+
+        # ignore any stream fields?
+        if drop_fields:
+            for field in drop_fields:
+                stream.drop_field(field)
+
+        # add bookkeeping columns to stream if configured
+        if self._with.get('batch_id'):
+            stream.with_batch_id(self._batch_id)
+        if self._with.get('checksum'):
+            stream.with_checksum()
+        if self._with.get('version'):
+            stream.with_version(self._with.get('version'))
+        if self._with.get('last_sync'):
+            stream.with_last_synced_at(self._sync_time)
+
+    def _explain_plan(self, conn, select_query:str) -> Optional[Tuple[bool, List[str]]]:
+        """Vendor hook returning (index backed, plan lines) for a query, None if the database has no indexes"""
+        return None
+
+    def _check_plan(self, conn, stream:Stream, select_query:str) -> Optional[Dict[str, Any]]:
+        """EXPLAIN the select for a stream and warn when the filters can't use an index"""
+        try:
+            explained = self._explain_plan(conn, select_query)
+        except SQLAlchemyError as e:
+            logger.info(f"Could not EXPLAIN select for {stream.schema_name}.{stream.name}: {e}")
+            return None
+
+        if explained is None:
+            return None
+
+        index_scan, plan = explained
+        if not index_scan:
+            filter_fields = list((stream.filters or {}).keys()) + ([stream.cursor_field] if stream.cursor_field else [])
+            logger.warning(
+                f"Select for {stream.schema_name}.{stream.name} is not index-backed, "
+                f"consider an index on ({', '.join(filter_fields)})"
+            )
+        return {'index_scan': index_scan, 'plan': plan}
+
+    @staticmethod
+    def _max_value(current:Any, value:Any) -> Any:
+        if value is None:
+            return current
+        if current is None or value > current:
+            return value
+        return current
+
+    def _cache_rows(self, stream:Stream, rows, cursor_index:int, progress:Progress) -> Tuple[int, Any, Any]:
+        """Write raw source rows to the cache in chunks
+
+        Returns the number of rows, the last row and the max cursor_field value seen.
+        """
+        batch = []
+        count = 0
+        last_row = None
+        watermark = None
+        for row in rows:
+            batch.append(stream.to_record(row))
+            count += 1
+            last_row = row
+            if cursor_index is not None:
+                watermark = SQLSource._max_value(watermark, row[cursor_index])
+            if(len(batch)) == self._chunk_size:
+                self._cache.write(stream, batch)
+                progress.update(self._chunk_size, increment=True)
+                batch = []
+
+        if len(batch) > 0:
+            self._cache.write(stream, batch)
+            progress.update(len(batch), increment=True)
+
+        return count, last_row, watermark
+
+    def _read_stream(self, conn, stream:Stream, mode:Mode, select_cols:List[str], select_query:str, progress:Progress) -> Any:
+        """Read a stream with a single streaming select, vendors can override this for a faster path
+
+        Returns the max cursor_field value read.
+        """
+        cursor_index = select_cols.index(stream.cursor_field) if stream.cursor_field else None
+
+        # execute our main query 
+        result = conn.execution_options(
+            stream_results=True, 
+            max_row_buffer=self._chunk_size
+        ).execute(
+            text(select_query)
+        )
+
+        # read the stream into cache
+        _, _, watermark = self._cache_rows(stream, result, cursor_index, progress)
+
+        # close the server side cursor
+        result.close()
+
+        return watermark
+
+    def _rewind(self, stream:Stream):
+        """Drop whatever an earlier attempt cached for a stream, before reading it from the start"""
+        if self._checkpoint:
+            self._cache.restore(stream, {'bytes': 0, 'records': 0})
+
+    @staticmethod
+    def _keyset_passes(stream:Stream, mode:Mode) -> List[Tuple[Optional[bool], List[str]]]:
+        # (nulls, key_fields) per pass, the primary_field breaks ties on the cursor_field
+        if stream.cursor_field is None:
+            return [(None, [stream.primary_field])]
+
+        # the incremental window filters on the cursor_field, so it has no NULLs
+        if mode.type == Mode.INCREMENTAL:
+            return [(None, [stream.cursor_field, stream.primary_field])]
+
+        # a NULL cursor can't be sought past, those rows are read in a pass of their own first
+        return [
+            (True, [stream.primary_field]),
+            (False, [stream.cursor_field, stream.primary_field])
+        ]
+
+    @staticmethod
+    def _keyset_watermark(stream:Stream, key_fields:List[str], after:List[Any]) -> Any:
+        # pages ordered by cursor_field first hold the max cursor value in their last key
+        if after is None or key_fields[0] != stream.cursor_field:
+            return None
+        return after[0]
+
+    def _read_keyset(self, conn, stream:Stream, mode:Mode, select_cols:List[str], select_query:str, progress:Progress) -> Any:
+        """Read a stream in keyset pages, committing the cache and checkpointing after each page
+
+        Returns the max cursor_field value read.
+        """
+        passes = SQLSource._keyset_passes(stream, mode)
+        page_pass = 0
+        after = None
+
+        # resume from a previous attempt if it read the same window and filters
+        checkpoint = self._checkpoint.get(stream) if self._checkpoint else None
+        if checkpoint and checkpoint['query'] == select_query:
+            self._cache.restore(stream, checkpoint['cache'])
+            progress.update(checkpoint['cache']['records'], message="Resuming from checkpoint")
+            page_pass = checkpoint['pass']
+            after = checkpoint['after']
+            if checkpoint['done']:
+                return SQLSource._keyset_watermark(stream, passes[page_pass][1], after)
+        else:
+            self._rewind(stream)
+
+        while True:
+            nulls, key_fields = passes[page_pass]
+            page_query = SQLUtil.build_keyset_query(
+                stream, 
+                mode, 
+                key_fields, 
+                self._page_size, 
+                after=after, 
+                cols=select_cols,
+                nulls=nulls
+            )
+            result = conn.execution_options(
+                stream_results=True, 
+                max_row_buffer=self._chunk_size
+            ).execute(
+                text(page_query)
+            )
+
+            # read the page into cache
+            page_count, last_row, _ = self._cache_rows(stream, result, None, progress)
+            result.close()
+
+            if last_row is not None:
+                after = [last_row[select_cols.index(f)] for f in key_fields]
+
+            # a short page means we've reached the end of the pass, and of the stream after the last one
+            done = False
+            if page_count < self._page_size:
+                if page_pass == len(passes) - 1:
+                    done = True
+                else:
+                    page_pass += 1
+                    after = None
+
+            if self._checkpoint:
+                self._checkpoint.save(stream, select_query, after, self._cache.commit(stream), done, page_pass)
+            
+            if done:
+                return SQLSource._keyset_watermark(stream, passes[page_pass][1], after)
+
+
     def close(self):
         """Close the cache - common cleanup logic"""
         self._cache.close()
\ No newline at end of file
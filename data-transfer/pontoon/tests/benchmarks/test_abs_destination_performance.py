@@ -0,0 +1,111 @@
+"""
+Performance benchmark for the Azure Blob destination.
+
+Needs an Azure Blob account or a local Azurite emulator and is skipped unless configured:
+- ABS_BENCHMARK_CONNECTION_STRING, e.g. 'UseDevelopmentStorage=true' for Azurite
+  started with `docker run -p 10000:10000 mcr.microsoft.com/azure-storage/azurite azurite-blob --blobHost 0.0.0.0`
+- ABS_BENCHMARK_CONTAINER (optional, default 'pontoon-benchmark'), created if missing
+- ABS_BENCHMARK_ROWS (optional, default 1000000)
+
+Compares write throughput and memory between upload strategies:
+- single put per file
+- files staged as concurrent blocks (stage_block / commit_block_list)
+- staged blocks with more upload workers overlapping encoding
+"""
+
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+import pyarrow as pa
+from azure.storage.blob import BlobServiceClient
+
+from pontoon.base import Mode, Namespace, Stream, Record, Dataset
+from pontoon.cache.memory_cache import MemoryCache
+from pontoon.destination.abs_destination import ABSDestination
+from tests.benchmarks.test_arrow_ipc_cache_performance import MemoryMonitor, BenchmarkResult
+
+
+ABS_ROWS = int(os.environ.get('ABS_BENCHMARK_ROWS', '1000000'))
+ABS_CONTAINER = os.environ.get('ABS_BENCHMARK_CONTAINER', 'pontoon-benchmark')
+
+
+def _dataset() -> Dataset:
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('customer_id', pa.int64()),
+        ('name', pa.string()),
+        ('amount', pa.float64()),
+        ('updated_at', pa.timestamp('us', tz='UTC'))
+    ])
+    stream = Stream('leads', 'benchmark', schema, primary_field='id')
+    cache = MemoryCache(Namespace('benchmark'))
+    now = datetime.now(timezone.utc)
+    cache.write(stream, [Record([i, i % 100, f"lead {uuid.uuid4()}", i / 100, now]) for i in range(ABS_ROWS)])
+    return Dataset(Namespace('benchmark'), [stream], cache, meta={'batch_id': str(int(time.time() * 1000)), 'dt': now})
+
+
+def _run_write(label:str, ds:Dataset, connect:dict) -> BenchmarkResult:
+    """ Write the dataset to Azure Blob and measure it """
+    dest = ABSDestination({
+        'mode': Mode({'type': Mode.FULL_REFRESH}),
+        'batch_size': 250000,
+        'connect': {
+            'auth_type': 'connection_string',
+            'blob_connection_string': os.environ.get('ABS_BENCHMARK_CONNECTION_STRING'),
+            'blob_container': ABS_CONTAINER,
+            'blob_prefix': f"pontoon-benchmark/{label}",
+            **connect
+        }
+    })
+
+    monitor = MemoryMonitor()
+    start = time.time()
+    dest.write(ds)
+    duration = time.time() - start
+    monitor.measure('after_write')
+
+    dest.integrity().check_batch_volume(ds)
+    dest.close()
+
+    size = sum(ds.size(stream) for stream in ds.streams)
+    result = BenchmarkResult(ABSDestination.__name__, label, size)
+    result.duration_seconds = duration
+    result.records_per_second = size / duration if duration > 0 else 0
+    result.peak_memory_mb = monitor.get_peak_usage_mb()
+    result.memory_increase_mb = monitor.get_memory_increase_mb()
+    return result
+
+
+@pytest.fixture(scope='module')
+def abs_container():
+    """ Create the benchmark container and remove what the benchmark wrote """
+    service = BlobServiceClient.from_connection_string(os.environ.get('ABS_BENCHMARK_CONNECTION_STRING'))
+    container = service.get_container_client(ABS_CONTAINER)
+    if not container.exists():
+        container.create_container()
+
+    yield ABS_CONTAINER
+
+    for blob in container.list_blobs(name_starts_with='pontoon-benchmark/'):
+        container.delete_blob(blob.name)
+    service.close()
+
+
+@pytest.mark.skipif(not os.environ.get('ABS_BENCHMARK_CONNECTION_STRING'), reason="ABS_BENCHMARK_CONNECTION_STRING is not configured")
+def test_abs_single_put_vs_staged_blocks(abs_container):
+    """ Compare single put uploads against concurrently staged blocks """
+    ds = _dataset()
+
+    results = [
+        _run_write('single_put', ds, {'block_threshold_mb': 1024, 'upload_workers': 1}),
+        _run_write('staged_blocks', ds, {'block_threshold_mb': 4, 'block_size_mb': 4, 'max_concurrency': 4, 'upload_workers': 1}),
+        _run_write('staged_blocks_overlapped', ds, {'block_threshold_mb': 4, 'block_size_mb': 4, 'max_concurrency': 4, 'upload_workers': 4})
+    ]
+
+    print("\n=== AZURE BLOB DESTINATION BENCHMARK ===")
+    for result in results:
+        print(result)
+        assert result.dataset_size == ABS_ROWS
@@ -0,0 +1,151 @@
+"""
+Performance benchmarks for the native MySQL and Athena sources.
+
+These benchmarks need a live database and are skipped unless configured:
+- MySQL: MYSQL_HOST, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DATABASE (optional MYSQL_PORT).
+  A benchmark table is created and populated in MYSQL_DATABASE.
+- Athena: ATHENA_REGION, ATHENA_S3_STAGING_DIR, ATHENA_TABLE (as schema.table),
+  AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY (optional ATHENA_WORK_GROUP).
+
+Each benchmark compares read throughput and memory between read strategies:
+- MySQL: single streaming select (SSCursor) vs primary key range partitions
+- Athena: Arrow cursor over query results vs Arrow cursor with UNLOAD
+"""
+
+import os
+import time
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+
+from pontoon.base import Mode
+from pontoon.cache.arrow_ipc_cache import ArrowIpcCache
+from pontoon.source.mysql_source import MySQLSource
+from pontoon.source.athena_source import AthenaSource
+from tests.benchmarks.test_arrow_ipc_cache_performance import MemoryMonitor, BenchmarkResult
+
+
+MYSQL_ROWS = int(os.environ.get('MYSQL_BENCHMARK_ROWS', '500000'))
+MYSQL_TABLE = 'pontoon_source_benchmark'
+
+
+def _mysql_connect():
+    return {
+        'host': os.environ.get('MYSQL_HOST'),
+        'port': os.environ.get('MYSQL_PORT', '3306'),
+        'user': os.environ.get('MYSQL_USER'),
+        'password': os.environ.get('MYSQL_PASSWORD'),
+        'database': os.environ.get('MYSQL_DATABASE'),
+        'auth_type': 'basic',
+        'chunk_size': 10000
+    }
+
+
+def _athena_connect():
+    return {
+        'region': os.environ.get('ATHENA_REGION'),
+        'aws_access_key_id': os.environ.get('AWS_ACCESS_KEY_ID'),
+        'aws_secret_access_key': os.environ.get('AWS_SECRET_ACCESS_KEY'),
+        's3_staging_dir': os.environ.get('ATHENA_S3_STAGING_DIR'),
+        'work_group': os.environ.get('ATHENA_WORK_GROUP'),
+        'auth_type': 'basic',
+        'chunk_size': 10000
+    }
+
+
+def _run_read(label:str, source_cls, config:dict) -> BenchmarkResult:
+    """ Read all configured streams into an ArrowIpcCache and measure it """
+    cache_dir = tempfile.mkdtemp()
+    try:
+        monitor = MemoryMonitor()
+        source = source_cls(config, ArrowIpcCache, {'cache_dir': cache_dir})
+
+        start = time.time()
+        ds = source.read()
+        duration = time.time() - start
+        monitor.measure('after_read')
+
+        size = sum(ds.size(stream) for stream in ds.streams)
+        source.close()
+
+        result = BenchmarkResult(source_cls.__name__, label, size)
+        result.duration_seconds = duration
+        result.records_per_second = size / duration if duration > 0 else 0
+        result.peak_memory_mb = monitor.get_peak_usage_mb()
+        result.memory_increase_mb = monitor.get_memory_increase_mb()
+        return result
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+@pytest.fixture(scope='module')
+def mysql_table():
+    """ Create and populate the MySQL benchmark table """
+    source = MySQLSource({'connect': _mysql_connect(), 'mode': Mode({}), 'streams': []}, ArrowIpcCache, {})
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    with source._connect() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {MYSQL_TABLE}"))
+        conn.execute(text(
+            f"CREATE TABLE {MYSQL_TABLE} (id BIGINT PRIMARY KEY, customer_id INT, "
+            f"name VARCHAR(64), amount DECIMAL(12,2), updated_at DATETIME)"
+        ))
+        for offset in range(0, MYSQL_ROWS, 10000):
+            rows = [
+                {'id': i, 'customer_id': i % 100, 'name': f"row {i}", 'amount': i / 100, 'updated_at': now - timedelta(seconds=i)}
+                for i in range(offset, min(offset + 10000, MYSQL_ROWS))
+            ]
+            conn.execute(
+                text(f"INSERT INTO {MYSQL_TABLE} VALUES (:id, :customer_id, :name, :amount, :updated_at)"),
+                rows
+            )
+
+    yield MYSQL_TABLE
+
+    with source._connect() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {MYSQL_TABLE}"))
+    source.close()
+
+
+@pytest.mark.skipif(not os.environ.get('MYSQL_HOST'), reason="MYSQL_HOST is not configured")
+def test_mysql_streaming_vs_partitioned(mysql_table):
+    """ Compare a single SSCursor stream against primary key range partitions """
+    streams = [{
+        'schema': os.environ.get('MYSQL_DATABASE'),
+        'table': mysql_table,
+        'primary_field': 'id',
+        'cursor_field': 'updated_at'
+    }]
+    mode = Mode({'type': Mode.FULL_REFRESH})
+
+    results = [
+        _run_read('streaming', MySQLSource, {'connect': _mysql_connect(), 'mode': mode, 'streams': streams}),
+        _run_read('partitioned', MySQLSource, {'connect': {**_mysql_connect(), 'partition_size': 100000}, 'mode': mode, 'streams': streams})
+    ]
+
+    print("\n=== MYSQL SOURCE BENCHMARK ===")
+    for result in results:
+        print(result)
+        assert result.dataset_size == MYSQL_ROWS
+
+
+@pytest.mark.skipif(not os.environ.get('ATHENA_S3_STAGING_DIR'), reason="ATHENA_S3_STAGING_DIR is not configured")
+def test_athena_arrow_vs_unload():
+    """ Compare the Arrow cursor reading query results against UNLOAD Parquet results """
+    schema_name, table_name = os.environ.get('ATHENA_TABLE').split('.')
+    streams = [{'schema': schema_name, 'table': table_name}]
+    mode = Mode({'type': Mode.FULL_REFRESH})
+
+    results = [
+        _run_read('arrow', AthenaSource, {'connect': _athena_connect(), 'mode': mode, 'streams': streams}),
+        _run_read('arrow_unload', AthenaSource, {'connect': {**_athena_connect(), 'unload': True}, 'mode': mode, 'streams': streams})
+    ]
+
+    print("\n=== ATHENA SOURCE BENCHMARK ===")
+    for result in results:
+        print(result)
+
+    assert results[0].dataset_size == results[1].dataset_size
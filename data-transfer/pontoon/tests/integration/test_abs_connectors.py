@@ -111,8 +111,7 @@ class TestABSConnectors:
         ds = get_memory_source(mode_config={'type': Mode.FULL_REFRESH}).read(progress_callback=read_progress_handler)
         dest.write(ds, progress_callback=write_progress_handler)
         
-        # Azure Blob integrity checker is not implemented yet
-        # dest.integrity().check_batch_volume(ds)
+        dest.integrity().check_batch_volume(ds)
 
         drop()
 
@@ -171,6 +171,16 @@ class TestArrowIpcCache:
         for original, read_back in zip(records, read_records):
             assert original.data == read_back.data
 
+    def test_read_limit(self, cache, simple_stream):
+        """Test reading only the first records of a stream"""
+        cache.write(simple_stream, [Record([i, f"name {i}", i]) for i in range(10)])
+        cache.write(simple_stream, [Record([i, f"name {i}", i]) for i in range(10, 20)])
+
+        assert [record.data[0] for record in cache.read_limit(simple_stream, 3)] == [0, 1, 2]
+        assert len(list(cache.read_limit(simple_stream, 15))) == 15
+        assert len(list(cache.read_limit(simple_stream, 50))) == 20
+        assert list(cache.read_limit(simple_stream, 0)) == []
+
     def test_write_empty_records(self, cache, simple_stream):
         """Test writing empty records list"""
         written_count = cache.write(simple_stream, [])
@@ -726,4 +736,24 @@ class TestArrowIpcCache:
         assert len(read1) == 2
         assert len(read2) == 2
         assert read1[0].data == [1, 'Alice']
-        assert read2[0].data == [101, 19.99]
\ No newline at end of file
+        assert read2[0].data == [101, 19.99]
+
+    def test_commit_and_restore(self, namespace, basic_config, simple_stream):
+        """Test that a new cache instance can resume a stream from a committed state"""
+        cache = ArrowIpcCache(namespace, basic_config)
+        cache.write(simple_stream, [Record([1, 'Alice', 30]), Record([2, 'Bob', 25])])
+        state = cache.commit(simple_stream)
+        assert state['records'] == 2
+
+        # uncommitted writes from a failed attempt
+        cache.write(simple_stream, [Record([99, 'Lost', 1])])
+        cache.flush()
+
+        # a retry rewinds to the committed state and appends after it
+        resumed = ArrowIpcCache(namespace, basic_config)
+        resumed.restore(simple_stream, state)
+        assert resumed.size(simple_stream) == 2
+
+        resumed.write(simple_stream, [Record([3, 'Charlie', 35])])
+        assert resumed.size(simple_stream) == 3
+        assert [r.data[0] for r in resumed.read(simple_stream)] == [1, 2, 3]
@@ -1,5 +1,11 @@
 import pytest
-from pontoon.destination.bigquery_destination import BigQuerySQLUtil  
+import pyarrow as pa
+from unittest.mock import MagicMock, patch
+from google.cloud import bigquery
+from google.cloud.bigquery_storage_v1 import types
+from pontoon import Mode, Stream, Record, Dataset, Namespace, MemoryCache
+from pontoon.base import DestinationError
+from pontoon.destination.bigquery_destination import BigQuerySQLUtil, BigQueryLoadUtil, BigQueryDestination
 
 class TestBigQuerySQLUtil:
     
@@ -54,3 +60,184 @@ class TestBigQuerySQLUtil:
             "VALUES (stage.id,stage.description,stage.amount)"
         )
         assert BigQuerySQLUtil.merge(target_table_name, stage_table_name, cols, primary_key) == expected_sql
+
+    def test_merge_with_checksum(self):
+        cols = ["id", "name", "pontoon__checksum"]
+        expected_sql = (
+            "MERGE INTO target_table AS target "
+            "USING stage_table AS stage "
+            "ON target.id = stage.id "
+            "WHEN MATCHED AND target.pontoon__checksum IS DISTINCT FROM stage.pontoon__checksum THEN "
+            "UPDATE SET target.name=stage.name,target.pontoon__checksum=stage.pontoon__checksum "
+            "WHEN NOT MATCHED THEN "
+            "INSERT (id,name,pontoon__checksum) "
+            "VALUES (stage.id,stage.name,stage.pontoon__checksum)"
+        )
+        assert BigQuerySQLUtil.merge("target_table", "stage_table", cols, "id", "pontoon__checksum") == expected_sql
+
+
+class TestBigQueryLoadUtil:
+
+    def test_schema_fields(self):
+        schema = pa.schema([
+            ('id', pa.int64()),
+            ('score', pa.float64()),
+            ('name', pa.string()),
+            ('active', pa.bool_()),
+            ('created', pa.timestamp('us', tz='UTC')),
+            ('local', pa.timestamp('us')),
+            ('day', pa.date32()),
+            ('amount', pa.decimal128(10, 2)),
+            ('blob', pa.binary()),
+            ('empty', pa.null())
+        ])
+        fields = BigQueryLoadUtil.schema_fields(schema)
+        assert [(f.name, f.field_type) for f in fields] == [
+            ('id', 'INTEGER'),
+            ('score', 'FLOAT'),
+            ('name', 'STRING'),
+            ('active', 'BOOLEAN'),
+            ('created', 'TIMESTAMP'),
+            ('local', 'DATETIME'),
+            ('day', 'DATE'),
+            ('amount', 'NUMERIC'),
+            ('blob', 'BYTES'),
+            ('empty', 'STRING')
+        ]
+
+    def test_schemas_match(self):
+        expected = [bigquery.SchemaField('id', 'INTEGER'), bigquery.SchemaField('name', 'STRING')]
+        existing = [bigquery.SchemaField('NAME', 'STRING'), bigquery.SchemaField('id', 'INT64')]
+        assert BigQueryLoadUtil.schemas_match(existing, expected)
+
+        changed = [bigquery.SchemaField('id', 'STRING'), bigquery.SchemaField('name', 'STRING')]
+        assert not BigQueryLoadUtil.schemas_match(changed, expected)
+
+    def test_split_batch(self):
+        batch = pa.record_batch([pa.array(range(1000), type=pa.int64())], names=['id'])
+        pieces = list(BigQueryLoadUtil.split_batch(batch, 2000))
+
+        assert all(piece.nbytes <= 2000 for piece in pieces)
+        assert sum(piece.num_rows for piece in pieces) == 1000
+        assert list(BigQueryLoadUtil.split_batch(batch.slice(0, 0), 2000)) == []
+
+
+class TestBigQueryDestination:
+
+    @pytest.fixture
+    def destination(self):
+        with patch('pontoon.destination.bigquery_destination.registry'):
+            destination = BigQueryDestination({
+                'mode': Mode({'type': Mode.FULL_REFRESH}),
+                'connect': {
+                    'auth_type': 'service_account',
+                    'project_id': 'project',
+                    'service_account': '{}',
+                    'gcs_bucket_name': 'bucket'
+                }
+            })
+        destination._client = MagicMock()
+        return destination
+
+    @pytest.fixture
+    def write_client(self, destination):
+        """A Storage Write API client that acknowledges every append unless told to fail one"""
+
+        class AppendRows:
+            def __init__(self, requests, fail_at):
+                self.requests = requests
+                self.fail_at = fail_at
+                self.sent = []
+                self.cancelled = False
+
+            def __iter__(self):
+                for request in self.requests:
+                    self.sent.append(request)
+                    response = types.AppendRowsResponse()
+                    if len(self.sent) == self.fail_at:
+                        response.error.code = 3
+                        response.error.message = 'bad rows'
+                    yield response
+
+            def cancel(self):
+                self.cancelled = True
+
+        client = MagicMock()
+        client.fail_at = None
+        client.table_path.return_value = 'projects/project/datasets/main/tables/__temp_users'
+        client.create_write_stream.return_value = types.WriteStream(name='projects/project/datasets/main/tables/__temp_users/streams/s1')
+        client.batch_commit_write_streams.return_value = types.BatchCommitWriteStreamsResponse()
+
+        def append_rows(requests):
+            client.calls = AppendRows(requests, client.fail_at)
+            return client.calls
+        client.append_rows.side_effect = append_rows
+
+        destination._write_client = client
+        return client
+
+    @pytest.fixture
+    def users(self):
+        stream = Stream('users', 'main', pa.schema([('id', pa.int64()), ('name', pa.string())]), primary_field='id')
+        cache = MemoryCache(Namespace('test'))
+        cache.write(stream, [Record([i, f"user {i}"]) for i in range(100)])
+        return Dataset(Namespace('test'), [stream], cache, meta={'batch_id': '1'})
+
+    def test_adds_checksum_to_existing_target(self, destination):
+        stream = Stream('users', 'main', pa.schema([('id', pa.int64()), ('name', pa.string())]), primary_field='id')
+        stream.with_checksum()
+        target = bigquery.Table('project.main.users', schema=[bigquery.SchemaField('id', 'INTEGER'), bigquery.SchemaField('name', 'STRING')])
+        destination._client.create_table.return_value = target
+
+        # a target loaded before skip_unchanged was turned on gets the checksum column
+        destination._ensure_target(None, None, None, stream, 'main.users', '__temp_users')
+        assert [field.name for field in target.schema] == ['id', 'name', 'pontoon__checksum']
+        destination._client.update_table.assert_called_once_with(target, ['schema'])
+
+    def test_storage_write(self, destination, write_client, users, monkeypatch):
+        monkeypatch.setattr(BigQueryLoadUtil, 'MAX_APPEND_BYTES', 512)
+        monkeypatch.setattr(BigQueryLoadUtil, 'MAX_PENDING_APPENDS', 2)
+        stream = users.streams[0]
+
+        destination._storage_write(users, stream, '__temp_users')
+
+        # a pending stream is created, appended to, finalized and committed
+        assert [call[0] for call in write_client.mock_calls if not call[0].startswith('append_rows')] == [
+            'table_path', 'create_write_stream', 'finalize_write_stream', 'batch_commit_write_streams'
+        ]
+        assert write_client.create_write_stream.call_args.kwargs['write_stream'].type_ == types.WriteStream.Type.PENDING
+        assert write_client.finalize_write_stream.call_args.kwargs['name'].endswith('/streams/s1')
+
+        # only the first append names the stream and its schema, offsets follow the rows sent
+        sent = write_client.calls.sent
+        assert len(sent) > 2
+        assert sent[0].write_stream.endswith('/streams/s1')
+        assert pa.ipc.read_schema(pa.py_buffer(sent[0].arrow_rows.writer_schema.serialized_schema)) == stream.schema
+        assert all(request.write_stream == '' for request in sent[1:])
+
+        offsets = [request.offset for request in sent]
+        counts = [request.arrow_rows.rows.row_count for request in sent]
+        assert offsets == [sum(counts[:i]) for i in range(len(counts))]
+        assert sum(counts) == 100
+
+        batch = pa.ipc.read_record_batch(pa.py_buffer(sent[-1].arrow_rows.rows.serialized_record_batch), stream.schema)
+        assert batch.column(0).to_pylist()[-1] == 99
+
+    def test_storage_write_error(self, destination, write_client, users, monkeypatch):
+        monkeypatch.setattr(BigQueryLoadUtil, 'MAX_APPEND_BYTES', 512)
+        write_client.fail_at = 2
+
+        # a failed append ends the call, nothing is committed
+        with pytest.raises(DestinationError, match='bad rows'):
+            destination._storage_write(users, users.streams[0], '__temp_users')
+        assert write_client.calls.cancelled
+        write_client.batch_commit_write_streams.assert_not_called()
+
+    def test_failed_stream_cancels_load_job(self, destination, users):
+        load_job = MagicMock()
+
+        # the stream fails before waiting on its load job
+        with patch.object(destination, '_connect', side_effect=Exception('connection lost')):
+            with pytest.raises(Exception, match='connection lost'):
+                destination._write_stream(users, users.streams[0], MagicMock(), load_job)
+        load_job.cancel.assert_called_once()
@@ -0,0 +1,75 @@
+from unittest.mock import Mock
+from sqlalchemy import create_engine
+from pontoon.engine_registry import EngineRegistry
+
+
+def _connect(password='secret', database='db'):
+    return {'host': 'localhost', 'user': 'u', 'password': password, 'database': database, 'auth_type': 'basic'}
+
+
+class TestEngineRegistry:
+    """Test process-wide engine reuse"""
+
+    def test_disabled_always_creates(self):
+        registry = EngineRegistry()
+        factory = Mock(side_effect=lambda: Mock())
+
+        registry.get('PostgreSQLSource', _connect(), factory)
+        registry.get('PostgreSQLSource', _connect(), factory)
+
+        assert factory.call_count == 2
+        assert len(registry) == 0
+        assert registry.pool_options('postgresql+psycopg2://u:p@h/db') == {}
+
+    def test_reuse_by_connection_info(self):
+        registry = EngineRegistry()
+        registry.configure(enabled=True)
+
+        a = registry.get('PostgreSQLSource', _connect(), lambda: Mock())
+        b = registry.get('PostgreSQLSource', _connect(), lambda: Mock())
+        c = registry.get('PostgreSQLSource', _connect(database='other'), lambda: Mock())
+        d = registry.get('SnowflakeSource', _connect(), lambda: Mock())
+
+        assert a is b
+        assert a is not c
+        assert a is not d
+        assert len(registry) == 3
+
+    def test_credential_change_invalidates(self):
+        registry = EngineRegistry()
+        registry.configure(enabled=True)
+
+        old = registry.get('PostgreSQLSource', _connect(), lambda: Mock())
+        new = registry.get('PostgreSQLSource', _connect(password='rotated'), lambda: Mock())
+
+        assert old is not new
+        old.dispose.assert_called_once()
+        assert len(registry) == 1
+
+    def test_idle_eviction(self):
+        registry = EngineRegistry()
+        registry.configure(enabled=True, idle_timeout=0)
+
+        idle = registry.get('PostgreSQLSource', _connect(), lambda: Mock())
+        registry.get('PostgreSQLSource', _connect(database='other'), lambda: Mock())
+
+        idle.dispose.assert_called_once()
+        assert len(registry) == 1
+
+    def test_pool_options(self):
+        registry = EngineRegistry()
+        registry.configure(enabled=True, pool_size=2, max_overflow=1)
+
+        options = registry.pool_options('postgresql+psycopg2://u:p@h/db')
+        assert options['pool_size'] == 2
+        assert options['max_overflow'] == 1
+        assert registry.pool_options('sqlite:///test.db') == {}
+
+        # the pool grows to fit callers that hold more connections at once
+        assert registry.pool_options('postgresql+psycopg2://u:p@h/db', connections=8)['pool_size'] == 8
+        assert EngineRegistry().pool_options('postgresql+psycopg2://u:p@h/db', connections=8) == {'pool_size': 8}
+
+        # pool options are accepted by create_engine for queue pooled dialects
+        engine = create_engine('postgresql+psycopg2://u:p@h/db', **options)
+        assert engine.pool.size() == 2
+        engine.dispose()
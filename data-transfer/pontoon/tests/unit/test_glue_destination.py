@@ -0,0 +1,116 @@
+import pytest
+import pyarrow as pa
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+from botocore.exceptions import ClientError
+from pontoon import Namespace, Stream, Record, Dataset, MemoryCache, Mode
+from pontoon.destination.glue_destination import GlueDestination, GlueCatalogUtil
+
+
+SCHEMA = pa.schema([('id', pa.int64()), ('Name', pa.string()), ('amount', pa.decimal128(10, 2)), ('updated_at', pa.timestamp('us', tz='UTC'))])
+
+
+def _client_error(code):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, 'operation')
+
+
+class TestGlueCatalogUtil:
+
+    def test_table_input(self):
+        table = GlueCatalogUtil.table_input('Events', 's3://bucket/data/events/', SCHEMA, ['dt'])
+
+        assert table['Name'] == 'events'
+        assert table['PartitionKeys'] == [{'Name': 'dt', 'Type': 'string'}]
+        assert table['StorageDescriptor']['Location'] == 's3://bucket/data/events/'
+        assert table['StorageDescriptor']['Columns'] == [
+            {'Name': 'id', 'Type': 'bigint'},
+            {'Name': 'name', 'Type': 'string'},
+            {'Name': 'amount', 'Type': 'decimal(10,2)'},
+            {'Name': 'updated_at', 'Type': 'timestamp'}
+        ]
+
+
+class TestGlueDestination:
+
+    @pytest.fixture
+    def dataset(self):
+        stream = Stream('events', 'public', SCHEMA)
+        cache = MemoryCache(Namespace('test'))
+        return Dataset(Namespace('test'), [stream], cache, meta={'batch_id': '123', 'dt': datetime(2025, 1, 10, tzinfo=timezone.utc)})
+
+    @pytest.fixture
+    def glue(self):
+        return MagicMock()
+
+    @pytest.fixture
+    def config(self):
+        return {
+            'mode': Mode({}),
+            'connect': {
+                'auth_type': 'credentials',
+                'glue_iam_role': 'role',
+                'glue_database': 'db',
+                's3_bucket': 'bucket',
+                's3_prefix': 'data',
+                's3_region': 'us-east-1'
+            }
+        }
+
+    def test_registers_staging_table(self, glue, config, dataset):
+        destination = GlueDestination(config)
+        with patch.object(destination, '_get_glue_client', return_value=glue):
+            destination.write(dataset)
+
+        table = glue.create_table.call_args.kwargs['TableInput']
+        assert table['StorageDescriptor']['Location'] == 's3://bucket/data/test/public__events/2025-01-10/123/'
+        glue.create_crawler.assert_not_called()
+
+    def test_registers_hive_partition(self, glue, config, dataset):
+        glue.create_table.side_effect = _client_error('AlreadyExistsException')
+        glue.batch_create_partition.return_value = {'Errors': [
+            {'PartitionValues': ['2025-01-10'], 'ErrorDetail': {'ErrorCode': 'AlreadyExistsException', 'ErrorMessage': ''}}
+        ]}
+
+        config['connect']['format'] = 'hive'
+        destination = GlueDestination(config)
+        with patch.object(destination, '_get_glue_client', return_value=glue):
+            destination.write(dataset)
+
+        # an existing table is updated in place
+        table = glue.update_table.call_args.kwargs['TableInput']
+        assert table['StorageDescriptor']['Location'] == 's3://bucket/data/events/'
+
+        partition = glue.batch_create_partition.call_args.kwargs['PartitionInputList'][0]
+        assert partition['Values'] == ['2025-01-10']
+        assert partition['StorageDescriptor']['Location'] == 's3://bucket/data/events/dt=2025-01-10/'
+        glue.create_crawler.assert_not_called()
+
+    def test_falls_back_to_crawler(self, glue, config, dataset):
+        glue.create_table.side_effect = _client_error('AccessDeniedException')
+        glue.get_crawler.return_value = {'Crawler': {'State': 'READY'}}
+
+        destination = GlueDestination(config)
+        with patch.object(destination, '_get_glue_client', return_value=glue):
+            destination.write(dataset)
+
+        targets = glue.create_crawler.call_args.kwargs['Targets']['S3Targets']
+        assert targets == [{'Path': 's3://bucket/data/test/public__events/2025-01-10/123/'}]
+        glue.delete_crawler.assert_called_once()
+
+    def test_registers_data_column_partitions(self, glue, config, dataset):
+        glue.batch_create_partition.return_value = {'Errors': []}
+
+        dataset.meta['hive_partitions'] = {'public.events': [(('name', 'a%2Fb'),), (('name', 'c'),)]}
+
+        config['connect'].update({'format': 'hive', 'partition_by': ['Name']})
+        destination = GlueDestination(config)
+        with patch.object(destination, '_get_glue_client', return_value=glue):
+            destination.write(dataset)
+
+        table = glue.create_table.call_args.kwargs['TableInput']
+        assert table['PartitionKeys'] == [{'Name': 'name', 'Type': 'string'}]
+        assert [column['Name'] for column in table['StorageDescriptor']['Columns']] == ['id', 'amount', 'updated_at']
+
+        partitions = glue.batch_create_partition.call_args.kwargs['PartitionInputList']
+        assert [partition['Values'] for partition in partitions] == [['a/b'], ['c']]
+        assert partitions[0]['StorageDescriptor']['Location'] == 's3://bucket/data/events/name=a%2Fb/'
@@ -0,0 +1,117 @@
+import io
+import pytest
+from unittest.mock import MagicMock
+import pyarrow as pa
+import pyarrow.parquet as pq
+from botocore.exceptions import ClientError
+from sqlalchemy import create_engine, text
+from pontoon import Namespace, Stream, Record, Dataset, MemoryCache
+from pontoon.destination.integrity import SQLIntegrity, S3Integrity, ObjectStoreIntegrity, SMSExistenceIntegrity
+
+
+SCHEMA = pa.schema([('id', pa.int64()), ('name', pa.string())])
+
+
+def _dataset(sizes):
+    cache = MemoryCache(Namespace('test'))
+    streams = []
+    for name, size in sizes.items():
+        stream = Stream(name, 'main', SCHEMA)
+        cache.write(stream, [Record([i, f"name {i}"]) for i in range(size)])
+        streams.append(stream)
+    return Dataset(Namespace('test'), streams, cache, meta={'batch_id': '42'})
+
+
+class FakeS3:
+    """ Serves head_object and ranged get_object from a dict of objects """
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.ranges = []
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({'Error': {'Code': '404', 'Message': 'Not Found'}}, 'HeadObject')
+        return {'ContentLength': len(self.objects[Key])}
+
+    def get_object(self, Bucket, Key, Range):
+        start, end = [int(value) for value in Range[len('bytes='):].split('-')]
+        self.ranges.append((start, end))
+        return {'Body': io.BytesIO(self.objects[Key][start:end + 1])}
+
+
+class TestSQLIntegrity:
+
+    def test_batched_counts(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path}/dest.db")
+        with engine.connect() as conn:
+            for name, rows in [('a', 3), ('b', 2)]:
+                conn.execute(text(f"CREATE TABLE {name} (id INTEGER, pontoon__batch_id TEXT)"))
+                for i in range(rows):
+                    conn.execute(text(f"INSERT INTO {name} VALUES ({i}, '42')"))
+            conn.execute(text("INSERT INTO b VALUES (9, '41')"))
+
+        integrity = SQLIntegrity(engine, max_streams=1, unchanged={'main.b': 1})
+        assert 'UNION ALL' in integrity.batch_count_sql(_dataset({'a': 3, 'b': 3}).streams, '42')
+
+        # the empty stream 'c' has no table and is not counted
+        integrity.check_batch_volume(_dataset({'a': 3, 'b': 3, 'c': 0}))
+        with pytest.raises(Exception, match='main.a: loaded=3, expected=4'):
+            integrity.check_batch_volume(_dataset({'a': 4, 'b': 3}))
+
+
+class TestObjectStoreIntegrity:
+
+    @pytest.fixture
+    def files(self):
+        """Parquet files of 10 and 5 rows, by key"""
+        files = {}
+        for key, rows in [('k0', 10), ('k1', 5)]:
+            sink = io.BytesIO()
+            pq.write_table(pa.table({'id': list(range(rows)), 'name': [f"name {i}" for i in range(rows)]}, schema=SCHEMA), sink)
+            files[key] = sink.getvalue()
+        return files
+
+    def test_footer_row_counts(self, files):
+        client = FakeS3(files)
+        objects = {'main.users': [(key, len(data), 0) for key, data in files.items()]}
+
+        S3Integrity(client, 'bucket', objects).check_batch_volume(_dataset({'users': 15}))
+
+        # one ranged read per object, small objects fit in the tail read
+        assert len(client.ranges) == 2
+        with pytest.raises(Exception, match='loaded=15, expected=16'):
+            S3Integrity(client, 'bucket', objects).check_batch_volume(_dataset({'users': 16}))
+
+    def test_large_footer(self, files, monkeypatch):
+        monkeypatch.setattr(ObjectStoreIntegrity, 'TAIL_BYTES', 16)
+        data = files['k0']
+        client = FakeS3({'k': data})
+
+        assert S3Integrity(client, 'bucket', {}).footer_rows('k', len(data)) == 10
+        assert len(client.ranges) > 1
+
+    def test_missing_and_truncated_objects(self, files):
+        data = files['k1']
+        client = FakeS3({'k': data[:-1]})
+
+        with pytest.raises(Exception, match='stored=None'):
+            S3Integrity(client, 'bucket', {'main.users': [('gone', len(data), 5)]}).check_batch_volume(_dataset({'users': 5}))
+        with pytest.raises(Exception, match=f"stored={len(data) - 1} bytes"):
+            S3Integrity(client, 'bucket', {'main.users': [('k', len(data), 5)]}).check_batch_volume(_dataset({'users': 5}))
+
+
+class TestSMSExistenceIntegrity:
+
+    def test_staged_files(self):
+        client = MagicMock()
+        client.cursor.return_value.fetchall.return_value = [('stage/main__users_42_0.parquet', 10, 'md5', 'date')]
+        objects = {'main.users': [('main__users_42_0.parquet', 100, 3)]}
+
+        # the recorded rows of the listed files add up to the stream
+        SMSExistenceIntegrity(client, 'stage', objects).check_batch_volume(_dataset({'users': 3}))
+        assert "PATTERN = '.*42.*'" in client.cursor.return_value.execute.call_args.args[0]
+
+        objects['main.users'].append(('main__users_42_1.parquet', 100, 2))
+        with pytest.raises(Exception, match='1 file\\(s\\) missing from stage'):
+            SMSExistenceIntegrity(client, 'stage', objects).check_batch_volume(_dataset({'users': 5}))
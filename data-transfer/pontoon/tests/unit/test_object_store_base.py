@@ -0,0 +1,487 @@
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datetime import datetime, timezone
+from pontoon import Namespace, Stream, Record, Dataset, MemoryCache, Mode
+from pontoon.destination.object_store_base import ObjectStoreBase, ParquetFileWriter, SpillBuffer, HivePartitioning
+
+
+SNOWFLAKE_CONNECT = {'stage_name': 'stage', 'user': 'u', 'access_token': 't', 'account': 'a', 'warehouse': 'w', 'database': 'd', 'target_schema': 's'}
+SCHEMA = pa.schema([('id', pa.int64()), ('name', pa.string()), ('payload', pa.string())])
+
+
+def make_batch(start, count):
+    return pa.record_batch([
+        pa.array(range(start, start + count), type=pa.int64()),
+        pa.array([f"user {i % 3}" for i in range(start, start + count)]),
+        pa.array([f"payload {i}" for i in range(start, start + count)])
+    ], schema=SCHEMA)
+
+
+class CollectingDestination(ObjectStoreBase):
+    """ An object store destination that keeps the batches it is asked to write """
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.files = []
+        self.uploaded = []
+
+    def _write_stream(self, stream):
+        pass
+
+    def _upload_object(self, stream, obj, batch_index):
+        self.files.append((batch_index, obj.rows))
+        with obj.open() as data:
+            self.uploaded.append(pq.read_table(data))
+
+    def integrity(self):
+        pass
+
+
+class TestParquetFileWriter:
+    """Test the streaming Parquet writer"""
+
+    def test_defaults(self, tmp_path):
+        path = str(tmp_path / 'out.parquet')
+        stream = Stream('users', 'public', SCHEMA)
+        ObjectStoreBase._write_parquet(stream, [make_batch(0, 10), make_batch(10, 5)], output_path=path)
+
+        metadata = pq.ParquetFile(path).metadata
+        assert metadata.num_rows == 15
+        assert metadata.num_row_groups == 1
+        column = metadata.row_group(0).column(0)
+        assert column.compression == 'ZSTD'
+        assert column.statistics.min == 0 and column.statistics.max == 14
+        assert pq.read_table(path).equals(pa.Table.from_batches([make_batch(0, 15)]))
+
+    def test_row_groups_and_column_options(self, tmp_path):
+        path = str(tmp_path / 'out.parquet')
+        writer = ParquetFileWriter(path, SCHEMA, {
+            'row_group_size': 4,
+            'compression': 'snappy',
+            'column_compression': {'payload': 'gzip'},
+            'use_dictionary': ['name'],
+            'write_statistics': False
+        })
+        for start in range(0, 10, 3):
+            writer.write(make_batch(start, min(3, 10 - start)))
+        writer.close()
+
+        metadata = pq.ParquetFile(path).metadata
+        assert writer.rows == 10
+        assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [4, 4, 2]
+
+        row_group = metadata.row_group(0)
+        assert row_group.column(0).compression == 'SNAPPY'
+        assert row_group.column(2).compression == 'GZIP'
+        assert 'RLE_DICTIONARY' in row_group.column(1).encodings
+        assert 'RLE_DICTIONARY' not in row_group.column(2).encodings
+        assert not row_group.column(0).is_stats_set
+
+    def test_casts_batches_to_schema(self, tmp_path):
+        path = str(tmp_path / 'out.parquet')
+        schema = pa.schema([('id', pa.int64()), ('ts', pa.timestamp('us', tz='UTC'))])
+        batch = pa.record_batch([pa.array([1], type=pa.int32()), pa.array([datetime(2025, 1, 1, tzinfo=timezone.utc)])], names=['id', 'ts'])
+
+        writer = ParquetFileWriter(path, schema)
+        writer.write(batch)
+        writer.close()
+
+        assert pq.read_table(path).schema == schema
+
+
+def make_dataset(rows):
+    stream = Stream('users', 'public', SCHEMA)
+    cache = MemoryCache(Namespace('test'))
+    cache.write(stream, [Record([i, f"user {i}", f"payload {i}"]) for i in range(rows)])
+    return Dataset(Namespace('test'), [stream], cache, meta={'batch_id': '1', 'dt': datetime.now(timezone.utc)})
+
+
+class TestSpillBuffer:
+    """Test the in-memory Parquet sink that spills large files to disk"""
+
+    def test_stays_in_memory(self):
+        sink = SpillBuffer(1024 * 1024)
+        ObjectStoreBase._write_parquet(Stream('users', 'public', SCHEMA), [make_batch(0, 100)], output_path=sink)
+        obj = sink.to_object(100)
+
+        assert obj.path is None
+        assert obj.size == sink.tell()
+        with obj.open() as data:
+            assert pq.read_table(data).num_rows == 100
+
+    def test_spills_to_disk(self, tmp_path):
+        import os
+
+        sink = SpillBuffer(1024, spill_dir=str(tmp_path))
+        ObjectStoreBase._write_parquet(Stream('users', 'public', SCHEMA), [make_batch(0, 1000)], output_path=sink)
+        obj = sink.to_object(1000)
+
+        assert obj.buffer is None
+        assert os.path.dirname(obj.path) == str(tmp_path)
+        assert obj.size == sink.tell()
+        assert pq.read_table(obj.path).column('id').to_pylist() == list(range(1000))
+
+        obj.cleanup()
+        assert not os.listdir(tmp_path)
+
+
+class TestHivePartitioning:
+    """Test routing rows to hive partitions by data columns"""
+
+    def test_split(self):
+        batch = pa.record_batch([
+            pa.array([1, 2, 3, 4]),
+            pa.array(['a/b', 'c', None, 'c']),
+            pa.array([datetime(2025, 1, 1, 5, tzinfo=timezone.utc), datetime(2025, 1, 2, tzinfo=timezone.utc),
+                      datetime(2025, 1, 1, 23, tzinfo=timezone.utc), datetime(2025, 1, 2, 1, tzinfo=timezone.utc)],
+                     type=pa.timestamp('us', tz='UTC'))
+        ], names=['id', 'tenant', 'updated_at'])
+
+        partitioning = HivePartitioning(['tenant', {'column': 'updated_at', 'transform': 'day', 'name': 'day'}])
+        assert partitioning.keys == ['tenant', 'day']
+        assert partitioning.applies(batch.schema)
+        assert partitioning.file_schema(batch.schema).names == ['id', 'updated_at']
+
+        parts = {partition: rows for partition, rows in partitioning.split(batch)}
+        assert sorted(parts.keys()) == [
+            (('tenant', '__HIVE_DEFAULT_PARTITION__'), ('day', '2025-01-01')),
+            (('tenant', 'a%2Fb'), ('day', '2025-01-01')),
+            (('tenant', 'c'), ('day', '2025-01-02'))
+        ]
+        # the identity column is left out of the data
+        assert parts[(('tenant', 'c'), ('day', '2025-01-02'))].schema.names == ['id', 'updated_at']
+        assert parts[(('tenant', 'c'), ('day', '2025-01-02'))].column('id').to_pylist() == [2, 4]
+
+
+class TestObjectStoreBase:
+    """Test slicing cached batches into files and the encode / upload pipeline"""
+
+    def test_write_slices_files(self):
+        dest = CollectingDestination({'connect': {}, 'mode': Mode({}), 'batch_size': 10})
+        dest.write(make_dataset(25))
+
+        assert sorted(dest.files) == [(0, 10), (1, 10), (2, 5)]
+
+    def test_skips_streams_written_directly(self):
+        dest = CollectingDestination({'connect': {}, 'mode': Mode({}), 'batch_size': 10})
+        ds = make_dataset(25)
+        ds.meta['skip_streams'] = {'public.users'}
+        dest.write(ds)
+
+        assert dest.files == []
+
+    def test_hive_partitioned_files(self):
+        dest = CollectingDestination({
+            'connect': {'format': 'hive', 'partition_by': ['name'], 'max_open_partitions': 2},
+            'mode': Mode({}),
+            'batch_size': 10
+        })
+        stream = Stream('users', 'public', SCHEMA)
+        cache = MemoryCache(Namespace('test'))
+        cache.write(stream, [Record([i, f"user {i % 3}", f"payload {i}"]) for i in range(30)])
+        ds = Dataset(Namespace('test'), [stream], cache, meta={'batch_id': '1', 'dt': datetime.now(timezone.utc)})
+        dest.write(ds)
+
+        # three partitions and room for two writers, every file holds a single partition
+        assert sum(rows for _, rows in dest.files) == 30
+        assert all(table.schema.names == ['id', 'payload'] for table in dest.uploaded)
+        assert len(dest.files) > 3
+
+        partitions = ds.meta['hive_partitions']['public.users']
+        assert partitions == [(('name', f"user%20{i}"),) for i in range(3)]
+
+        store = type('Store', (), {'scheme': 's3', 'bucket_name': 'bucket', 'bucket_path': 'data'})()
+        filename = dest._object_filename(store, stream, 0)
+        assert filename.startswith('data/users/name=user%20')
+
+    def test_in_memory_files(self):
+        from unittest.mock import patch
+
+        dest = CollectingDestination({'connect': {'temp_files': False, 'upload_workers': 1}, 'mode': Mode({}), 'batch_size': 10})
+        with patch('pontoon.destination.object_store_base.tempfile.mkstemp') as mkstemp:
+            dest.write(make_dataset(25))
+
+        mkstemp.assert_not_called()
+        assert pa.concat_tables(dest.uploaded).column('id').to_pylist() == list(range(25))
+
+    def test_pending_files_are_bounded(self):
+        import threading
+        import time
+
+        class SlowDestination(CollectingDestination):
+            def __init__(self, config):
+                super().__init__(config)
+                self.lock = threading.Lock()
+                self.in_flight = 0
+                self.max_in_flight = 0
+
+            def _encode_batch(self, stream, batch, batch_index):
+                with self.lock:
+                    self.in_flight += 1
+                    self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                return super()._encode_batch(stream, batch, batch_index)
+
+            def _upload_object(self, stream, obj, batch_index):
+                time.sleep(0.01)
+                super()._upload_object(stream, obj, batch_index)
+                with self.lock:
+                    self.in_flight -= 1
+
+        dest = SlowDestination({'connect': {'upload_workers': 2, 'max_pending_files': 3}, 'mode': Mode({}), 'batch_size': 5})
+        dest.write(make_dataset(100))
+
+        assert len(dest.files) == 20
+        assert dest.max_in_flight <= 3
+
+    def test_target_file_size(self):
+        class SizedDestination(CollectingDestination):
+            def _upload_object(self, stream, obj, batch_index):
+                super()._upload_object(stream, obj, batch_index)
+                self.sizes.append((batch_index, obj.size))
+
+        connect = {'target_file_size_mb': 0.01, 'min_file_rows': 100, 'temp_files': False, 'parquet': {'row_group_size': 50}}
+        dest = SizedDestination({'connect': connect, 'mode': Mode({}), 'batch_size': 25})
+        dest.sizes = []
+        dest.write(make_dataset(5000))
+
+        sizes = [size for _, size in sorted(dest.sizes)]
+        rows = [rows for _, rows in sorted(dest.files)]
+        assert sum(rows) == 5000
+        assert len(sizes) > 1
+        assert all(size >= 0.01 * 1024 * 1024 for size in sizes[:-1])
+        assert all(count >= 100 for count in rows[:-1])
+
+    def test_target_file_size_row_guards(self):
+        # every file is far below the target, the max row guard rolls them
+        connect = {'target_file_size_mb': 512, 'max_file_rows': 300}
+        dest = CollectingDestination({'connect': connect, 'mode': Mode({}), 'batch_size': 250})
+        dest.write(make_dataset(1000))
+
+        assert sorted(dest.files) == [(0, 300), (1, 300), (2, 300), (3, 100)]
+
+    def test_file_multiple(self):
+        # 25 rows in files of at most 10 rows, as a multiple of 4 files
+        dest = CollectingDestination({'connect': {'file_multiple': 4, 'min_file_rows': 5}, 'mode': Mode({}), 'batch_size': 10})
+        dest.write(make_dataset(25))
+        assert sorted(dest.files) == [(0, 7), (1, 6), (2, 6), (3, 6)]
+
+        # a later destination can ask for the layout through the dataset meta
+        ds = make_dataset(100)
+        ds.meta['file_multiple'] = 3
+        dest = CollectingDestination({'connect': {'min_file_rows': 10}, 'mode': Mode({}), 'batch_size': 10})
+        dest.write(ds)
+        assert len(dest.files) == 12
+        assert sum(rows for _, rows in dest.files) == 100
+
+        # a stream smaller than the slice count is not split into one row files
+        ds = make_dataset(50)
+        ds.meta['file_multiple'] = 128
+        dest = CollectingDestination({'connect': {}, 'mode': Mode({}), 'batch_size': 10})
+        dest.write(ds)
+        assert sorted(dest.files) == [(i, 10) for i in range(5)]
+
+    def test_upload_error_is_raised(self):
+        import pytest
+
+        class FailingDestination(CollectingDestination):
+            def _upload_object(self, stream, obj, batch_index):
+                if batch_index == 1:
+                    raise IOError("upload failed")
+                super()._upload_object(stream, obj, batch_index)
+
+        dest = FailingDestination({'connect': {'upload_workers': 1}, 'mode': Mode({}), 'batch_size': 10})
+        with pytest.raises(IOError, match="upload failed"):
+            dest.write(make_dataset(100))
+
+
+class TestClientReuse:
+    """Test that object store clients are created once per write"""
+
+    def test_s3_client_shared_across_batches(self):
+        from unittest.mock import patch
+        from pontoon.destination.s3_destination import S3Destination
+
+        dest = S3Destination({
+            'connect': {'s3_bucket': 'bucket', 's3_prefix': 'prefix', 'auth_type': 'basic', 'max_connections': 8, 'upload_workers': 1, 'multipart_concurrency': 2},
+            'mode': Mode({}),
+            'batch_size': 10
+        })
+
+        with patch('pontoon.destination.s3_destination.boto3.client') as client:
+            dest.write(make_dataset(25))
+
+        assert client.call_count == 1
+        assert client.call_args.kwargs['config'].max_pool_connections == 8
+        assert client.return_value.upload_fileobj.call_count == 3
+        client.return_value.close.assert_called_once()
+
+    def test_abs_client_shared_and_blocks_staged(self):
+        import base64
+        from unittest.mock import patch
+        from pontoon.destination.abs_destination import ABSDestination
+
+        dest = ABSDestination({
+            'connect': {
+                'blob_container': 'container',
+                'auth_type': 'connection_string',
+                'blob_connection_string': 'UseDevelopmentStorage=true',
+                'block_threshold_mb': 0,
+                'max_concurrency': 2
+            },
+            'mode': Mode({}),
+            'batch_size': 10
+        })
+        dest._block_size = 1024
+
+        with patch('pontoon.destination.abs_destination.BlobServiceClient') as service:
+            dest.write(make_dataset(25))
+
+        # one service client for the write, every file staged as blocks and committed in order
+        assert service.from_connection_string.call_count == 1
+        service.from_connection_string.return_value.close.assert_called_once()
+
+        blob = service.from_connection_string.return_value.get_container_client.return_value.get_blob_client.return_value
+        assert blob.upload_blob.call_count == 0
+        assert blob.commit_block_list.call_count == 3
+        staged = {call.args[0]: call.args[1] for call in blob.stage_block.call_args_list}
+        committed = blob.commit_block_list.call_args_list[0].args[0]
+        assert [base64.b64decode(block.id) for block in committed] == [f"{i:08d}".encode('utf-8') for i in range(len(committed))]
+        assert all(len(staged[block.id]) <= 1024 for block in committed)
+
+    def test_s3_manifest(self):
+        import json
+        from unittest.mock import patch
+        from pontoon.destination.s3_destination import S3Destination
+
+        dest = S3Destination({
+            'connect': {'s3_bucket': 'bucket', 's3_prefix': 'prefix', 'auth_type': 'basic'},
+            'mode': Mode({}),
+            'batch_size': 10
+        })
+
+        # a standalone S3 destination leaves no manifest behind
+        with patch('pontoon.destination.s3_destination.boto3.client') as client:
+            dest.write(make_dataset(25))
+        client.return_value.put_object.assert_not_called()
+
+        # one is written when a Redshift leg asks for it
+        ds = make_dataset(25)
+        ds.meta['copy_manifest'] = True
+        with patch('pontoon.destination.s3_destination.boto3.client') as client:
+            dest.write(ds)
+
+        put = client.return_value.put_object.call_args.kwargs
+        manifest = json.loads(put['Body'])
+        uploaded = [call.args[2] for call in client.return_value.upload_fileobj.call_args_list]
+
+        assert put['Key'].endswith('/1.manifest')
+        assert sorted(entry['url'] for entry in manifest['entries']) == sorted(f"s3://bucket/{key}" for key in uploaded)
+        assert all(entry['mandatory'] and entry['meta']['content_length'] > 0 for entry in manifest['entries'])
+        assert ds.meta['manifests']['public.users'] == f"s3://bucket/{put['Key']}"
+
+    def test_snowflake_connection_shared_across_puts(self, tmp_path, monkeypatch):
+        from unittest.mock import patch
+        from pontoon.destination.snowflake_storage_destination import SnowflakeStorageDestination
+
+        monkeypatch.chdir(tmp_path)
+        dest = SnowflakeStorageDestination({
+            'connect': {**SNOWFLAKE_CONNECT, 'temp_files': False},
+            'mode': Mode({}),
+            'batch_size': 10
+        })
+
+        with patch('pontoon.destination.snowflake_storage_destination.snowflake.connector.connect') as connect:
+            dest.write(make_dataset(25))
+
+        assert connect.call_count == 1
+        execute = connect.return_value.cursor.return_value.execute
+        assert execute.call_count == 3
+        assert all(call.kwargs['file_stream'] is not None for call in execute.call_args_list)
+        assert not list(tmp_path.iterdir())
+        connect.return_value.close.assert_called_once()
+
+    def test_snowflake_directory_put(self, tmp_path):
+        from unittest.mock import patch
+        from pontoon.destination.snowflake_storage_destination import SnowflakeStorageDestination
+
+        dest = SnowflakeStorageDestination({
+            'connect': {**SNOWFLAKE_CONNECT, 'spill_dir': str(tmp_path), 'put_parallel': 8},
+            'mode': Mode({}),
+            'batch_size': 10
+        })
+
+        staged = []
+        def execute(sql, **kwargs):
+            # the PUT sees every file of the stream in one directory
+            staged.extend(sorted(os.listdir(sql.split("'file://")[1].split("/*'")[0])))
+
+        with patch('pontoon.destination.snowflake_storage_destination.snowflake.connector.connect') as connect:
+            connect.return_value.cursor.return_value.execute.side_effect = execute
+            ds = make_dataset(25)
+            dest.write(ds)
+
+        calls = connect.return_value.cursor.return_value.execute.call_args_list
+        assert len(calls) == 1
+        assert "@stage PARALLEL = 8 AUTO_COMPRESS = FALSE" in calls[0].args[0]
+        assert staged == [f"public__users_{ds.meta['dt'].strftime('%Y_%m_%d')}_1_{i}.parquet" for i in range(3)]
+        assert ds.meta['stage_files']['public.users'] == staged
+        assert not list(tmp_path.iterdir())
+
+    def test_snowflake_put_errors(self):
+        import pytest
+        from pontoon.base import DestinationError
+        from pontoon.destination.snowflake_storage_destination import SnowflakeStorageDestination
+
+        SnowflakeStorageDestination._check_put([('a.parquet', 'a.parquet', 1, 1, 'PARQUET', 'PARQUET', 'UPLOADED', '')])
+        with pytest.raises(DestinationError, match="1 file"):
+            SnowflakeStorageDestination._check_put([('b.parquet', 'b.parquet', 1, 1, 'PARQUET', 'PARQUET', 'ERROR', 'denied')])
+
+
+class TestMultiDestination:
+    """Test sharing one encode pass between object store legs"""
+
+    def test_legs_share_encoded_files(self):
+        from unittest.mock import patch
+        from pontoon.base import Destination
+        from pontoon.destination.dynamic import create_multi_destination
+
+        class Loader(Destination):
+            loaded = []
+
+            def __init__(self, config):
+                pass
+
+            def write(self, ds, progress_callback=None):
+                Loader.loaded.append(ds.meta.get('written'))
+
+            def integrity(self):
+                pass
+
+            def close(self):
+                pass
+
+        class RecordingDestination(CollectingDestination):
+            def _finish_stream(self, stream, objects):
+                self._ds.meta['written'] = len(objects)
+
+        multi_cls = create_multi_destination([CollectingDestination, RecordingDestination, Loader])
+        multi = multi_cls({'connect': {}, 'mode': Mode({}), 'batch_size': 10})
+        first, second, _ = multi._destinations
+
+        with patch.object(ObjectStoreBase, '_encode_batch', autospec=True, side_effect=ObjectStoreBase._encode_batch) as encode:
+            multi.write(make_dataset(25))
+
+        # three files encoded once, uploaded by both legs, loaded after the uploads finished
+        assert encode.call_count == 3
+        assert sorted(first.files) == sorted(second.files) == [(0, 10), (1, 10), (2, 5)]
+        assert Loader.loaded == [3]
+
+    def test_different_layouts_are_not_shared(self):
+        staging = CollectingDestination({'connect': {}, 'mode': Mode({}), 'batch_size': 10})
+        hive = CollectingDestination({'connect': {'format': 'hive'}, 'mode': Mode({}), 'batch_size': 10})
+        larger = CollectingDestination({'connect': {}, 'mode': Mode({}), 'batch_size': 20})
+
+        assert not staging.share_objects(hive)
+        assert not staging.share_objects(larger)
+        assert staging.share_objects(CollectingDestination({'connect': {}, 'mode': Mode({}), 'batch_size': 10}))
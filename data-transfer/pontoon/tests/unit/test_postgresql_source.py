@@ -175,6 +175,21 @@ class TestPostgreSQLSource:
                 mock_inspect.assert_called_once()
                 assert result == [{'test': 'stream'}]
 
+    def test_plan_uses_index(self):
+        """Test that sequential scans are reported as not index-backed"""
+        assert PostgreSQLSource.plan_uses_index([
+            "Index Scan using events_tenant_time_idx on events  (cost=0.42..8.44 rows=1 width=64)",
+            "  Index Cond: ((tenant_id = 1000) AND (event_time >= '2025-01-13 18:49:32'::timestamp))"
+        ])
+        assert PostgreSQLSource.plan_uses_index([
+            "Bitmap Heap Scan on events  (cost=4.18..12.64 rows=4 width=64)",
+            "  ->  Bitmap Index Scan on events_tenant_idx  (cost=0.00..4.18 rows=4 width=0)"
+        ])
+        assert not PostgreSQLSource.plan_uses_index([
+            "Seq Scan on events  (cost=0.00..35.50 rows=10 width=64)",
+            "  Filter: (tenant_id = 1000)"
+        ])
+
 
 class TestPostgreSQLSourceIntegration:
     """Integration tests for PostgreSQLSource to verify it works with the full system"""
@@ -296,4 +311,4 @@ class TestPostgreSQLSourceIntegration:
                 result = source.inspect_streams()
                 
                 # Verify it returns the expected streams
-                assert result == expected_streams
\ No newline at end of file
+                assert result == expected_streams
@@ -1,6 +1,7 @@
 import pytest
 from typing import List
-from pontoon.destination.redshift_destination import RedshiftSQLUtil  
+from pontoon import Namespace, Dataset, MemoryCache, Mode
+from pontoon.destination.redshift_destination import RedshiftSQLUtil, RedshiftDestination
 
 
 class TestRedshiftSQLUtil:
@@ -27,6 +28,23 @@ class TestRedshiftSQLUtil:
         result = RedshiftSQLUtil.copy_from_s3(table_name, s3_uri, iam_role, s3_region)
         assert result == expected_sql
 
+    def test_copy_from_s3_manifest(self):
+        result = RedshiftSQLUtil.copy_from_s3(
+            "target.target_table",
+            "s3://my-bucket/my-path/1740773449235.manifest",
+            "arn:aws:iam::123456789012:role/MyRedshiftRole",
+            "us-east-1",
+            manifest=True
+        )
+        assert result == (
+            "COPY target.target_table "
+            "FROM 's3://my-bucket/my-path/1740773449235.manifest' "
+            "IAM_ROLE 'arn:aws:iam::123456789012:role/MyRedshiftRole' "
+            "FORMAT AS PARQUET "
+            "MANIFEST "
+            "REGION 'us-east-1'"
+        )
+
     def test_upsert(self):
         target_table_name = "target.target_table"
         stage_table_name = "target.stage_table"
@@ -47,3 +65,24 @@ class TestRedshiftSQLUtil:
         
         assert delete_sql == expected_delete_sql
         assert insert_sql == expected_insert_sql
+
+
+class TestRedshiftDestination:
+
+    @pytest.fixture
+    def config(self):
+        return {
+            'mode': Mode({}),
+            'connect': {
+                'auth_type': 'basic', 'host': 'redshift.example.com', 'port': 5439, 'user': 'u', 'password': 'p', 'database': 'd',
+                's3_bucket': 'bucket', 's3_prefix': 'prefix', 's3_region': 'us-east-1', 'iam_role': 'role', 'slice_count': 4
+            }
+        }
+
+    def test_prepare(self, config):
+        ds = Dataset(Namespace('test'), [], MemoryCache(Namespace('test')), meta={})
+        RedshiftDestination(config).prepare(ds)
+
+        # the S3 leg writes a manifest and slice aligned files only for a Redshift load
+        assert ds.meta['copy_manifest'] is True
+        assert ds.meta['file_multiple'] == 4
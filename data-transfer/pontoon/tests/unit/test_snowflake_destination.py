@@ -22,6 +22,22 @@ class TestSnowflakeSQLUtil:
         )
         assert SnowflakeSQLUtil.copy_into_table(target_table_name, stage_name, pattern) == expected_sql
 
+    def test_copy_files_into_table(self):
+        files = [f"public__events_2025_01_10_1_{i}.parquet" for i in range(1001)]
+        statements = SnowflakeSQLUtil.copy_files_into_table("target_table", "stage", files, purge=True)
+
+        assert len(statements) == 2
+        assert statements[1] == (
+            "COPY INTO target_table "
+            "FROM @stage "
+            "FILES = ('public__events_2025_01_10_1_1000.parquet') "
+            "FILE_FORMAT = (TYPE = PARQUET) "
+            "MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE "
+            "PURGE = TRUE"
+        )
+        assert statements[0].count("'public__events_") == 1000
+        assert "PURGE" not in SnowflakeSQLUtil.copy_files_into_table("target_table", "stage", files[:1])[0]
+
     def test_merge(self):
         target_table_name = "target_table"
         stage_table_name = "stage_table"
@@ -41,3 +57,17 @@ class TestSnowflakeSQLUtil:
             f"VALUES ({cols_stage_str})"
         )
         assert SnowflakeSQLUtil.merge(target_table_name, stage_table_name, cols, primary_key) == expected_sql
+
+    def test_merge_with_checksum(self):
+        cols = ["id", "name", "pontoon__checksum"]
+        expected_sql = (
+            "MERGE INTO target_table AS target "
+            "USING stage_table AS stage "
+            "ON target.id = stage.id "
+            "WHEN MATCHED AND target.pontoon__checksum IS DISTINCT FROM stage.pontoon__checksum THEN "
+            "UPDATE SET target.name=stage.name,target.pontoon__checksum=stage.pontoon__checksum "
+            "WHEN NOT MATCHED THEN "
+            "INSERT (id,name,pontoon__checksum) "
+            "VALUES (stage.id,stage.name,stage.pontoon__checksum)"
+        )
+        assert SnowflakeSQLUtil.merge("target_table", "stage_table", cols, "id", "pontoon__checksum") == expected_sql
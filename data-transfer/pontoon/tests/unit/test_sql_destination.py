@@ -0,0 +1,180 @@
+import threading
+import pytest
+import pyarrow as pa
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.dialects import mysql
+from pontoon import Namespace, Stream, Record, Dataset, Mode, MemoryCache, DestinationStreamsFailed
+from pontoon.base import DestinationStreamInvalidSchema
+from pontoon.destination.sql_destination import SQLDestination
+
+
+def _dataset(rows):
+    schema = pa.schema([('id', pa.int64()), ('name', pa.string()), ('updated_at', pa.timestamp('us', tz='UTC'))])
+    stream = Stream('users', 'main', schema, primary_field='id')
+    cache = MemoryCache(Namespace('test'))
+    cache.write(stream, [Record(row) for row in rows])
+    return Dataset(Namespace('test'), [stream], cache, meta={})
+
+
+class TestSQLDestination:
+    """Test the generic SQL destination load paths against sqlite"""
+
+    @pytest.fixture
+    def ts(self):
+        return datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    @pytest.fixture
+    def config(self, tmp_path):
+        """A full refresh destination on a sqlite file"""
+        return {
+            'mode': Mode({'type': Mode.FULL_REFRESH}),
+            'connect': {'auth_type': 'basic', 'dsn': f"sqlite:///{tmp_path}/dest.db", 'chunk_size': 2}
+        }
+
+    def test_full_refresh_reload(self, ts, config):
+        destination = SQLDestination(config)
+
+        destination.write(_dataset([[1, 'a', ts], [2, None, ts], [3, 'c', ts]]))
+        destination.write(_dataset([[4, 'd', ts], [5, 'e', ts]]))
+
+        with destination._connect() as conn:
+            rows = conn.execute(text("SELECT id, name, updated_at FROM main.users ORDER BY id")).fetchall()
+
+        # the second load replaced the first, values went through the column bind processors
+        assert [row[0] for row in rows] == [4, 5]
+        assert rows[0][2] == '2025-01-01 00:00:00.000000'
+
+    def test_full_refresh_swap(self, ts, config):
+        config['connect']['full_refresh'] = 'swap'
+        destination = SQLDestination(config)
+
+        destination.write(_dataset([[1, 'a', ts], [2, 'b', ts]]))
+        destination.write(_dataset([[3, 'c', ts]]))
+
+        with destination._connect() as conn:
+            rows = conn.execute(text("SELECT id FROM main.users")).fetchall()
+            tables = [row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type='table'"))]
+
+        assert [row[0] for row in rows] == [3]
+        assert tables == ['users']
+
+    def test_skip_unchanged_on_existing_table(self, ts, config):
+        destination = SQLDestination(config)
+        destination.write(_dataset([[1, 'a', ts]]))
+
+        # turning on checksums for a table loaded without them adds the column
+        ds = _dataset([])
+        stream = ds.streams[0].with_checksum()
+        ds._cache.write(stream, [stream.to_record([2, 'b', ts])])
+        destination.write(ds)
+
+        with destination._connect() as conn:
+            rows = conn.execute(text("SELECT id, pontoon__checksum FROM main.users")).fetchall()
+        assert rows[0][0] == 2 and rows[0][1] is not None
+
+        # any other schema change is still rejected
+        ds = _dataset([])
+        stream = ds.streams[0].with_version('v2')
+        ds._cache.write(stream, [stream.to_record([3, 'c', ts])])
+        with pytest.raises(DestinationStreamInvalidSchema):
+            destination.write(ds)
+
+    def test_infile_value(self):
+        assert SQLDestination._infile_value(None) == 'NULL'
+        assert SQLDestination._infile_value('NULL') == '"NULL"'
+        assert SQLDestination._infile_value('say "hi"') == '"say ""hi"""'
+        assert SQLDestination._infile_value(True) == '1'
+        assert SQLDestination._infile_value(1.5) == '1.5'
+        assert SQLDestination._infile_value(datetime(2025, 1, 1, 12, tzinfo=timezone.utc)) == '"2025-01-01 12:00:00"'
+        assert SQLDestination._infile_value(b'\x00"\xff') == '0022ff'
+
+    def test_infile_binary_columns(self):
+        stream = Stream('files', 'main', pa.schema([('id', pa.int64()), ('data', pa.binary())]))
+        conn = SimpleNamespace(dialect=mysql.dialect())
+
+        # binary fields are loaded from hex through a user variable
+        assert SQLDestination._infile_columns(conn, stream) == ('id, @v1', ' SET data = UNHEX(@v1)')
+
+    def test_count_unchanged(self, config):
+        destination = SQLDestination(config)
+        stream = _dataset([]).streams[0]
+
+        # staged rows the merge didn't touch, no count without checksums or a rowcount
+        destination._count_unchanged(stream, 5, 2)
+        destination._count_unchanged(stream.with_checksum(), 5, 2)
+        destination._count_unchanged(Stream('other', 'main', stream.with_checksum().schema, primary_field='id'), 5, -1)
+        assert destination._unchanged == {'main.users': 3}
+
+    def test_infile_rejected(self, ts, config, monkeypatch):
+        config['connect']['local_infile'] = True
+        destination = SQLDestination(config)
+        ds = _dataset([[1, 'a', ts], [2, 'b', ts], [3, 'c', ts]])
+
+        def rejected(*args, **kwargs):
+            raise OperationalError('LOAD DATA', {}, Exception(3948, 'Loading local data is disabled'))
+        monkeypatch.setattr(destination, '_write_batch_infile', rejected)
+
+        # a server without local_infile gets inserts instead
+        with destination._connect() as conn:
+            table = SQLDestination.create_table_if_not_exists(conn, ds.streams[0])
+            with conn.begin():
+                destination._write_batch_mysql(conn, table, ds.streams[0], list(ds.read(ds.streams[0])))
+            rows = conn.execute(text("SELECT id FROM main.users ORDER BY id")).fetchall()
+
+        assert [row[0] for row in rows] == [1, 2, 3]
+        assert destination._local_infile is False
+
+    def test_failed_reload_keeps_rows(self, ts, config, monkeypatch):
+        destination = SQLDestination(config)
+        destination.write(_dataset([[1, 'a', ts], [2, 'b', ts]]))
+
+        def failing_batch(*args, **kwargs):
+            raise ValueError("Simulated load failure")
+        monkeypatch.setattr(destination, '_write_batch', failing_batch)
+
+        # the default DELETE rolls back with the failed load
+        with pytest.raises(ValueError):
+            destination.write(_dataset([[3, 'c', ts]]))
+
+        with destination._connect() as conn:
+            rows = conn.execute(text("SELECT id FROM main.users ORDER BY id")).fetchall()
+        assert [row[0] for row in rows] == [1, 2]
+
+    def test_parallel_streams(self, config):
+        config['connect']['parallel_streams'] = 3
+        destination = SQLDestination(config)
+        streams = [Stream(f"s{i}", 'main', pa.schema([('id', pa.int64())])) for i in range(3)]
+
+        # each stream waits for all three to have started, so they must run at once
+        barrier = threading.Barrier(3, timeout=5)
+        written = []
+        def write_stream(stream):
+            barrier.wait()
+            written.append(stream.name)
+
+        destination._write_streams(streams, write_stream)
+        assert sorted(written) == ['s0', 's1', 's2']
+
+    def test_parallel_stream_errors(self, config):
+        config['connect']['parallel_streams'] = 2
+        destination = SQLDestination(config)
+        streams = [Stream(f"s{i}", 'main', pa.schema([('id', pa.int64())])) for i in range(3)]
+
+        written = []
+        def write_stream(stream):
+            if stream.name != 's1':
+                raise ValueError(f"{stream.name} failed")
+            written.append(stream.name)
+
+        # the healthy stream still completes, both failures are reported
+        with pytest.raises(DestinationStreamsFailed) as e:
+            destination._write_streams(streams, write_stream)
+        assert written == ['s1']
+        assert sorted(e.value.errors.keys()) == ['main.s0', 'main.s2']
+
+        # a single failure is raised as is
+        with pytest.raises(ValueError):
+            destination._write_streams(streams[:2], write_stream)
@@ -1,8 +1,24 @@
+import os
 import pytest
 from datetime import datetime, timedelta, timezone
 import pyarrow as pa
-from pontoon import Stream, Mode
-from pontoon.source.sql_source import SQLSource, SQLUtil
+from sqlalchemy import create_engine, text
+from pontoon import Stream, Mode, Namespace, ArrowIpcCache
+from pontoon.source.sql_source import SQLSource, SQLUtil, SQLCheckpoint
+from pontoon.destination.integrity import SQLIntegrity
+
+
+class SqliteSource(SQLSource):
+    """ A SQLSource over a sqlite file, for reading real result sets in tests """
+
+    def _create_engine(self, connect_config):
+        return create_engine(connect_config['dsn'])
+
+    def _validate_auth_type(self, auth_type):
+        pass
+
+    def _get_namespace(self, connect_config):
+        return Namespace('main')
 
 
 class TestSQLSource:
@@ -13,6 +29,30 @@ class TestSQLSource:
     
     """
 
+    @pytest.fixture
+    def source_db(self, tmp_path):
+        """A sqlite source table, two rows tie on the cursor and one has a NULL cursor"""
+        engine = create_engine(f"sqlite:///{tmp_path}/source.db")
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE events (id INTEGER PRIMARY KEY, version INTEGER)"))
+            conn.execute(text("INSERT INTO events VALUES (1, 2), (2, NULL), (3, 1), (4, 2), (5, 1)"))
+        return engine
+
+    @pytest.fixture
+    def keyset_config(self, tmp_path, source_db):
+        """A keyset paginated read of source_db that checkpoints in tmp_path"""
+        return {
+            'connect': {'dsn': str(source_db.url), 'keyset_pagination': True, 'page_size': 2, 'explain': False},
+            'mode': Mode({'type': Mode.FULL_REFRESH}),
+            'with': {'batch_id': True, 'last_sync': True},
+            'streams': [{'schema': 'main', 'table': 'events', 'primary_field': 'id', 'cursor_field': 'version'}],
+            'checkpoint_path': f"{tmp_path}/cache/checkpoint.json"
+        }
+
+    @pytest.fixture
+    def cache_config(self, tmp_path):
+        return {'cache_dir': f"{tmp_path}/cache"}
+
     def test_build_select_query(self):
 
         # dummy table schema
@@ -36,4 +76,118 @@ class TestSQLSource:
         # generate select query with additional WHERE filters 
         stream = Stream('events', 'pontoon', schema, primary_field='id', cursor_field='event_time', filters={'user_id': 1000})
         select_query = SQLUtil.build_select_query(stream, mode)
-        assert select_query == "SELECT id,data,event_time,user_id FROM pontoon.events WHERE event_time >= '2025-01-13T18:49:32' AND event_time < '2025-01-14T18:49:32' AND user_id = 1000"
\ No newline at end of file
+        assert select_query == "SELECT id,data,event_time,user_id FROM pontoon.events WHERE event_time >= '2025-01-13T18:49:32' AND event_time < '2025-01-14T18:49:32' AND user_id = 1000"
+
+    def test_build_keyset_query(self):
+
+        schema = pa.schema([('id', pa.int64()), ('data', pa.string()), ('event_time', pa.timestamp('us',tz='UTC')), ('user_id', pa.int64())])
+        stream = Stream('events', 'pontoon', schema, primary_field='id', cursor_field='event_time', filters={'user_id': 1000})
+        mode = Mode({'type': Mode.FULL_REFRESH})
+
+        # first page has no seek condition
+        query = SQLUtil.build_keyset_query(stream, mode, ['event_time', 'id'], 500)
+        assert query == "SELECT id,data,event_time,user_id FROM pontoon.events WHERE user_id = 1000 ORDER BY event_time,id LIMIT 500"
+
+        # later pages seek past the last key read
+        after = [datetime(2025, 1, 14, 18, 49, 32, 0), 42]
+        query = SQLUtil.build_keyset_query(stream, mode, ['event_time', 'id'], 500, after=after, cols=['id', 'event_time'])
+        assert query == "SELECT id,event_time FROM pontoon.events WHERE user_id = 1000 AND "\
+                        "((event_time > '2025-01-14T18:49:32') OR (event_time = '2025-01-14T18:49:32' AND id > 42)) "\
+                        "ORDER BY event_time,id LIMIT 500"
+
+        # rows with a NULL cursor are paged through on their own
+        query = SQLUtil.build_keyset_query(stream, mode, ['id'], 500, after=[42], cols=['id'], nulls=True)
+        assert query == "SELECT id FROM pontoon.events WHERE user_id = 1000 AND event_time IS NULL AND ((id > 42)) ORDER BY id LIMIT 500"
+
+    def test_stream_mode(self, keyset_config, cache_config):
+        start = datetime(2025, 1, 14, 16, 15, tzinfo=timezone.utc)
+        end = datetime(2025, 1, 14, 18, 0, tzinfo=timezone.utc)
+
+        # a stream with a watermark start keeps the shared window end
+        source = SqliteSource(keyset_config, ArrowIpcCache, cache_config)
+        source._mode = Mode({'type': Mode.INCREMENTAL, 'period': Mode.HOURLY, 'start': end - timedelta(hours=1, minutes=15), 'end': end})
+        mode = source._stream_mode({'start': start})
+        assert (mode.type, mode.period, mode.start, mode.end) == (Mode.INCREMENTAL, Mode.HOURLY, start, end)
+        assert source._stream_mode({'start': None}) is source._mode
+
+        # a full refresh ignores stream starts
+        source._mode = Mode({'type': Mode.FULL_REFRESH})
+        assert source._stream_mode({'start': start}) is source._mode
+        source.close()
+
+    @pytest.mark.parametrize('page_size', [1, 2, 10])
+    def test_read_keyset(self, keyset_config, cache_config, page_size):
+
+        # cursor ties across pages and NULL cursors are all read, NULLs first
+        keyset_config['connect']['page_size'] = page_size
+        source = SqliteSource(keyset_config, ArrowIpcCache, cache_config)
+        ds = source.read()
+        assert [record.data[0] for record in ds.read(ds.streams[0])] == [2, 3, 5, 1, 4]
+        assert ds.meta['watermarks']['main.events'] == 2
+        source.close()
+
+    def test_read_keyset_without_primary_field(self, keyset_config, cache_config):
+
+        # without a tiebreaker the stream is read in a single select
+        keyset_config['streams'][0]['primary_field'] = None
+        source = SqliteSource(keyset_config, ArrowIpcCache, cache_config)
+        ds = source.read()
+        assert sorted([record.data[0] for record in ds.read(ds.streams[0])]) == [1, 2, 3, 4, 5]
+        source.close()
+
+    def test_read_keyset_resume(self, keyset_config, cache_config, tmp_path, monkeypatch):
+
+        first_dt = datetime(2025, 1, 14, 18, 0, 0, tzinfo=timezone.utc)
+        build_keyset_query = SQLUtil.build_keyset_query
+        calls = []
+
+        def failing_query(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 3:
+                raise Exception("Simulated connection loss")
+            return build_keyset_query(*args, **kwargs)
+
+        # the first attempt reads the NULL pass and one full page before failing
+        monkeypatch.setattr(SQLUtil, 'build_keyset_query', failing_query)
+        source = SqliteSource({**keyset_config, 'dt': first_dt}, ArrowIpcCache, cache_config)
+        with pytest.raises(Exception, match='Simulated connection loss'):
+            source.read()
+        assert source._cache._closed
+        monkeypatch.setattr(SQLUtil, 'build_keyset_query', build_keyset_query)
+
+        # the retry resumes with the batch id of the first attempt
+        source = SqliteSource({**keyset_config, 'dt': first_dt + timedelta(minutes=5)}, ArrowIpcCache, cache_config)
+        ds = source.read()
+        batch_id = str(int(first_dt.timestamp() * 1000))
+        records = [record.data for record in ds.read(ds.streams[0])]
+        assert ds.meta['batch_id'] == batch_id
+        assert [record[0] for record in records] == [2, 3, 5, 1, 4]
+        assert {record[2] for record in records} == {batch_id}
+        assert {record[3] for record in records} == {first_dt}
+
+        # every row of the batch is found by the integrity check
+        engine = create_engine(f"sqlite:///{tmp_path}/dest.db")
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE events (id INTEGER, version INTEGER, pontoon__batch_id TEXT, pontoon__last_synced_at TEXT)"))
+            for record in records:
+                conn.execute(text("INSERT INTO events VALUES (:id, :version, :batch_id, :synced)"), {
+                    'id': record[0], 'version': record[1], 'batch_id': record[2], 'synced': record[3].isoformat()
+                })
+        SQLIntegrity(engine).check_batch_volume(ds)
+        source.close()
+
+    def test_checkpoint_window(self, keyset_config, cache_config, tmp_path):
+        end = datetime(2025, 1, 14, 18, 0, tzinfo=timezone.utc)
+        first = Mode({'type': Mode.INCREMENTAL, 'period': Mode.HOURLY, 'start': end - timedelta(hours=1, minutes=15), 'end': end})
+        stream = Stream('events', 'main', pa.schema([('id', pa.int64())]))
+
+        checkpoint = SQLCheckpoint(keyset_config['checkpoint_path'])
+        assert str(checkpoint.window(first)) == str(first)
+        os.makedirs(f"{tmp_path}/cache")
+        checkpoint.save(stream, 'SELECT id FROM main.events', [1], {'bytes': 0, 'records': 0})
+
+        # a retry scheduled in a later hour reads the window of the attempt it resumes
+        keyset_config['mode'] = Mode({'type': Mode.INCREMENTAL, 'period': Mode.HOURLY, 'start': first.start + timedelta(hours=1), 'end': end + timedelta(hours=1)})
+        source = SqliteSource(keyset_config, ArrowIpcCache, cache_config)
+        assert (source._mode.start, source._mode.end) == (first.start, first.end)
+        source.close()
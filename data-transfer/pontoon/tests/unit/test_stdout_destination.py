@@ -0,0 +1,23 @@
+import pyarrow as pa
+from pontoon import Namespace, Stream, Record, Dataset, SqliteCache
+from pontoon.destination.stdout_destination import StdoutDestination
+
+
+class TestStdoutDestination:
+
+    def test_preview_reads_limit(self, tmp_path, capsys):
+        stream = Stream('users', 'public', pa.schema([('id', pa.int64()), ('name', pa.string())]))
+        cache = SqliteCache(Namespace('test'), {'db': str(tmp_path / 'cache.db')})
+        cache.write(stream, [Record([i, f"user {i}"]) for i in range(1000)])
+        ds = Dataset(Namespace('test'), [stream], cache, meta={})
+
+        updates = []
+        StdoutDestination({'connect': {'limit': 5}}).write(ds, progress_callback=lambda progress: updates.append(progress.processed))
+
+        out = capsys.readouterr().out
+        assert "[4, 'user 4']" in out
+        assert "[5, 'user 5']" not in out
+        assert '995 more records' in out
+
+        # subscribing reports the start, then one update for the stream instead of one per record
+        assert updates == [0, 1000]
@@ -0,0 +1,86 @@
+import pytest
+from datetime import datetime, date, timedelta, timezone
+from unittest.mock import MagicMock
+from pontoon import Mode, Dataset, Namespace, MemoryCache
+from pontoon.orchestration.transfer import TransferCommand
+
+
+def _watermark_dataset(watermarks):
+    # a Dataset that carries only the max cursor values a read saw
+    return Dataset(Namespace('test'), [], MemoryCache(Namespace('test')), meta={'watermarks': watermarks})
+
+
+class TestTransferWatermarks:
+    """Test how scheduled incremental transfers start, advance and check per-model watermarks"""
+
+    @pytest.fixture
+    def now(self):
+        return datetime(2025, 1, 14, 18, 0, 0, tzinfo=timezone.utc)
+
+    @pytest.fixture
+    def command(self, now):
+        command = TransferCommand(MagicMock(), 'transfer', 'org', 'execution', 0, 3, 'destination')
+        command._replication_mode = Mode({
+            'type': Mode.INCREMENTAL,
+            'period': Mode.HOURLY,
+            'start': now - timedelta(hours=1, minutes=15),
+            'end': now
+        })
+        command._models = [
+            {'model_id': 'm1', 'schema_name': 'public', 'table_name': 'events'},
+            {'model_id': 'm2', 'schema_name': 'public', 'table_name': 'orders'}
+        ]
+        return command
+
+    def test_stream_start(self, command):
+        command._watermarks = {'m1': '2025-01-14T16:30:00+00:00', 'm2': '2025-01-14T16:30:00'}
+
+        # reads start a skew before the watermark, naive watermarks are UTC
+        expected = datetime(2025, 1, 14, 16, 15, tzinfo=timezone.utc)
+        assert command._stream_start(command._models[0]) == expected
+        assert command._stream_start(command._models[1]) == expected
+
+        command._watermark_skew = timedelta(minutes=5)
+        assert command._stream_start(command._models[0]) == datetime(2025, 1, 14, 16, 25, tzinfo=timezone.utc)
+
+    def test_stream_start_fallback(self, command):
+
+        # no watermark yet, the model reads the padded schedule window
+        assert command._stream_start(command._models[0]) is None
+
+        # manual and full refresh runs never start at a watermark
+        command._watermarks = {'m1': '2025-01-14T16:30:00+00:00'}
+        command._override = True
+        assert command._stream_start(command._models[0]) is None
+        command._override = False
+        command._replication_mode = Mode({'type': Mode.FULL_REFRESH})
+        assert command._stream_start(command._models[0]) is None
+
+    def test_update_watermarks(self, command):
+        command._watermarks = {'m1': '2025-01-14T16:30:00', 'm2': '2025-01-14T16:30:00+00:00'}
+
+        # mixed naive and aware values compare as UTC, watermarks never move backwards
+        command._update_watermarks(command._models, _watermark_dataset({
+            'public.events': datetime(2025, 1, 14, 17, 0),
+            'public.orders': '2025-01-14T17:30:00+01:00'
+        }))
+        assert command._watermarks == {'m1': '2025-01-14T17:00:00+00:00', 'm2': '2025-01-14T16:30:00+00:00'}
+
+        # dates and ISO strings are tracked, other cursor values are not
+        command._update_watermarks(command._models, _watermark_dataset({
+            'public.events': date(2025, 1, 15),
+            'public.orders': 42
+        }))
+        assert command._watermarks == {'m1': '2025-01-15T00:00:00+00:00', 'm2': '2025-01-14T16:30:00+00:00'}
+
+    def test_run_gap(self, command, now):
+        command._last_run = {'created_at': (now - timedelta(hours=5)).isoformat()}
+
+        # a missed run is a gap in the padded window
+        assert command._detect_run_gap() is True
+
+        # unless every model reads from its own watermark
+        command._watermarks = {'m1': '2025-01-14T12:00:00+00:00'}
+        assert command._detect_run_gap() is True
+        command._watermarks['m2'] = '2025-01-14T12:30:00+00:00'
+        assert command._detect_run_gap() is False